@@ -0,0 +1,17 @@
+from etgs_nts.async_api import async_api_view, paginate, render
+from rest_framework.pagination import PageNumberPagination
+
+from ..models import Comment
+from .serializers import CommentSerializer
+
+
+# Async counterpart of CommentViewSet.list, see etgs_nts/async_api.py
+@async_api_view
+async def comment_list(request, treasure_pk):
+    queryset = (
+        Comment.objects.filter(treasure=treasure_pk)
+        .select_related("author")
+        .order_by("id")
+    )
+    data = await paginate(request, queryset, PageNumberPagination, CommentSerializer)
+    return render(data)
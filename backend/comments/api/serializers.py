@@ -1,10 +1,22 @@
 from ..models import Comment
 from rest_framework import serializers
 
+from etgs_nts.fragments import FragmentCacheMixin, FragmentListSerializer
+from perf.instrumentation import TimedSerializerMixin
+
+
+class CommentSerializer(
+    FragmentCacheMixin, TimedSerializerMixin, serializers.ModelSerializer
+):
+    # rendered dicts are cached per comment, see etgs_nts/fragments.py
+    fragment_name = "comment"
+    fragment_owner_field = "author"
 
-class CommentSerializer(serializers.ModelSerializer):
     author = serializers.StringRelatedField()
+    # the treasure comes from the url, see CommentViewSet.perform_create
+    treasure = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = Comment
+        list_serializer_class = FragmentListSerializer
         fields = "__all__"
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import CommentViewSet
+from .async_views import comment_list
 
 router = DefaultRouter()
 router.register(
@@ -9,4 +10,9 @@ router.register(
 
 urlpatterns = [
     path("api/", include(router.urls)),
+    path(
+        "api/async/treasures/<int:treasure_pk>/comments/",
+        comment_list,
+        name="async-comment-list",
+    ),
 ]
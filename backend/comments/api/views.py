@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -15,8 +16,15 @@ class CommentViewSet(ModelViewSet):
 
     # perhaps the treasure_id should be passed in the url?
     def get_queryset(self):
-        return Comment.objects.filter(treasure=self.kwargs["treasure_pk"])
+        # CommentSerializer renders the author
+        return (
+            Comment.objects.filter(treasure=self.kwargs["treasure_pk"])
+            .select_related("author")
+            .order_by("id")
+        )
 
     def perform_create(self, serializer):
         treasure = Treasure.objects.get(pk=self.kwargs["treasure_pk"])
-        serializer.save(user=self.request.user, treasure=treasure)
+        # post_save bumps the creator's unread count, in the same transaction
+        with transaction.atomic():
+            serializer.save(author=self.request.user, treasure=treasure)
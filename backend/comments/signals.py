@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from treasures.cache import treasure_cache
+from treasures.models import Treasure
+from users.counters import bump_counters, comment_deleted, treasure_deleted
+
+from .models import Comment
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_treasure_cache(sender, instance, **kwargs):
+    # the treasure stats count comments, after commit so other workers can't
+    # cache the old counts again
+    transaction.on_commit(treasure_cache.invalidate)
+
+
+@receiver(post_save, sender=Comment)
+def count_unread_comment(sender, instance, created, **kwargs):
+    if not created:
+        return
+    creator_id = instance.treasure.creator_id
+    if instance.author_id != creator_id:
+        bump_counters(creator_id, unread_comments=1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_unread_comment(sender, instance, origin=None, **kwargs):
+    # origin is what delete() was called on, a model instance or a queryset
+    if origin is not None and getattr(origin, "model", type(origin)) is not Comment:
+        # cascaded from a treasure, counted once for all of it below
+        return
+    comment_deleted(instance)
+
+
+@receiver(pre_delete, sender=Treasure)
+def uncount_treasure_comments(sender, instance, **kwargs):
+    # before the cascade, while the comments can still be counted
+    treasure_deleted(instance)
@@ -0,0 +1,123 @@
+"""
+Helpers shared by the native async read views.
+
+DRF views are sync only, under ASGI every request to them pays a hop to a
+worker thread. The async views in treasures, comments and users use these
+helpers to authenticate, paginate and render the same way the DRF viewsets
+do, with the database work done through Django's async ORM.
+
+Serializers still run in a thread, see serialize(): the fragment cache and
+the user version lookups they make are blocking SQLite calls, which would
+stall every stream and request on the event loop.
+"""
+
+import functools
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Page
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.request import Request
+
+from users.api.authentication import CachedJWTAuthentication
+
+from .renderers import FastJSONRenderer
+
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+    """Render `data` with the viewsets' JSON renderer so the bytes match."""
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        status=status_code,
+        content_type="application/json",
+        headers=headers,
+    )
+
+
+def error_response(exc):
+    detail = exc.detail
+    data = detail if isinstance(detail, (dict, list)) else {"detail": detail}
+    code = exc.status_code
+    headers = None
+    if isinstance(exc, NotAuthenticated) or code == status.HTTP_401_UNAUTHORIZED:
+        # matches custom_exception_handler, which turns these into 401s
+        code = status.HTTP_401_UNAUTHORIZED
+        headers = {"WWW-Authenticate": 'Bearer realm="api"'}
+    return render(data, code, headers)
+
+
+async def serialize(serializer_class, instance, **kwargs):
+    """`serializer_class(instance, **kwargs).data`, computed in a thread."""
+
+    def data():
+        return serializer_class(instance, **kwargs).data
+
+    return await sync_to_async(data)()
+
+
+async def authenticate(request):
+    """Return the user for the request's bearer token or raise."""
+    auth = CachedJWTAuthentication()
+    # A cache hit never touches the database, a miss loads the user row
+    result = await sync_to_async(auth.authenticate)(request)
+    if result is None:
+        raise NotAuthenticated()
+    user, _ = result
+    request.user = user
+    return user
+
+
+def async_api_view(view):
+    """
+    Authenticate the request and turn API exceptions into JSON error
+    responses, the way DRF's IsAuthenticated views behave.
+    """
+
+    @functools.wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        if request.method != "GET":
+            return render(
+                {"detail": f'Method "{request.method}" not allowed.'},
+                status.HTTP_405_METHOD_NOT_ALLOWED,
+            )
+        try:
+            await authenticate(request)
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            return error_response(exc)
+
+    return wrapped
+
+
+async def paginate(request, queryset, pagination_class, serializer_class):
+    """
+    Return the paginated response body for `queryset`, identical to what
+    `pagination_class` and `serializer_class` produce in a viewset. Only the
+    count and the one page of rows are fetched, both through the async ORM.
+    """
+    paginator = pagination_class()
+    drf_request = Request(request)
+    page_size = paginator.get_page_size(drf_request)
+
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    # count is a cached_property, fill it in without a sync query
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(drf_request, django_paginator)
+    try:
+        number = django_paginator.validate_number(page_number)
+    except InvalidPage as exc:
+        raise NotFound(
+            paginator.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            )
+        )
+    bottom = (number - 1) * page_size
+    objects = [obj async for obj in queryset[bottom : bottom + page_size].aiterator()]
+
+    paginator.request = drf_request
+    paginator.page = Page(objects, number, django_paginator)
+    data = await serialize(
+        serializer_class, objects, many=True, context={"request": drf_request}
+    )
+    return paginator.get_paginated_response(data).data
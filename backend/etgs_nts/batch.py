@@ -0,0 +1,238 @@
+"""
+Several API calls in one round trip.
+
+A client that needs a user, their treasures and the comments on a few of
+them can POST them to /batch/ together instead of making one request each:
+
+    POST /batch/
+    {"requests": [
+        {"method": "GET", "path": "/users/1/"},
+        {"method": "GET", "path": "/treasures/?page=2"},
+        {"method": "POST", "path": "/api/treasures/3/comments/",
+         "body": {"content": "Nice"}}
+    ]}
+
+    {"responses": [
+        {"status": 200, "headers": {...}, "body": {...}},
+        ...
+    ]}
+
+The batch is authenticated once, and the sub-requests go straight to their
+views through the URL resolver with that user, skipping the middleware and
+authentication each of them would otherwise repeat. Their bodies are
+rendered once, as part of the batch response. Only DRF API views can be
+called this way; async views and streams answer 400.
+
+Sub-requests run in order. Consecutive reads (GET, HEAD, OPTIONS) don't
+depend on each other, so they run on up to THREADS threads at once; a write
+waits for the reads before it and the reads after it wait for the write.
+Each sub-request still goes through its view's permissions and throttles.
+
+A batch holds at most MAX_REQUESTS sub-requests, and sub-requests that
+haven't started TIME_BUDGET seconds after the batch did answer 503 instead
+of running, so one batch can't tie up a worker for long.
+
+Configured with the BATCH setting:
+
+    BATCH = {
+        "MAX_REQUESTS": 20,  # sub-requests per batch
+        "THREADS": 4,  # reads run at once, 1 runs everything in order
+        "TIME_BUDGET": 10,  # seconds a batch may start sub-requests for
+    }
+"""
+
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+from rest_framework import serializers, status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .conf import setting_reader
+from .renderers import FastJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "MAX_REQUESTS": 20,
+    "THREADS": 4,
+    "TIME_BUDGET": 10,
+}
+
+METHODS = ("GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE")
+
+# besides the headers, what sub-requests keep of the batch request's META
+COPIED_META = ("REMOTE_ADDR", "SERVER_NAME", "SERVER_PORT")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+batch_setting = setting_reader("BATCH", DEFAULTS)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                batch_setting("THREADS"), thread_name_prefix="batch"
+            )
+        return _executor
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=METHODS, default="GET")
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        if not value.startswith("/"):
+            raise serializers.ValidationError("Must be an absolute path.")
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = serializers.ListField(child=SubRequestSerializer(), allow_empty=False)
+
+    def validate_requests(self, value):
+        limit = batch_setting("MAX_REQUESTS")
+        if len(value) > limit:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than {limit} elements."
+            )
+        return value
+
+
+def _error(status_code, detail):
+    return {"status": status_code, "headers": {}, "body": {"detail": detail}}
+
+
+def _sub_request(request, method, path, body):
+    """A copy of the batch request, with the sub-request's method, path and body."""
+    url = urlsplit(path)
+    content = b"" if body is None else FastJSONRenderer().render(body)
+    environ = {
+        key: value
+        for key, value in request.META.items()
+        if key.startswith("HTTP_") or key in COPIED_META
+    }
+    environ.update(
+        {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(content)),
+            "HTTP_ACCEPT": "application/json",
+            "wsgi.input": io.BytesIO(content),
+            "wsgi.url_scheme": request.scheme,
+        }
+    )
+    sub = WSGIRequest(environ)
+    # authenticated once, by the batch
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    sub.user = request.user
+    return sub
+
+
+def _body(response):
+    if isinstance(response, Response):
+        return response.data
+    content = response.content.decode(response.charset or "utf-8")
+    return content or None
+
+
+def run_sub_request(request, method, path, body=None):
+    """Call the view for one sub-request, returns its status, headers and body."""
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return _error(status.HTTP_404_NOT_FOUND, "Not found.")
+    view_class = getattr(match.func, "cls", None)
+    if view_class is None or not issubclass(view_class, APIView):
+        return _error(status.HTTP_400_BAD_REQUEST, "Only API views can be batched.")
+    if issubclass(view_class, BatchView):
+        return _error(status.HTTP_400_BAD_REQUEST, "Batches can't be nested.")
+
+    sub = _sub_request(request, method, path, body)
+    sub.resolver_match = match
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception("Batched %s %s failed", method, path)
+        return _error(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, "A server error occurred."
+        )
+    headers = {
+        name: value for name, value in response.items() if name != "Content-Type"
+    }
+    return {
+        "status": response.status_code,
+        "headers": headers,
+        "body": _body(response),
+    }
+
+
+def _run_in_thread(request, deadline, sub_request):
+    close_old_connections()
+    try:
+        return _run_before(request, deadline, sub_request)
+    finally:
+        close_old_connections()
+
+
+def _run_before(request, deadline, sub_request):
+    if time.monotonic() > deadline:
+        return _error(status.HTTP_503_SERVICE_UNAVAILABLE, "The batch ran out of time.")
+    return run_sub_request(request, **sub_request)
+
+
+def run_batch(request, sub_requests):
+    """Run the sub-requests, reads in between writes in parallel."""
+    deadline = time.monotonic() + batch_setting("TIME_BUDGET")
+    parallel = batch_setting("THREADS") > 1
+    responses = []
+    reads = []
+
+    def run_reads():
+        if len(reads) > 1 and parallel:
+            executor = _get_executor()
+            futures = [
+                executor.submit(_run_in_thread, request, deadline, sub_request)
+                for sub_request in reads
+            ]
+            responses.extend(future.result() for future in futures)
+        else:
+            responses.extend(
+                _run_before(request, deadline, sub_request) for sub_request in reads
+            )
+        reads.clear()
+
+    for sub_request in sub_requests:
+        if sub_request["method"] in SAFE_METHODS:
+            reads.append(sub_request)
+            continue
+        run_reads()
+        responses.append(_run_before(request, deadline, sub_request))
+    run_reads()
+    return responses
+
+
+class BatchView(APIView):
+    """Run several API requests at once, see etgs_nts/batch.py."""
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        responses = run_batch(request, serializer.validated_data["requests"])
+        return Response({"responses": responses})
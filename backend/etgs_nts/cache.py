@@ -0,0 +1,567 @@
+"""
+Two tier cache backend.
+
+TieredCache keeps recently used values in an in-process LRU (L1) in front of
+a SQLite file shared by every worker on the machine (L2), so there is no
+cache server to run and a hit in L1 costs no I/O at all.
+
+- L1 is bounded by entry count and total bytes, and entries expire after
+  L1_TIMEOUT seconds or when their L2 timeout passes, whichever is first.
+  Values are stored pickled, like LocMemCache, so callers can't mutate a
+  cached object.
+- Every write to L2 appends the key to an invalidation log in the same
+  transaction. Each process reads the log at most every SYNC_INTERVAL
+  seconds and drops the keys other workers changed from its L1, so a value
+  is never stale for longer than that.
+- A value read from L2 is only put in L1 if nothing was written or
+  invalidated in the process since the read started, so a thread that read
+  the old row can't bring it back after another thread's write.
+- CacheNamespace puts a version number in its keys. Bumping the version
+  invalidates every key of the namespace at once, in every worker.
+
+Hits, misses and evictions of both tiers are counted per process, see
+cache_stats() and /perf/cache/.
+
+    CACHES = {
+        "default": {
+            "BACKEND": "etgs_nts.cache.TieredCache",
+            "LOCATION": BASE_DIR / "cache.sqlite3",
+            "TIMEOUT": 300,
+            "OPTIONS": {
+                "MAX_ENTRIES": 10000,  # L2 entries before culling
+                "L1_MAX_ENTRIES": 1000,
+                "L1_MAX_BYTES": 16 * 1024 * 1024,
+                "L1_TIMEOUT": 30,  # seconds a value is kept in L1 at most
+                "SYNC_INTERVAL": 0.25,  # seconds between invalidation log reads
+            },
+        }
+    }
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# seconds invalidations are kept in the log, a process that hasn't read it
+# for longer than this empties its whole L1 instead
+LOG_RETENTION = 300
+
+# L2 writes between culls and invalidation log trims, per process
+MAINTENANCE_EVERY = 500
+
+# SQLite's limit on query parameters is 32766 since 3.32, stay well below
+MAX_QUERY_KEYS = 500
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS entries "
+    "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS invalidations "
+    "(seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, origin INTEGER, at REAL)",
+]
+
+
+class CacheStats:
+    FIELDS = (
+        "l1_hits",
+        "l2_hits",
+        "misses",
+        "sets",
+        "deletes",
+        "l1_evictions",
+        "l1_expirations",
+        "l2_culled",
+        "invalidations",
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def snapshot(self):
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        data["hit_rate"] = (
+            round((self.l1_hits + self.l2_hits) / lookups, 4) if lookups else None
+        )
+        return data
+
+
+class LocalTier:
+    """
+    The L1 of one cache location, shared by every thread of the process
+    (Django creates a backend instance per thread).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires, pickled)
+        self.size = 0
+        self.stats = CacheStats()
+        self.last_seq = None
+        self.last_sync = 0.0
+        # bumped by every write and invalidation, see set()
+        self.generation = 0
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                self._remove(key)
+                self.stats.l1_expirations += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats.l1_hits += 1
+            return entry[1]
+
+    def set(self, key, pickled, expires, max_entries, max_bytes, generation=None):
+        """
+        Store a value. Writes pass no `generation`; values read from L2 pass
+        the generation from before the read, and are dropped if anything
+        changed since, as the row read may be older than that change.
+        """
+        if len(pickled) > max_bytes:
+            if generation is None:
+                self.delete(key)
+            return
+        with self.lock:
+            if generation is None:
+                self.generation += 1
+            elif generation != self.generation:
+                return
+            self._remove(key)
+            self.entries[key] = (expires, pickled)
+            self.size += len(pickled)
+            while len(self.entries) > max_entries or self.size > max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.stats.l1_evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.generation += 1
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.size = 0
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def _local_tier(location):
+    with _tiers_lock:
+        tier = _tiers.get(location)
+        if tier is None:
+            tier = _tiers[location] = LocalTier()
+        return tier
+
+
+def cache_stats():
+    """Counters of every TieredCache location used by this process."""
+    return {location: tier.stats.snapshot() for location, tier in _tiers.items()}
+
+
+def reset_cache_stats():
+    for tier in _tiers.values():
+        tier.stats.reset()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = str(location)
+        options = params.get("OPTIONS", {})
+        self.l1_max_entries = int(options.get("L1_MAX_ENTRIES", 1000))
+        self.l1_max_bytes = int(options.get("L1_MAX_BYTES", 16 * 1024 * 1024))
+        self.l1_timeout = float(options.get("L1_TIMEOUT", 30))
+        self.sync_interval = float(options.get("SYNC_INTERVAL", 0.25))
+        self._l1 = _local_tier(self.location)
+        # async code can share a backend instance between threads
+        self._local = threading.local()
+        self._writes = 0
+
+    # L2
+
+    def _db(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            Path(self.location).parent.mkdir(parents=True, exist_ok=True)
+            # autocommit, writes use explicit transactions
+            connection = sqlite3.connect(
+                self.location, timeout=5, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+        return connection
+
+    def _write(self, keys, statements):
+        """
+        Run `statements` ((sql, params) pairs) and log `keys` as changed, in
+        one transaction. Returns the row count of the first statement.
+        """
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rowcount = None
+            for sql, params in statements:
+                cursor = db.execute(sql, params)
+                if rowcount is None:
+                    rowcount = cursor.rowcount
+            origin, now = os.getpid(), time.time()
+            db.executemany(
+                "INSERT INTO invalidations (key, origin, at) VALUES (?, ?, ?)",
+                [(key, origin, now) for key in keys],
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._writes += 1
+        if self._writes % MAINTENANCE_EVERY == 0:
+            self._maintain()
+        return rowcount
+
+    def _maintain(self):
+        db = self._db()
+        now = time.time()
+        db.execute("DELETE FROM invalidations WHERE at < ?", (now - LOG_RETENTION,))
+        db.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        (count,) = db.execute("SELECT count(*) FROM entries").fetchone()
+        if count > self._max_entries:
+            culled = count // self._cull_frequency if self._cull_frequency else count
+            db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries "
+                "ORDER BY expires IS NULL, expires LIMIT ?)",
+                (culled,),
+            )
+            self._l1.stats.l2_culled += culled
+
+    def _sync(self, now):
+        """Drop keys other processes changed from L1."""
+        tier = self._l1
+        if now - tier.last_sync < self.sync_interval:
+            return
+        db = self._db()
+        with tier.lock:
+            if now - tier.last_sync < self.sync_interval:
+                return
+            if tier.last_seq is None or now - tier.last_sync > LOG_RETENTION:
+                # first read, or the log may have been trimmed past us
+                (tier.last_seq,) = db.execute(
+                    "SELECT coalesce(max(seq), 0) FROM invalidations"
+                ).fetchone()
+                tier.generation += 1
+                tier.entries.clear()
+                tier.size = 0
+            else:
+                rows = db.execute(
+                    "SELECT seq, key, origin FROM invalidations WHERE seq > ?",
+                    (tier.last_seq,),
+                ).fetchall()
+                for seq, key, origin in rows:
+                    tier.last_seq = max(tier.last_seq, seq)
+                    if origin == os.getpid():
+                        continue
+                    tier.stats.invalidations += 1
+                    tier.generation += 1
+                    if key is None:
+                        tier.entries.clear()
+                        tier.size = 0
+                    else:
+                        tier._remove(key)
+            tier.last_sync = now
+
+    def _l1_set(self, key, pickled, expires, now, generation=None):
+        l1_expires = now + self.l1_timeout
+        if expires is not None:
+            l1_expires = min(l1_expires, expires)
+        self._l1.set(
+            key,
+            pickled,
+            l1_expires,
+            self.l1_max_entries,
+            self.l1_max_bytes,
+            generation,
+        )
+
+    # BaseCache API
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        self._sync(now)
+        pickled = self._l1.get(key, now)
+        if pickled is None:
+            generation = self._l1.generation
+            row = self._db().execute(
+                "SELECT value, expires FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                self._l1.stats.misses += 1
+                return default
+            pickled, expires = row
+            self._l1.stats.l2_hits += 1
+            self._l1_set(key, pickled, expires, now, generation)
+        return pickle.loads(pickled)
+
+    def get_many(self, keys, version=None):
+        # one query for everything L1 doesn't have
+        now = time.time()
+        self._sync(now)
+        found = {}
+        missing = {}
+        for key in keys:
+            made_key = self.make_and_validate_key(key, version=version)
+            pickled = self._l1.get(made_key, now)
+            if pickled is None:
+                missing[made_key] = key
+            else:
+                found[key] = pickle.loads(pickled)
+        made_keys = list(missing)
+        generation = self._l1.generation
+        db = self._db()
+        for start in range(0, len(made_keys), MAX_QUERY_KEYS):
+            chunk = made_keys[start : start + MAX_QUERY_KEYS]
+            rows = db.execute(
+                "SELECT key, value, expires FROM entries WHERE key IN (%s)"
+                % ", ".join("?" * len(chunk)),
+                chunk,
+            ).fetchall()
+            for made_key, pickled, expires in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[missing[made_key]] = pickle.loads(pickled)
+                self._l1.stats.l2_hits += 1
+                self._l1_set(made_key, pickled, expires, now, generation)
+        self._l1.stats.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        self._write(
+            [key],
+            [
+                (
+                    "INSERT OR REPLACE INTO entries (key, value, expires) "
+                    "VALUES (?, ?, ?)",
+                    (key, pickled, expires),
+                )
+            ],
+        )
+        self._l1.stats.sets += 1
+        self._l1_set(key, pickled, expires, time.time())
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        # one transaction for all of them
+        expires = self.get_backend_timeout(timeout)
+        pickled = {
+            self.make_and_validate_key(key, version=version): pickle.dumps(
+                value, pickle.HIGHEST_PROTOCOL
+            )
+            for key, value in data.items()
+        }
+        if not pickled:
+            return []
+        self._write(
+            list(pickled),
+            [
+                (
+                    "INSERT OR REPLACE INTO entries (key, value, expires) "
+                    "VALUES (?, ?, ?)",
+                    (key, value, expires),
+                )
+                for key, value in pickled.items()
+            ],
+        )
+        now = time.time()
+        for key, value in pickled.items():
+            self._l1.stats.sets += 1
+            self._l1_set(key, value, expires, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        # replaces expired entries only
+        added = self._write(
+            [key],
+            [
+                (
+                    "INSERT INTO entries (key, value, expires) VALUES (?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET "
+                    "value = excluded.value, expires = excluded.expires "
+                    "WHERE entries.expires IS NOT NULL AND entries.expires <= ?",
+                    (key, pickled, expires, now),
+                )
+            ],
+        )
+        if added:
+            self._l1.stats.sets += 1
+            self._l1_set(key, pickled, expires, now)
+        return bool(added)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        touched = self._write(
+            [key],
+            [
+                (
+                    "UPDATE entries SET expires = ? WHERE key = ? "
+                    "AND (expires IS NULL OR expires > ?)",
+                    (self.get_backend_timeout(timeout), key, time.time()),
+                )
+            ],
+        )
+        # picked up again from L2 with the new expiry
+        self._l1.delete(key)
+        return bool(touched)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        deleted = self._write([key], [("DELETE FROM entries WHERE key = ?", (key,))])
+        self._l1.stats.deletes += 1
+        self._l1.delete(key)
+        return bool(deleted)
+
+    def incr(self, key, delta=1, version=None):
+        # atomic across processes, unlike BaseCache.incr
+        key = self.make_and_validate_key(key, version=version)
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT value, expires FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                "UPDATE entries SET value = ? WHERE key = ?",
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key),
+            )
+            db.execute(
+                "INSERT INTO invalidations (key, origin, at) VALUES (?, ?, ?)",
+                (key, os.getpid(), time.time()),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._l1.stats.sets += 1
+        self._l1.delete(key)
+        return value
+
+    def clear(self):
+        self._write([None], [("DELETE FROM entries", ())])
+        self._l1.clear()
+
+    def close(self, **kwargs):
+        # connections are kept for the life of the thread, like the L1
+        pass
+
+
+class CacheNamespace:
+    """
+    A group of cache keys invalidated together. Keys are stored with the
+    namespace's current version (Django's `version` key argument), so
+    invalidate() orphans all of them with a single write, and they expire
+    from L2 on their own.
+    """
+
+    def __init__(self, name, alias="default"):
+        self.name = name
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _version_key(self):
+        return f"namespace-version:{self.name}"
+
+    def version(self):
+        cache = self.cache
+        version = cache.get(self._version_key())
+        if version is None:
+            # time based, so a version lost from the cache is never reused
+            cache.add(self._version_key(), time.time_ns(), timeout=None)
+            version = cache.get(self._version_key())
+        return version
+
+    def invalidate(self):
+        self.cache.set(self._version_key(), time.time_ns(), timeout=None)
+
+    def _key(self, key):
+        return f"{self.name}:{key}"
+
+    def get(self, key, default=None):
+        return self.cache.get(self._key(key), default, version=self.version())
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # an older `version` stores the value where no reader will look
+        if version is None:
+            version = self.version()
+        self.cache.set(self._key(key), value, timeout, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT):
+        return self.cache.add(self._key(key), value, timeout, version=self.version())
+
+    def delete(self, key):
+        return self.cache.delete(self._key(key), version=self.version())
+
+    def get_many(self, keys):
+        found = self.cache.get_many(
+            [self._key(key) for key in keys], version=self.version()
+        )
+        prefix = len(self.name) + 1
+        return {key[prefix:]: value for key, value in found.items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT):
+        self.cache.set_many(
+            {self._key(key): value for key, value in data.items()},
+            timeout,
+            version=self.version(),
+        )
+
+
+def throwaway_caches(directory):
+    """
+    CACHES with every TieredCache moved into `directory`, for test runs and
+    benchmarks that must not share cached rows with the real database.
+    """
+    moved = {}
+    for alias, config in settings.CACHES.items():
+        config = dict(config)
+        if config.get("BACKEND") == "etgs_nts.cache.TieredCache":
+            config["LOCATION"] = str(Path(directory) / f"{alias}.sqlite3")
+        moved[alias] = config
+    return moved
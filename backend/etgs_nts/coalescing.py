@@ -0,0 +1,248 @@
+"""
+Single flight computation and stale-while-revalidate for expensive reads.
+
+When a cached aggregate expires, every request that arrives before it is
+cached again would compute it. get_or_compute makes them share one
+computation instead:
+
+- within a process, concurrent callers for the same key wait for the first
+  one to finish and all get its result
+- across workers, the one that takes the key's lock (a cache add) computes
+  it and the others poll the cache for up to WAIT seconds before giving up
+  and computing it themselves
+
+Values are cached with the time they stop being fresh. Once that passes
+they are still served, for up to `stale` more seconds, while one worker
+recomputes them in a background thread, so no request waits for a refresh.
+
+coalesced() applies this to a view or viewset action, caching the data of
+its 200 responses:
+
+    @action(detail=False)
+    @coalesced(fresh=60, stale=300, namespace=treasure_cache)
+    def stats(self, request):
+        ...
+
+Configured with the COALESCING setting:
+
+    COALESCING = {
+        "ENABLED": True,
+        "LOCK_TIMEOUT": 30,  # seconds a computation may hold its key
+        "WAIT": 10,  # seconds to wait for another worker's computation
+        "REFRESH_WORKERS": 2,  # background refresh threads per process
+    }
+"""
+
+import functools
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import CacheNamespace
+from .conf import setting_reader
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "LOCK_TIMEOUT": 30,
+    "WAIT": 10,
+    "REFRESH_WORKERS": 2,
+}
+
+# seconds between cache reads while another worker computes a value
+POLL_INTERVAL = 0.05
+
+default_namespace = CacheNamespace("coalesced")
+
+
+coalescing_setting = setting_reader("COALESCING", DEFAULTS)
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_refreshing = {}
+_lock = threading.Lock()
+_executor = None
+
+
+def _lock_key(key):
+    return f"{key}:lock"
+
+
+def single_flight(key, compute):
+    """Call `compute`, unless another thread of this process already is."""
+    with _lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+    try:
+        flight.result = compute()
+        return flight.result
+    except BaseException as exc:
+        flight.error = exc
+        raise
+    finally:
+        with _lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def _store(namespace, key, compute, fresh, stale):
+    # read first, a value computed before an invalidation is stored under the
+    # old version and never served
+    version = namespace.version()
+    value = compute()
+    namespace.set(
+        key, (value, time.time() + fresh), timeout=fresh + stale, version=version
+    )
+    return value
+
+
+def _compute_once(namespace, key, compute, fresh, stale):
+    """Compute and cache the value, or wait for the worker that is."""
+    lock_key = _lock_key(key)
+    if namespace.add(lock_key, True, timeout=coalescing_setting("LOCK_TIMEOUT")):
+        try:
+            return _store(namespace, key, compute, fresh, stale)
+        finally:
+            namespace.delete(lock_key)
+    deadline = time.monotonic() + coalescing_setting("WAIT")
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = namespace.get(key)
+        if entry is not None:
+            return entry[0]
+        if namespace.get(lock_key) is None:
+            # the other worker failed or its value was already invalidated
+            break
+    return _store(namespace, key, compute, fresh, stale)
+
+
+def _refresh(flight_key, namespace, key, compute, fresh, stale):
+    try:
+        _store(namespace, key, compute, fresh, stale)
+    except Uncacheable:
+        # the stale value is kept until it expires
+        pass
+    except Exception:
+        logger.exception("Refreshing %s failed", flight_key)
+    finally:
+        namespace.delete(_lock_key(key))
+        with _lock:
+            _refreshing.pop(flight_key, None)
+        # background threads open their own database connections
+        close_old_connections()
+
+
+def _refresh_in_background(flight_key, namespace, key, compute, fresh, stale):
+    global _executor
+    with _lock:
+        if flight_key in _refreshing:
+            return
+        # a placeholder, so a second stale read doesn't take the lock too
+        _refreshing[flight_key] = None
+    if not namespace.add(
+        _lock_key(key), True, timeout=coalescing_setting("LOCK_TIMEOUT")
+    ):
+        # another worker is refreshing it
+        with _lock:
+            _refreshing.pop(flight_key, None)
+        return
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=coalescing_setting("REFRESH_WORKERS"),
+                thread_name_prefix="refresh",
+            )
+        _refreshing[flight_key] = _executor.submit(
+            _refresh, flight_key, namespace, key, compute, fresh, stale
+        )
+
+
+def wait_for_refreshes(timeout=None):
+    """Block until this process's background refreshes are done."""
+    with _lock:
+        futures = [future for future in _refreshing.values() if future is not None]
+    for future in futures:
+        future.result(timeout)
+
+
+def get_or_compute(key, compute, fresh, stale=0, namespace=default_namespace):
+    """
+    The cached value of `key`, computed by `compute()` at most once at a
+    time. Values are fresh for `fresh` seconds, then served stale for up to
+    `stale` seconds while they are recomputed in the background.
+    """
+    if not coalescing_setting("ENABLED"):
+        return compute()
+    flight_key = f"{namespace.name}:{key}"
+    entry = namespace.get(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() >= fresh_until:
+            _refresh_in_background(flight_key, namespace, key, compute, fresh, stale)
+        return value
+    return single_flight(
+        flight_key, lambda: _compute_once(namespace, key, compute, fresh, stale)
+    )
+
+
+class Uncacheable(Exception):
+    """Raised for responses that aren't a 200, which are never cached."""
+
+    def __init__(self, response):
+        self.response = response
+
+
+def coalesced(fresh, stale=0, namespace=default_namespace, per_user=True):
+    """
+    Serve a view method's response data through get_or_compute, keyed by
+    the view, the full path and, with `per_user`, the user.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            user_id = request.user.pk if per_user else None
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = f"{type(self).__qualname__}.{method.__name__}:{user_id}:{path}"
+            responses = []
+
+            def compute():
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    responses.append(response)
+                    raise Uncacheable(response)
+                return response.data
+
+            try:
+                data = get_or_compute(key, compute, fresh, stale, namespace)
+            except Uncacheable:
+                if responses:
+                    return responses[0]
+                # another request's error response, get one of our own
+                return method(self, request, *args, **kwargs)
+            return Response(data)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,214 @@
+"""
+Gzip compression for API responses.
+
+CompressionMiddleware works like Django's GZipMiddleware with three
+differences:
+
+- only bodies of at least MIN_SIZE bytes are compressed, small responses
+  gain little and still pay the CPU time
+- `Accept-Encoding` is parsed properly, so `gzip;q=0` opts out
+- compressed bodies are kept in a per process LRU cache keyed by the strong
+  ETag (ConditionalGetMiddleware, below this one, sets it from the
+  uncompressed body) or else a digest of the body, so the same page served
+  again is not compressed again
+
+Responses that already have a Content-Encoding, a media type that is
+compressed already (images, archives), or an event stream are passed
+through. Other streaming responses are compressed chunk by chunk and never
+cached.
+
+Configured with the RESPONSE_COMPRESSION setting:
+
+    RESPONSE_COMPRESSION = {
+        "ENABLED": True,
+        "MIN_SIZE": 1024,  # bytes, smaller bodies are sent as they are
+        "CACHE_ENTRIES": 256,  # compressed bodies kept, 0 disables the cache
+        "CACHE_MAX_BYTES": 8 * 1024 * 1024,  # total size of the cached bodies
+    }
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+from .conf import setting_reader
+from .middleware import HybridMiddleware
+
+DEFAULTS = {
+    "ENABLED": True,
+    "MIN_SIZE": 1024,
+    "CACHE_ENTRIES": 256,
+    "CACHE_MAX_BYTES": 8 * 1024 * 1024,
+}
+
+# media types that don't get smaller when compressed again
+COMPRESSED_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+)
+
+# streams whose chunks must reach the client as soon as they are sent
+UNBUFFERED_TYPES = ("text/event-stream",)
+
+# random bytes added to each body, the GZipMiddleware mitigation for BREACH
+MAX_RANDOM_BYTES = 100
+
+
+compression_setting = setting_reader("RESPONSE_COMPRESSION", DEFAULTS)
+
+
+def accepts_gzip(header):
+    """True if an Accept-Encoding header allows gzip."""
+    quality = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip().lower()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        quality[coding] = q
+    return quality.get("gzip", quality.get("*", 0.0)) > 0
+
+
+class CompressedBodyCache:
+    """Thread safe LRU of compressed bodies, bounded by count and total size."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bodies = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._bodies.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, key, body):
+        max_entries = compression_setting("CACHE_ENTRIES")
+        max_bytes = compression_setting("CACHE_MAX_BYTES")
+        if not max_entries or len(body) > max_bytes:
+            return
+        with self._lock:
+            old = self._bodies.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._bodies[key] = body
+            self._size += len(body)
+            while len(self._bodies) > max_entries or self._size > max_bytes:
+                _, evicted = self._bodies.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._bodies),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
+            self._size = 0
+            self.hits = self.misses = 0
+
+
+compressed_bodies = CompressedBodyCache()
+
+
+def _cache_key(response):
+    etag = response.get("ETag")
+    content = response.content
+    if etag and etag.startswith('"'):
+        # a strong ETag means byte identical bodies
+        return ("etag", etag, len(content))
+    return ("sha256", hashlib.sha256(content).digest())
+
+
+def compress_content(response):
+    """The gzipped body of a non streaming response, cached by its ETag or digest."""
+    key = _cache_key(response)
+    body = compressed_bodies.get(key)
+    if body is None:
+        body = compress_string(response.content, max_random_bytes=MAX_RANDOM_BYTES)
+        compressed_bodies.set(key, body)
+    return body
+
+
+class CompressionMiddleware(HybridMiddleware):
+    def handle(self, request):
+        response = self.get_response(request)
+        if not compression_setting("ENABLED"):
+            return response
+        return self.compress(request, response)
+
+    async def ahandle(self, request):
+        response = await self.get_response(request)
+        if not compression_setting("ENABLED"):
+            return response
+        return self.compress(request, response)
+
+    def compress(self, request, response):
+        if response.has_header("Content-Encoding"):
+            return response
+        content_type = response.get("Content-Type", "")
+        if content_type.startswith(COMPRESSED_TYPES + UNBUFFERED_TYPES):
+            return response
+        if not response.streaming and len(response.content) < compression_setting(
+            "MIN_SIZE"
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if not accepts_gzip(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                original = response.streaming_content
+
+                async def compressed():
+                    # one gzip member per chunk, like GZipMiddleware
+                    async for chunk in original:
+                        yield compress_string(chunk, max_random_bytes=MAX_RANDOM_BYTES)
+
+                response.streaming_content = compressed()
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, max_random_bytes=MAX_RANDOM_BYTES
+                )
+            del response.headers["Content-Length"]
+        else:
+            body = compress_content(response)
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response.headers["Content-Length"] = str(len(body))
+
+        # RFC 9110 8.8.1, a strong ETag can't describe the encoded body
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "gzip"
+        return response
@@ -0,0 +1,20 @@
+"""
+Settings dicts with a default for every key.
+
+Each configurable module documents one dict setting, e.g. PERF_PROFILING,
+with a DEFAULTS dict for the keys a project leaves out, and reads it with
+a function made by setting_reader().
+"""
+
+from django.conf import settings
+
+
+def setting_reader(name, defaults):
+    """
+    A function returning a key of the `name` setting, or its default. The
+    setting is read on every call, so override_settings() applies.
+    """
+
+    def read(key):
+        return getattr(settings, name, {}).get(key, defaults[key])
+    return read
@@ -0,0 +1,57 @@
+"""
+Read/write split for SQLite.
+
+Writes, migrations and anything inside a transaction use "default". Other
+reads of the API apps (DATABASE_ROUTING["READ_APPS"]) go to the read-only
+DATABASE_ROUTING["READ_ALIAS"] connection. With WAL both connections see
+every committed write, so reads never wait behind the writer and cannot
+take the write lock by accident.
+
+While the read alias is a test mirror of default (the test runner and the
+benchmark commands set this up) it is the same database, so reads stay on
+default and see the test's uncommitted data.
+"""
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .conf import setting_reader
+
+DEFAULTS = {
+    "READ_ALIAS": "replica",
+    "READ_APPS": [],
+}
+
+
+routing_setting = setting_reader("DATABASE_ROUTING", DEFAULTS)
+
+
+def is_test_mirror(alias):
+    """True while `alias` has been pointed at the default database."""
+    return (
+        connections[alias].settings_dict["NAME"]
+        == connections[DEFAULT_DB_ALIAS].settings_dict["NAME"]
+    )
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = routing_setting("READ_ALIAS")
+        if (
+            model._meta.app_label not in routing_setting("READ_APPS")
+            or alias not in connections
+            # read your own writes inside transactions
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+            or is_test_mirror(alias)
+        ):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,123 @@
+"""
+Per object cache of serialized representations.
+
+Most rows of a list page haven't changed since it was last served, so
+FragmentCacheMixin keeps each object's serialized dict in the cache and
+FragmentListSerializer renders a page with one multi-get, serializing only
+the objects that missed.
+
+A fragment's key changes whenever its data can have changed:
+
+- the object's `last_modified`, or a hash of its field values for models
+  without one (comments)
+- the version stamp of the user named by `fragment_owner_field` (see
+  users/user_cache.py), bumped when the user is saved, so a new handle
+  shows up in every fragment that renders it
+
+Old fragments are never deleted, they expire after TIMEOUT. Queryset
+.update() calls don't touch `last_modified`, save the objects instead or
+call invalidate_fragments().
+
+Configured with the FRAGMENT_CACHE setting:
+
+    FRAGMENT_CACHE = {
+        "ENABLED": True,
+        "CACHE": "default",  # cache alias
+        "TIMEOUT": 3600,  # seconds a fragment is kept
+    }
+"""
+
+import hashlib
+
+from django.db import models
+from rest_framework import serializers
+
+from etgs_nts.cache import CacheNamespace
+from etgs_nts.conf import setting_reader
+from users.user_cache import user_versions
+
+DEFAULTS = {"ENABLED": True, "CACHE": "default", "TIMEOUT": 3600}
+
+
+fragment_setting = setting_reader("FRAGMENT_CACHE", DEFAULTS)
+
+
+def _fragments():
+    return CacheNamespace("fragments", fragment_setting("CACHE"))
+
+
+def invalidate_fragments():
+    """Drop every cached fragment, e.g. after a bulk update."""
+    _fragments().invalidate()
+
+
+def content_hash(instance):
+    """A short digest of the values of the instance's concrete fields."""
+    values = [
+        field.value_from_object(instance) for field in instance._meta.concrete_fields
+    ]
+    return hashlib.blake2b(repr(values).encode(), digest_size=8).hexdigest()
+
+
+class FragmentListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        if not fragment_setting("ENABLED"):
+            return super().to_representation(iterable)
+        instances = list(iterable)
+        keys = self.child.fragment_keys(instances)
+        fragments = _fragments()
+        cached = fragments.get_many(keys)
+        missed = {}
+        representation = []
+        for instance, key in zip(instances, keys):
+            item = cached.get(key)
+            if item is None:
+                item = missed[key] = self.child.serialize_fragment(instance)
+            representation.append(item)
+        if missed:
+            fragments.set_many(missed, timeout=fragment_setting("TIMEOUT"))
+        return representation
+
+
+class FragmentCacheMixin:
+    """
+    Caches to_representation per object. Set `fragment_name`, and
+    `fragment_owner_field` to the user foreign key the representation
+    renders, and use FragmentListSerializer as the Meta.list_serializer_class.
+    """
+
+    fragment_name = None
+    fragment_owner_field = None
+
+    def fragment_keys(self, instances):
+        owner_ids = [""] * len(instances)
+        if self.fragment_owner_field:
+            attname = self.fragment_owner_field + "_id"
+            owner_ids = [getattr(instance, attname) for instance in instances]
+        # one lookup for all the owners of a page
+        owners = user_versions(set(owner_ids)) if self.fragment_owner_field else {}
+        keys = []
+        for instance, owner_id in zip(instances, owner_ids):
+            last_modified = getattr(instance, "last_modified", None)
+            if last_modified is not None:
+                stamp = last_modified.timestamp()
+            else:
+                stamp = content_hash(instance)
+            owner = owners.get(owner_id, "")
+            keys.append(f"{self.fragment_name}:{instance.pk}:{stamp}:{owner}")
+        return keys
+
+    def serialize_fragment(self, instance):
+        return super().to_representation(instance)
+
+    def to_representation(self, instance):
+        if not fragment_setting("ENABLED") or instance.pk is None:
+            return super().to_representation(instance)
+        (key,) = self.fragment_keys([instance])
+        fragments = _fragments()
+        data = fragments.get(key)
+        if data is None:
+            data = self.serialize_fragment(instance)
+            fragments.set(key, data, timeout=fragment_setting("TIMEOUT"))
+        return data
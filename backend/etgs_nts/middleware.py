@@ -0,0 +1,31 @@
+"""
+Base class for the project's middleware.
+
+Django runs sync-only middleware in a thread when the handler is async, so
+under ASGI a request to an async view would hop to a thread and back for
+each of them. HybridMiddleware is called in the handler's mode instead:
+subclasses implement handle() for WSGI and ahandle() for ASGI.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+
+class HybridMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.ahandle(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    async def ahandle(self, request):
+        raise NotImplementedError
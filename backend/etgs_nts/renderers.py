@@ -0,0 +1,109 @@
+"""
+API renderers and parsers.
+
+orjson serializes the serializer output several times faster than the
+stdlib `json` module DRF uses. FastJSONRenderer and FastJSONParser are
+drop-in replacements for DRF's JSONRenderer and JSONParser and produce the
+same bytes: anything orjson would format differently (datetimes, indented
+output for the browsable API, non-string keys, huge ints, a non UTF-8
+charset) is handed to DRF's encoder or to the stdlib implementation.
+
+Without orjson installed both classes behave exactly like DRF's.
+
+MessagePackRenderer and MessagePackParser serve clients that send
+`Accept: application/msgpack` or `Content-Type: application/msgpack`. The
+body is smaller than JSON and faster to parse on mobile. Values JSON has no
+type for (datetimes, decimals, UUIDs, lazy strings) go through DRF's JSON
+encoder, so they come out exactly as in the JSON responses. msgpack is
+optional, the settings only register these classes when it is installed.
+"""
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser, get_encoding
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+if orjson is not None:
+    # DRF's encoder formats datetimes (`Z` for UTC) and dataclasses itself
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+            is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=ORJSON_OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer escapes U+2028 and U+2029, both encode to \xe2\x80..
+        if b"\xe2\x80" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = get_encoding(parser_context or {})
+        if (
+            orjson is None
+            or not self.strict
+            or encoding.lower().replace("-", "") != "utf8"
+        ):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            # orjson rejects NaN and Infinity, like the strict stdlib parser
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+    encoder_class = encoders.JSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        # datetime=False sends datetimes to `default` instead of the
+        # msgpack timestamp extension
+        return msgpack.packb(
+            data, default=self.encoder_class().default, datetime=False
+        )
+
+
+class MessagePackParser(BaseParser):
+    media_type = "application/msgpack"
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read())
+        except ValueError as exc:
+            raise ParseError("MessagePack parse error - %s" % str(exc))
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+import importlib.util
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,6 +51,9 @@ INSTALLED_APPS = [
     "users",  # custom app
     "comments",  # custom app
     "treasures",  # custom app
+    "perf",  # custom app, benchmarks and performance tooling
+    "events",  # custom app, server-sent event streams
+    "tasks",  # custom app, background jobs
 ]
 
 AUTH_USER_MODEL = "users.User"
@@ -73,6 +77,14 @@ LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"
 
 MIDDLEWARE = [
+    # first, so its timings cover the rest of the stack, see perf/instrumentation.py
+    "perf.instrumentation.RequestMetricsMiddleware",
+    # gzip for larger bodies, cached by ETag, see etgs_nts/compression.py
+    "etgs_nts.compression.CompressionMiddleware",
+    # ETags (of the uncompressed body) and 304s for If-None-Match
+    "django.middleware.http.ConditionalGetMiddleware",
+    # warns about repeated queries when DEBUG is on, see perf/nplusone.py
+    "perf.nplusone.NPlusOneMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -82,18 +94,25 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "allauth.account.middleware.AccountMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # after authentication, so staff sessions can ask for a profile
+    "perf.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "etgs_nts.urls"
 
+# throttling off and a throwaway cache during tests, see etgs_nts/test_runner.py
+TEST_RUNNER = "etgs_nts.test_runner.TestRunner"
+
 # Logging settings
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
     "handlers": {
+        # Same output as logging.FileHandler, written from a background
+        # thread so request threads never wait on the file (see utils.py)
         "file": {
             "level": "DEBUG",
-            "class": "logging.FileHandler",
+            "class": "utils.QueuedFileHandler",
             "filename": "debug.log",
         },
         # "console": {
@@ -124,15 +143,104 @@ LOGGING = {
             "level": "DEBUG",
             "propagate": True,
         },
+        # one JSON line per request from perf.instrumentation, slow queries
+        # from perf.slow_queries and N+1 warnings from perf.nplusone
+        "perf": {
+            "handlers": ["file"],
+            "level": "INFO",
+            "propagate": True,
+        },
     },
 }
 
+# MessagePack is optional, negotiated with Accept/Content-Type:
+# application/msgpack when the msgpack package is installed
+if importlib.util.find_spec("msgpack"):
+    MSGPACK_RENDERERS = ["etgs_nts.renderers.MessagePackRenderer"]
+    MSGPACK_PARSERS = ["etgs_nts.renderers.MessagePackParser"]
+else:
+    MSGPACK_RENDERERS = MSGPACK_PARSERS = []
+
+# Two tier cache, an in-process LRU in front of a SQLite file shared by the
+# workers, see etgs_nts/cache.py
+CACHES = {
+    "default": {
+        "BACKEND": "etgs_nts.cache.TieredCache",
+        "LOCATION": BASE_DIR / "cache.sqlite3",
+        "TIMEOUT": 300,
+        "OPTIONS": {
+            "MAX_ENTRIES": 10000,
+            "L1_MAX_ENTRIES": 1000,
+            "L1_MAX_BYTES": 16 * 1024 * 1024,
+            "L1_TIMEOUT": 30,
+            "SYNC_INTERVAL": 0.25,
+        },
+    }
+}
+
+# Serialized treasures and comments are cached per object, see
+# etgs_nts/fragments.py
+FRAGMENT_CACHE = {
+    "ENABLED": True,
+    "CACHE": "default",
+    "TIMEOUT": 3600,
+}
+
+# Expensive reads are computed once at a time and refreshed in the
+# background, see etgs_nts/coalescing.py
+COALESCING = {
+    "ENABLED": True,
+    "LOCK_TIMEOUT": 30,
+    "WAIT": 10,
+    "REFRESH_WORKERS": 2,
+}
+
+# Delta sync of treasures, see treasures/sync.py
+TREASURE_SYNC = {
+    "TOMBSTONE_RETENTION": 30 * 24 * 3600,
+    "OVERLAP": 5,
+}
+
+# Server-sent event streams, see events/broker.py
+EVENTS = {
+    "POLL_INTERVAL": 1.0,
+    "HEARTBEAT": 15,
+    "QUEUE_SIZE": 100,
+    "REPLAY_LIMIT": 100,
+    "RETENTION": 7 * 24 * 3600,
+}
+
+# Background jobs run by manage.py run_tasks, see tasks/registry.py
+TASKS = {
+    "THREADS": 4,
+    "POLL_INTERVAL": 1.0,
+    "LOCK_TIMEOUT": 600,
+    "BACKOFF": 10,
+    "MAX_BACKOFF": 3600,
+    "RETENTION": 7 * 24 * 3600,
+}
+
+# Several API calls in one request, see etgs_nts/batch.py
+BATCH = {
+    "MAX_REQUESTS": 20,
+    "THREADS": 4,
+    "TIME_BUDGET": 10,
+}
+
+# Response compression, see etgs_nts/compression.py
+RESPONSE_COMPRESSION = {
+    "ENABLED": True,
+    "MIN_SIZE": 1024,
+    "CACHE_ENTRIES": 256,
+    "CACHE_MAX_BYTES": 8 * 1024 * 1024,
+}
+
 # Django REST Framework settings
 REST_FRAMEWORK = {
     # Authentication
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.SessionAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.api.authentication.CachedJWTAuthentication",
     ],
     # Permissions
     "DEFAULT_PERMISSION_CLASSES": [
@@ -141,16 +249,45 @@ REST_FRAMEWORK = {
     # Pagination
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
-    # Renderer and parser settings
+    # Renderer and parser settings, orjson based JSON and MessagePack, see
+    # etgs_nts/renderers.py
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "etgs_nts.renderers.FastJSONRenderer",
+        *MSGPACK_RENDERERS,
         "rest_framework.renderers.BrowsableAPIRenderer",
     ],
+    "DEFAULT_PARSER_CLASSES": [
+        "etgs_nts.renderers.FastJSONParser",
+        *MSGPACK_PARSERS,
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    "TEST_REQUEST_RENDERER_CLASSES": [
+        "rest_framework.renderers.MultiPartRenderer",
+        "rest_framework.renderers.JSONRenderer",
+        *MSGPACK_RENDERERS,
+    ],
     # Exception handling
     "EXCEPTION_HANDLER": "users.api.exceptions.custom_exception_handler",
-    # Throttling
-    "DEFAULT_THROTTLE_CLASSES": [],
-    "DEFAULT_THROTTLE_RATES": {"anon": "100/day", "user": "1000/day"},
+    # Throttling, token buckets shared by the workers, see users/api/throttling.py
+    "DEFAULT_THROTTLE_CLASSES": [
+        "users.api.throttling.AnonBucketThrottle",
+        "users.api.throttling.UserBucketThrottle",
+        "users.api.throttling.ScopedBucketThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "100/hour",
+        "user": "5000/hour",
+        "reads": "300/min",
+        "writes": "60/min",
+        "login": "10/min",
+        "signup": "5/hour",
+    },
+}
+
+THROTTLING = {
+    "ENABLED": True,
+    "PATH": BASE_DIR / "throttle.sqlite3",
 }
 
 SIMPLE_JWT = {
@@ -180,13 +317,64 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
     "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.api.serializers.FilteredTokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
 
+# Refresh tokens are checked against an in-process filter before the
+# blacklist table, see users/blacklist.py. Prune expired tokens with
+# `python manage.py prune_tokens`.
+TOKEN_BLACKLIST_FILTER = {
+    "ENABLED": True,
+    "STAMP_FILE": BASE_DIR / "token_blacklist.stamp",
+    "REBUILD_INTERVAL": 300,
+    "FALSE_POSITIVE_RATE": 0.01,
+}
+
+# Per-request timings, Server-Timing headers and per-route aggregates,
+# see perf/instrumentation.py
+PERF_INSTRUMENTATION = {
+    "ENABLED": True,
+    "SERVER_TIMING": True,
+    "LOG": True,
+    "SAMPLES": 500,
+}
+
+# cProfile requests sent by staff with an X-Profile header, or a sample of
+# all requests, see perf/profiling.py
+PERF_PROFILING = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 0.0,
+    "HEADER": "X-Profile",
+    "DIRECTORY": BASE_DIR / "profiles",
+    "MAX_FILES": 50,
+}
+
+# Statements slower than THRESHOLD_MS are logged and kept for the admin at
+# /admin/perf/slow-queries/, see perf/slow_queries.py
+PERF_SLOW_QUERIES = {
+    "ENABLED": True,
+    "THRESHOLD_MS": 100,
+    "MAX_ENTRIES": 100,
+    "EXPLAIN": True,
+}
+
+# Queries repeated more than THRESHOLD times in one request are logged in
+# development and fail the API tests, see perf/nplusone.py
+PERF_NPLUSONE = {
+    "ENABLED": DEBUG,
+    "THRESHOLD": 2,
+}
+
+# Users resolved from access tokens are cached, see users/user_cache.py
+JWT_USER_CACHE = {
+    "CACHE": "default",
+    "TIMEOUT": 60,
+}
+
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 
 TEMPLATES = [
@@ -213,11 +401,70 @@ WSGI_APPLICATION = "etgs_nts.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite tuned for concurrent requests: WAL lets readers run alongside the
+# single writer, IMMEDIATE transactions take the write lock up front instead
+# of failing with "database is locked" when a read turns into a write, and
+# connections are kept open between requests. Reads of the API apps go to a
+# read-only connection, see etgs_nts/db_router.py.
+SQLITE_PATH = BASE_DIR / "db.sqlite3"
+SQLITE_PRAGMAS = [
+    "PRAGMA synchronous = NORMAL",  # safe with WAL, fsyncs at checkpoints only
+    "PRAGMA busy_timeout = 5000",  # ms to wait for a lock before giving up
+    "PRAGMA cache_size = -20000",  # 20MB page cache per connection
+    "PRAGMA mmap_size = 134217728",  # 128MB of the file memory mapped
+    "PRAGMA temp_store = MEMORY",
+]
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "NAME": SQLITE_PATH,
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": "; ".join(["PRAGMA journal_mode = WAL", *SQLITE_PRAGMAS]),
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 5,
+        },
+    },
+    # same file, opened read-only
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": f"file:{SQLITE_PATH}?mode=ro",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": "; ".join([*SQLITE_PRAGMAS, "PRAGMA query_only = ON"]),
+            "timeout": 5,
+        },
+        "TEST": {"MIRROR": "default"},
+    },
+}
+
+DATABASE_ROUTERS = ["etgs_nts.db_router.ReadReplicaRouter"]
+
+DATABASE_ROUTING = {
+    "READ_ALIAS": "replica",
+    "READ_APPS": ["users", "treasures", "comments"],
+}
+
+# Password hashing
+# The tuned hasher replaces Django's PBKDF2 hasher, changing ITERATIONS
+# rehashes passwords on login. See users/hashing.py for the concurrency cap
+# and queue timeout.
+
+PASSWORD_HASHERS = [
+    "users.hashers.TunedPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+PASSWORD_HASHING = {
+    "MAX_CONCURRENCY": 4,
+    "QUEUE_TIMEOUT": 5.0,
+    "ITERATIONS": None,  # None keeps Django's PBKDF2 default
 }
 
 # Password validation
@@ -0,0 +1,63 @@
+"""
+Lean settings for API workers.
+
+Loads only what the JSON API uses, on top of the regular settings: no admin,
+sessions, messages, allauth, debug toolbar or browsable API. Workers import
+less at boot and every request goes through fewer middleware. Run workers
+with
+
+    DJANGO_SETTINGS_MODULE=etgs_nts.settings_lean
+
+and compare boot times with
+
+    python manage.py boot_time --boot-settings etgs_nts.settings,etgs_nts.settings_lean
+
+The admin, browser logins and the browsable API need the full settings.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import MSGPACK_RENDERERS, REST_FRAMEWORK
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get("DJANGO_ALLOWED_HOSTS", "localhost").split(",")
+
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "rest_framework",
+    "rest_framework_simplejwt.token_blacklist",
+    "users",
+    "comments",
+    "treasures",
+    "perf",
+    "events",
+    "tasks",
+]
+
+MIDDLEWARE = [
+    "perf.instrumentation.RequestMetricsMiddleware",
+    "etgs_nts.compression.CompressionMiddleware",
+    "django.middleware.http.ConditionalGetMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "perf.profiling.ProfilingMiddleware",
+]
+
+AUTHENTICATION_BACKENDS = ["django.contrib.auth.backends.ModelBackend"]
+
+# bearer tokens only, so no session or CSRF handling, and no browsable API
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "users.api.authentication.CachedJWTAuthentication",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "etgs_nts.renderers.FastJSONRenderer",
+        *MSGPACK_RENDERERS,
+    ],
+}
+
+PERF_NPLUSONE = {"ENABLED": False}
@@ -0,0 +1,35 @@
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .cache import throwaway_caches
+
+
+class TestRunner(DiscoverRunner):
+    """
+    DiscoverRunner with throttling switched off and its buckets kept in
+    memory, so tests neither trip the limits nor touch the real store. Tests
+    of the throttles turn it back on with override_settings, see
+    users/api/throttling.py. The caches live in a temporary directory, so
+    nothing cached from the development database leaks into tests.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_dir = tempfile.TemporaryDirectory()
+        self._overrides = override_settings(
+            THROTTLING={
+                **getattr(settings, "THROTTLING", {}),
+                "ENABLED": False,
+                "PATH": ":memory:",
+            },
+            CACHES=throwaway_caches(self._cache_dir.name),
+        )
+        self._overrides.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._overrides.disable()
+        self._cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
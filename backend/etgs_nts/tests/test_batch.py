@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from comments.models import Comment
+from treasures.models import Treasure
+
+User = get_user_model()
+
+
+def authenticated_client(user):
+    client = APIClient()
+    token = RefreshToken.for_user(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return client
+
+
+@override_settings(BATCH={"THREADS": 1})
+class BatchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="user@example.com", handle="user", password="password123"
+        )
+        cls.treasure = Treasure.objects.create(creator=cls.user, name="Treasure")
+        cls.url = reverse("batch")
+
+    def setUp(self):
+        self.client = authenticated_client(self.user)
+
+    def batch(self, *requests):
+        response = self.client.post(self.url, {"requests": requests}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()["responses"]
+
+    def test_reads(self):
+        """Test sub-requests answer like the views they call"""
+        user, treasures, missing = self.batch(
+            {"path": f"/users/{self.user.pk}/"},
+            {"method": "GET", "path": "/treasures/?page=1"},
+            {"path": "/treasures/999999/"},
+        )
+        self.assertEqual(user["status"], 200)
+        self.assertEqual(user["body"]["handle"], "user")
+        self.assertEqual(treasures["status"], 200)
+        self.assertEqual(treasures["body"]["count"], 1)
+        self.assertEqual(missing["status"], 404)
+
+    def test_matches_direct_request(self):
+        """Test a batched read returns the same body as the request itself"""
+        path = f"/treasures/{self.treasure.pk}/"
+        (batched,) = self.batch({"path": path})
+        self.assertEqual(batched["body"], self.client.get(path).json())
+
+    def test_writes_in_order(self):
+        """Test writes run in order and the reads after them see them"""
+        comments = f"/api/treasures/{self.treasure.pk}/comments/"
+        before, created, after = self.batch(
+            {"path": comments},
+            {"method": "POST", "path": comments, "body": {"content": "Nice"}},
+            {"path": comments},
+        )
+        self.assertEqual(before["body"]["count"], 0)
+        self.assertEqual(created["status"], 201)
+        self.assertEqual(after["body"]["count"], 1)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.author, self.user)
+
+    def test_authenticates_once(self):
+        """Test sub-requests use the batch's user"""
+        self.batch({"path": "/me/counters/"})
+        # the user is cached now, one query per sub-request is left
+        with self.assertNumQueries(2):
+            self.batch({"path": "/me/counters/"}, {"path": "/me/counters/"})
+
+    def test_needs_authentication(self):
+        """Test a batch needs a signed in user"""
+        self.client.credentials()
+        response = self.client.post(
+            self.url, {"requests": [{"path": "/treasures/"}]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(BATCH={"THREADS": 1, "MAX_REQUESTS": 2})
+    def test_max_requests(self):
+        """Test batches over MAX_REQUESTS are refused"""
+        requests = [{"path": "/treasures/"}] * 3
+        response = self.client.post(self.url, {"requests": requests}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("requests", response.json())
+
+    def test_invalid(self):
+        """Test malformed sub-requests are refused"""
+        for requests in (
+            [],
+            [{"path": "treasures/"}],
+            [{"method": "TRACE", "path": "/treasures/"}],
+        ):
+            response = self.client.post(
+                self.url, {"requests": requests}, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_only_api_views(self):
+        """Test nested batches and non API views aren't run"""
+        nested, stream = self.batch(
+            {"method": "POST", "path": "/batch/", "body": {"requests": []}},
+            {"path": "/api/events/"},
+        )
+        self.assertEqual(nested["status"], 400)
+        self.assertEqual(stream["status"], 400)
+
+    @override_settings(BATCH={"THREADS": 1, "TIME_BUDGET": -1})
+    def test_time_budget(self):
+        """Test sub-requests past the time budget aren't run"""
+        comments = f"/api/treasures/{self.treasure.pk}/comments/"
+        (created,) = self.batch(
+            {"method": "POST", "path": comments, "body": {"content": "Nice"}}
+        )
+        self.assertEqual(created["status"], 503)
+        self.assertFalse(Comment.objects.exists())
+
+
+class ParallelBatchTests(TransactionTestCase):
+    def test_parallel_reads(self):
+        """Test reads run on the thread pool and keep their order"""
+        user = User.objects.create_user(
+            email="user@example.com", handle="user", password="password123"
+        )
+        treasures = [
+            Treasure.objects.create(creator=user, name=f"Treasure {i}")
+            for i in range(4)
+        ]
+        client = authenticated_client(user)
+        requests = [{"path": f"/treasures/{treasure.pk}/"} for treasure in treasures]
+        response = client.post(reverse("batch"), {"requests": requests}, format="json")
+        responses = response.json()["responses"]
+        self.assertEqual(
+            [r["body"]["name"] for r in responses], [t.name for t in treasures]
+        )
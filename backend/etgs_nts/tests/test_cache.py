@@ -0,0 +1,186 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+
+from etgs_nts.cache import CacheNamespace, LocalTier, TieredCache
+from treasures.cache import treasure_cache
+from treasures.models import Treasure
+
+User = get_user_model()
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.location = str(Path(self.tmpdir.name) / "cache.sqlite3")
+        self.cache = self.make_cache()
+        # the first log read empties L1, get it out of the way
+        self.cache._sync(time.time())
+
+    def make_cache(self, **options):
+        return TieredCache(
+            self.location, {"OPTIONS": {"SYNC_INTERVAL": 0, **options}}
+        )
+
+    def other_worker(self):
+        """A cache on the same file with an L1 of its own, as in another process."""
+        other = self.make_cache()
+        other._l1 = LocalTier()
+        return other
+
+    def stats(self):
+        return self.cache._l1.stats.snapshot()
+
+    def test_get_set(self):
+        """Test values round trip, from L1 first and then from L2"""
+        self.cache.set("key", {"a": [1, 2]})
+        self.assertEqual(self.cache.get("key"), {"a": [1, 2]})
+        self.cache._l1.clear()
+        self.assertEqual(self.cache.get("key"), {"a": [1, 2]})
+        self.assertEqual(self.cache.get("key"), {"a": [1, 2]})
+        self.assertEqual(self.cache.get("missing", "default"), "default")
+        stats = self.stats()
+        self.assertEqual((stats["l1_hits"], stats["l2_hits"], stats["misses"]), (2, 1, 1))
+
+    def test_get_set_many(self):
+        """Test multi-gets read L1 first and then L2 in one query"""
+        self.cache.set_many({"a": 1, "b": 2, "c": 3})
+        self.cache._l1.delete(":1:b")
+        self.assertEqual(
+            self.cache.get_many(["a", "b", "c", "d"]), {"a": 1, "b": 2, "c": 3}
+        )
+        self.assertEqual(self.other_worker().get_many(["c", "a"]), {"a": 1, "c": 3})
+        stats = self.stats()
+        self.assertEqual((stats["l1_hits"], stats["l2_hits"], stats["misses"]), (2, 1, 1))
+
+    def test_values_are_copies(self):
+        """Test mutating a value doesn't change the cached one"""
+        value = [1]
+        self.cache.set("key", value)
+        value.append(2)
+        self.cache.get("key").append(3)
+        self.assertEqual(self.cache.get("key"), [1])
+
+    def test_add_delete_incr_touch(self):
+        """Test the rest of the cache API against L2"""
+        self.assertTrue(self.cache.add("key", 1))
+        self.assertFalse(self.cache.add("key", 2))
+        self.assertEqual(self.cache.incr("key", 5), 6)
+        self.assertEqual(self.other_worker().get("key"), 6)
+        self.assertTrue(self.cache.touch("key", 100))
+        self.assertTrue(self.cache.delete("key"))
+        self.assertIsNone(self.cache.get("key"))
+        with self.assertRaises(ValueError):
+            self.cache.incr("key")
+
+    def test_timeouts(self):
+        """Test expired values are gone from both tiers"""
+        self.cache.set("key", 1, timeout=0.05)
+        self.assertEqual(self.cache.get("key"), 1)
+        time.sleep(0.06)
+        self.assertIsNone(self.cache.get("key"))
+        self.assertIsNone(self.other_worker().get("key"))
+        self.assertTrue(self.cache.add("key", 2))
+
+    def test_l1_timeout(self):
+        """Test values are read from L2 again once their L1 time is up"""
+        cache = self.make_cache(L1_TIMEOUT=0.05)
+        cache.set("key", 1)
+        time.sleep(0.06)
+        self.assertEqual(cache.get("key"), 1)
+        self.assertEqual(self.stats()["l1_expirations"], 1)
+        self.assertEqual(self.stats()["l2_hits"], 1)
+
+    def test_l1_bounded(self):
+        """Test the L1 evicts the least recently used values"""
+        cache = self.make_cache(L1_MAX_ENTRIES=2)
+        for key in "abc":
+            cache.set(key, key)
+        self.assertEqual(list(cache._l1.entries), [":1:b", ":1:c"])
+        self.assertEqual(self.stats()["l1_evictions"], 1)
+        self.assertEqual(cache.get("a"), "a")
+
+    def test_invalidation_broadcast(self):
+        """Test writes by other processes drop the value from this L1"""
+        self.cache.set("key", 1)
+        self.assertEqual(self.cache.get("key"), 1)
+        other = self.other_worker()
+        with mock.patch("etgs_nts.cache.os.getpid", return_value=-1):
+            other.set("key", 2)
+        self.assertEqual(self.cache.get("key"), 2)
+        with mock.patch("etgs_nts.cache.os.getpid", return_value=-1):
+            other.clear()
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(self.stats()["invalidations"], 2)
+
+    def test_stale_read_not_cached(self):
+        """Test a row read before another thread's write isn't put back in L1"""
+        self.cache.set("key", 1)
+        self.cache._l1.clear()
+        read, written = threading.Event(), threading.Event()
+        l1_set = self.cache._l1_set
+
+        def paused_l1_set(*args):
+            read.set()
+            written.wait(5)
+            l1_set(*args)
+
+        with mock.patch.object(self.cache, "_l1_set", paused_l1_set):
+            reader = threading.Thread(target=self.cache.get, args=("key",))
+            reader.start()
+            read.wait(5)
+        # the reader has the old row and hasn't put it in L1 yet
+        self.cache.set("key", 2)
+        written.set()
+        reader.join()
+        self.assertEqual(self.cache.get("key"), 2)
+
+    def test_sync_interval(self):
+        """Test the invalidation log is read at most once per interval"""
+        cache = self.make_cache(SYNC_INTERVAL=60)
+        cache.get("key")
+        cache.set("key", 1)
+        with mock.patch("etgs_nts.cache.os.getpid", return_value=-1):
+            self.other_worker().set("key", 2)
+        self.assertEqual(cache.get("key"), 1)
+
+    def test_cull(self):
+        """Test L2 is culled past MAX_ENTRIES"""
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        with mock.patch("etgs_nts.cache.MAINTENANCE_EVERY", 20):
+            for i in range(20):
+                cache.set(f"key{i}", i, timeout=100 + i)
+        (count,) = cache._db().execute("SELECT count(*) FROM entries").fetchone()
+        self.assertEqual(count, 10)
+        self.assertIsNone(self.other_worker().get("key0"))
+        self.assertEqual(self.other_worker().get("key19"), 19)
+
+
+class CacheNamespaceTests(APITestCase):
+    def test_invalidate(self):
+        """Test invalidating a namespace drops all of its keys only"""
+        namespace = CacheNamespace("things")
+        namespace.set("a", 1)
+        namespace.set_many({"b": 2, "c": 3})
+        cache.set("a", "outside")
+        self.assertEqual(namespace.get_many(["a", "b", "x"]), {"a": 1, "b": 2})
+        namespace.invalidate()
+        self.assertIsNone(namespace.get("a"))
+        self.assertEqual(namespace.get_many(["b", "c"]), {})
+        self.assertEqual(cache.get("a"), "outside")
+
+    def test_model_changes(self):
+        """Test saving a treasure invalidates the treasure namespace"""
+        user = User.objects.create_user(email="user@example.com", password="pw")
+        treasure_cache.set("count", 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Treasure.objects.create(name="Treasure", creator=user)
+        self.assertIsNone(treasure_cache.get("count"))
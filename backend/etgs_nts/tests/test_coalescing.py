@@ -0,0 +1,206 @@
+import threading
+import time
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework.views import APIView
+
+from comments.models import Comment
+from etgs_nts.cache import CacheNamespace
+from etgs_nts.coalescing import (
+    coalesced,
+    get_or_compute,
+    single_flight,
+    wait_for_refreshes,
+)
+from treasures.models import Treasure
+
+User = get_user_model()
+
+
+def run_threads(target, n=5):
+    results = [None] * n
+
+    def run(i):
+        try:
+            results[i] = target()
+        except Exception as exc:
+            results[i] = exc
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class CoalescingTests(SimpleTestCase):
+    def setUp(self):
+        self.namespace = CacheNamespace("coalescing-test")
+        self.namespace.invalidate()
+        self.calls = count(1)
+
+    def compute(self, delay=0):
+        time.sleep(delay)
+        return next(self.calls)
+
+    def test_single_flight(self):
+        """Test concurrent callers share one computation"""
+        results = run_threads(lambda: single_flight("key", lambda: self.compute(0.1)))
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(single_flight("key", self.compute), 2)
+
+    def test_single_flight_errors(self):
+        """Test an error is raised to every waiting caller"""
+
+        def fail():
+            time.sleep(0.1)
+            raise ValueError("failed")
+
+        results = run_threads(lambda: single_flight("key", fail))
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    def test_get_or_compute(self):
+        """Test values are computed once and then read from the cache"""
+        results = run_threads(
+            lambda: get_or_compute(
+                "key", lambda: self.compute(0.1), fresh=60, namespace=self.namespace
+            )
+        )
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(
+            get_or_compute("key", self.compute, fresh=60, namespace=self.namespace), 1
+        )
+
+    def test_stale_while_revalidate(self):
+        """Test stale values are served while they are refreshed in the background"""
+
+        def get():
+            return get_or_compute(
+                "key", self.compute, fresh=0.05, stale=60, namespace=self.namespace
+            )
+
+        self.assertEqual(get(), 1)
+        time.sleep(0.06)
+        self.assertEqual(get(), 1)
+        self.assertEqual(get(), 1)
+        wait_for_refreshes(5)
+        self.assertEqual(get(), 2)
+        self.assertEqual(next(self.calls), 3)
+
+    def test_waits_for_other_workers(self):
+        """Test a key another worker is computing is waited for"""
+        self.namespace.add("key:lock", True)
+
+        def other_worker():
+            time.sleep(0.1)
+            self.namespace.set("key", ("theirs", time.time() + 60))
+            self.namespace.delete("key:lock")
+
+        threading.Thread(target=other_worker).start()
+        value = get_or_compute("key", self.compute, fresh=60, namespace=self.namespace)
+        self.assertEqual(value, "theirs")
+
+    def test_other_worker_gives_up(self):
+        """Test the value is computed when another worker's lock goes away"""
+        self.namespace.add("key:lock", True)
+        threading.Timer(0.1, self.namespace.delete, args=("key:lock",)).start()
+        value = get_or_compute("key", self.compute, fresh=60, namespace=self.namespace)
+        self.assertEqual(value, 1)
+
+    def test_invalidated_while_computing(self):
+        """Test a value computed before an invalidation isn't cached"""
+
+        def invalidated():
+            value = self.compute()
+            self.namespace.invalidate()
+            return value
+
+        def get(compute):
+            return get_or_compute("key", compute, fresh=60, namespace=self.namespace)
+
+        self.assertEqual(get(invalidated), 1)
+        self.assertEqual(get(self.compute), 2)
+        self.assertEqual(get(self.compute), 2)
+
+    @override_settings(COALESCING={"ENABLED": False})
+    def test_disabled(self):
+        """Test values are computed on every call when coalescing is off"""
+        for expected in (1, 2):
+            value = get_or_compute(
+                "key", self.compute, fresh=60, namespace=self.namespace
+            )
+            self.assertEqual(value, expected)
+
+
+class CoalescedView(APIView):
+    permission_classes = []
+    calls = 0
+
+    @coalesced(fresh=60, namespace=CacheNamespace("coalesced-view-test"))
+    def get(self, request):
+        type(self).calls += 1
+        if request.query_params.get("fail"):
+            return Response({"detail": "no"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"calls": self.calls})
+
+
+class CoalescedViewTests(APITestCase):
+    def setUp(self):
+        CacheNamespace("coalesced-view-test").invalidate()
+        CoalescedView.calls = 0
+        self.view = CoalescedView.as_view()
+        self.factory = APIRequestFactory()
+
+    def test_coalesced(self):
+        """Test 200 responses are cached per path and errors are not"""
+        for _ in range(2):
+            response = self.view(self.factory.get("/view/"))
+            self.assertEqual(response.data, {"calls": 1})
+        self.assertEqual(self.view(self.factory.get("/view/?x=1")).data, {"calls": 2})
+        for _ in range(2):
+            response = self.view(self.factory.get("/view/?fail=1"))
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(CoalescedView.calls, 4)
+
+    def test_stats(self):
+        """Test the treasure stats action is cached until a treasure changes"""
+        user = User.objects.create_user(
+            email="user@example.com", handle="user", password="pw"
+        )
+        other = User.objects.create_user(
+            email="other@example.com", handle="other", password="pw"
+        )
+        for category in ("Food", "Food", "Music"):
+            treasure = Treasure.objects.create(
+                creator=user, name="Treasure", category=category
+            )
+        Treasure.objects.create(creator=other, name="Treasure", category="Food")
+        Comment.objects.create(content="Nice", treasure=treasure, author=other)
+        self.client.force_authenticate(user)
+        url = reverse("treasure-stats")
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(response.data["comments"], 1)
+        self.assertEqual(
+            response.data["categories"],
+            [{"category": "Food", "count": 2}, {"category": "Music", "count": 1}],
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data, response.data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Treasure.objects.create(creator=user, name="Treasure", category="Music")
+        self.assertEqual(self.client.get(url).data["count"], 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(content="Again", treasure=treasure, author=other)
+        self.assertEqual(self.client.get(url).data["comments"], 2)
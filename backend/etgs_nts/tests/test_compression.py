@@ -0,0 +1,128 @@
+import gzip
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APITestCase
+
+from etgs_nts.compression import (
+    CompressionMiddleware,
+    accepts_gzip,
+    compressed_bodies,
+)
+from treasures.models import Treasure
+
+User = get_user_model()
+
+BODY = b'{"results": [' + b'{"name": "Treasure"},' * 200 + b"]}"
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        compressed_bodies.clear()
+        self.factory = RequestFactory()
+
+    def process(self, response, accept_encoding="gzip, deflate, br"):
+        request = self.factory.get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_large_bodies(self):
+        """Test bodies over the threshold are gzipped"""
+        response = self.process(HttpResponse(BODY, content_type="application/json"))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_small_bodies(self):
+        """Test bodies under the threshold are sent as they are"""
+        with override_settings(RESPONSE_COMPRESSION={"MIN_SIZE": len(BODY) + 1}):
+            response = self.process(HttpResponse(BODY))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, BODY)
+
+    def test_accept_encoding(self):
+        """Test clients that don't accept gzip get the plain body"""
+        for header in ["", "br", "gzip;q=0", "identity, *;q=0"]:
+            with self.subTest(header=header):
+                response = self.process(HttpResponse(BODY), header)
+                self.assertEqual(response.content, BODY)
+                self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertTrue(accepts_gzip("deflate, GZIP;q=0.5"))
+        self.assertTrue(accepts_gzip("*"))
+
+    def test_already_compressed(self):
+        """Test encoded bodies and compressed media types are skipped"""
+        response = HttpResponse(BODY)
+        response["Content-Encoding"] = "br"
+        self.assertEqual(self.process(response).content, BODY)
+        response = self.process(HttpResponse(BODY, content_type="image/png"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_streaming(self):
+        """Test streaming responses are compressed incrementally"""
+        response = self.process(StreamingHttpResponse(iter([BODY, BODY])))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+        body = b"".join(response.streaming_content)
+        self.assertEqual(gzip.decompress(body), BODY * 2)
+        self.assertEqual(compressed_bodies.stats()["entries"], 0)
+
+    def test_cached_by_etag(self):
+        """Test identical responses reuse the compressed body"""
+        bodies = []
+        for _ in range(3):
+            response = HttpResponse(BODY)
+            response["ETag"] = '"abc"'
+            response = self.process(response)
+            bodies.append(response.content)
+        self.assertEqual(response["ETag"], 'W/"abc"')
+        self.assertEqual(bodies[0], bodies[2])
+        stats = compressed_bodies.stats()
+        self.assertEqual((stats["entries"], stats["hits"], stats["misses"]), (1, 2, 1))
+
+    def test_cached_by_digest(self):
+        """Test bodies without an ETag are cached by digest, changes miss"""
+        self.process(HttpResponse(BODY))
+        self.process(HttpResponse(BODY))
+        response = self.process(HttpResponse(BODY + b" "))
+        self.assertEqual(gzip.decompress(response.content), BODY + b" ")
+        stats = compressed_bodies.stats()
+        self.assertEqual((stats["entries"], stats["hits"]), (2, 1))
+
+    @override_settings(RESPONSE_COMPRESSION={"CACHE_ENTRIES": 2})
+    def test_cache_evicts(self):
+        """Test the least recently used bodies are evicted"""
+        for i in range(4):
+            self.process(HttpResponse(BODY + str(i).encode()))
+        self.assertEqual(compressed_bodies.stats()["entries"], 2)
+
+
+class CompressionAPITests(APITestCase):
+    def setUp(self):
+        compressed_bodies.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="normaluser", password="password123"
+        )
+        for i in range(30):
+            Treasure.objects.create(
+                name=f"Treasure {i}",
+                description="A description. " * 20,
+                creator=self.user,
+            )
+        self.client.force_authenticate(self.user)
+
+    def test_list_compressed(self):
+        """Test large list pages are compressed and revalidate with the weak ETag"""
+        url = reverse("treasure-list") + "?page_size=30"
+        plain = self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content) / 4)
+        response = self.client.get(
+            url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
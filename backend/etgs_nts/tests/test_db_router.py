@@ -0,0 +1,74 @@
+import sqlite3
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TestCase
+
+from etgs_nts.db_router import ReadReplicaRouter
+from treasures.models import Treasure
+
+User = get_user_model()
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_sqlite_options(self):
+        """Test the default database runs in WAL mode and writes take the lock early"""
+        options = settings.DATABASES["default"]["OPTIONS"]
+        self.assertIn("journal_mode = WAL", options["init_command"])
+        self.assertEqual(options["transaction_mode"], "IMMEDIATE")
+        self.assertGreater(settings.DATABASES["default"]["CONN_MAX_AGE"], 0)
+
+
+@mock.patch("etgs_nts.db_router.is_test_mirror", return_value=False)
+class ReadReplicaRouterTests(TestCase):
+    router = ReadReplicaRouter()
+
+    def test_reads_use_replica(self, is_test_mirror):
+        """Test reads of the API apps go to the replica outside transactions"""
+        # TestCase wraps each test in a transaction
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], "in_atomic_block", False):
+            self.assertEqual(self.router.db_for_read(Treasure), "replica")
+            self.assertEqual(self.router.db_for_read(User), "replica")
+            self.assertEqual(self.router.db_for_read(Session), DEFAULT_DB_ALIAS)
+
+    def test_transactions_use_default(self, is_test_mirror):
+        """Test reads inside a transaction go to default"""
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Treasure), DEFAULT_DB_ALIAS)
+
+    def test_writes_use_default(self, is_test_mirror):
+        """Test writes and migrations only use default"""
+        self.assertEqual(self.router.db_for_write(Treasure), DEFAULT_DB_ALIAS)
+        self.assertFalse(self.router.allow_migrate("replica", "treasures"))
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, "treasures"))
+
+
+class ReplicaConnectionTests(SimpleTestCase):
+    def test_replica_is_read_only(self):
+        """Test the replica connection reads the database file but cannot write"""
+        with TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "db.sqlite3"
+            with sqlite3.connect(path) as db:
+                db.execute("CREATE TABLE treasure (name TEXT)")
+                db.execute("INSERT INTO treasure VALUES ('gold')")
+            db.close()
+            replica = DatabaseWrapper(
+                {**connections.settings["replica"], "NAME": f"file:{path}?mode=ro"},
+                alias="replica_check",
+            )
+            try:
+                with replica.cursor() as cursor:
+                    cursor.execute("SELECT name FROM treasure")
+                    self.assertEqual(cursor.fetchall(), [("gold",)])
+                    cursor.execute("PRAGMA query_only")
+                    self.assertEqual(cursor.fetchone(), (1,))
+                    with self.assertRaisesMessage(Exception, "readonly database"):
+                        cursor.execute("DELETE FROM treasure")
+            finally:
+                replica.close()
@@ -0,0 +1,122 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from comments.api.serializers import CommentSerializer
+from comments.models import Comment
+from etgs_nts.fragments import invalidate_fragments
+from treasures.api.serializers import TreasureSerializer
+from treasures.models import Treasure
+
+User = get_user_model()
+
+
+def count_serialized(serializer_class):
+    return mock.patch.object(
+        serializer_class,
+        "serialize_fragment",
+        autospec=True,
+        side_effect=serializer_class.serialize_fragment,
+    )
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        invalidate_fragments()
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="user", password="pw"
+        )
+        self.treasures = [
+            Treasure.objects.create(
+                creator=self.user, name=f"Treasure {i}", category="Things"
+            )
+            for i in range(3)
+        ]
+
+    def page(self):
+        return TreasureSerializer(
+            Treasure.objects.select_related("creator").order_by("id"), many=True
+        ).data
+
+    def test_list_serializes_misses_only(self):
+        """Test a page is served from the cache, except the changed treasures"""
+        with count_serialized(TreasureSerializer) as serialize:
+            first = self.page()
+            self.assertEqual(serialize.call_count, 3)
+            self.assertEqual(self.page(), first)
+            self.assertEqual(serialize.call_count, 3)
+
+            self.treasures[1].name = "Renamed"
+            self.treasures[1].save()
+            page = self.page()
+        self.assertEqual(serialize.call_count, 4)
+        self.assertEqual(page[1]["name"], "Renamed")
+        self.assertEqual(page[1]["short_details"], "Renamed - Things by user")
+        self.assertEqual(page[0], first[0])
+
+    def test_same_as_uncached(self):
+        """Test cached fragments are identical to serializing from scratch"""
+        self.page()
+        cached = self.page()
+        with override_settings(FRAGMENT_CACHE={"ENABLED": False}):
+            self.assertEqual(self.page(), cached)
+            self.assertEqual(TreasureSerializer(self.treasures[0]).data, cached[0])
+
+    def test_creator_changes(self):
+        """Test changing the creator's handle invalidates their treasures"""
+        self.page()
+        self.user.handle = "renamed"
+        self.user.save()
+        page = self.page()
+        self.assertEqual([item["creator_handle"] for item in page], ["renamed"] * 3)
+
+    def test_single_object(self):
+        """Test a single treasure is cached too"""
+        with count_serialized(TreasureSerializer) as serialize:
+            data = TreasureSerializer(self.treasures[0]).data
+            self.assertEqual(TreasureSerializer(self.treasures[0]).data, data)
+        self.assertEqual(serialize.call_count, 1)
+
+    def test_comments(self):
+        """Test comments are keyed by their content and their author"""
+        comment = Comment.objects.create(
+            content="Nice", treasure=self.treasures[0], author=self.user
+        )
+
+        def comments():
+            return Comment.objects.select_related("author")
+
+        with count_serialized(CommentSerializer) as serialize:
+            CommentSerializer(comments(), many=True).data
+            CommentSerializer(comments(), many=True).data
+            self.assertEqual(serialize.call_count, 1)
+
+            comment.content = "Very nice"
+            comment.save()
+            data = CommentSerializer(comments(), many=True).data
+        self.assertEqual(serialize.call_count, 2)
+        self.assertEqual(data[0]["content"], "Very nice")
+
+        self.user.handle = "renamed"
+        self.user.save()
+        data = CommentSerializer(comments(), many=True).data
+        self.assertEqual(data[0]["author"], "renamed")
+
+
+class FragmentCacheViewTests(APITestCase):
+    def test_list(self):
+        """Test the treasure list renders cached fragments"""
+        user = User.objects.create_user(
+            email="user@example.com", handle="user", password="pw"
+        )
+        for i in range(3):
+            Treasure.objects.create(creator=user, name=f"Treasure {i}")
+        self.client.force_authenticate(user)
+        first = self.client.get(reverse("treasure-list")).json()
+        with count_serialized(TreasureSerializer) as serialize:
+            second = self.client.get(reverse("treasure-list")).json()
+        self.assertEqual(serialize.call_count, 0)
+        self.assertEqual(second, first)
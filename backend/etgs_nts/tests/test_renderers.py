@@ -0,0 +1,188 @@
+import datetime
+import decimal
+import io
+import json
+import unittest
+import uuid
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+
+from etgs_nts import renderers
+from etgs_nts.renderers import (
+    FastJSONParser,
+    FastJSONRenderer,
+    MessagePackParser,
+    MessagePackRenderer,
+)
+from treasures.models import Treasure
+
+User = get_user_model()
+
+DATA = {
+    "id": 1,
+    "name": "Ünïcödé \u2028 line \u2029 separators",
+    "added": datetime.datetime(2024, 5, 1, 12, 30, 5, 123456, tzinfo=datetime.UTC),
+    "local": datetime.datetime(2024, 5, 1, 12, 30),
+    "day": datetime.date(2024, 5, 1),
+    "price": decimal.Decimal("1.50"),
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "lazy": gettext_lazy("This field is required."),
+    "nested": [{"a": None, "b": True}, (1, 2.5)],
+}
+
+
+class FastJSONRendererTests(APITestCase):
+    def assertSameBytes(self, data, media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type),
+        )
+
+    def test_identical_output(self):
+        """Test the output matches DRF's JSONRenderer byte for byte"""
+        self.assertSameBytes(DATA)
+        self.assertSameBytes([DATA, DATA])
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def test_falls_back(self):
+        """Test output orjson can't produce the same way comes from DRF's renderer"""
+        self.assertSameBytes({1: "int key"})
+        self.assertSameBytes({"big": 2**70})
+        self.assertSameBytes(DATA, "application/json; indent=4")
+
+    def test_without_orjson(self):
+        """Test the renderer and parser work without orjson installed"""
+        with mock.patch("etgs_nts.renderers.orjson", None):
+            self.assertSameBytes(DATA)
+            data = FastJSONParser().parse(io.BytesIO(b'{"a": [1]}'))
+        self.assertEqual(data, {"a": [1]})
+
+    def test_api_response(self):
+        """Test API responses are rendered with the fast renderer"""
+        user = User.objects.create_user(
+            email="user@example.com", handle="normaluser", password="password123"
+        )
+        Treasure.objects.create(name="Treasure", creator=user)
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(reverse("treasure-list"), HTTP_ACCEPT="application/json")
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+
+class FastJSONParserTests(APITestCase):
+    def test_parse(self):
+        """Test JSON bodies parse like DRF's JSONParser"""
+        body = '{"name": "Trésor", "tags": [1, 2.5, null]}'.encode()
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(body)),
+            {"name": "Trésor", "tags": [1, 2.5, None]},
+        )
+
+    def test_invalid(self):
+        """Test invalid JSON and NaN raise a parse error"""
+        for body in [b"{", b'{"a": NaN}']:
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(body))
+
+    def test_other_charset(self):
+        """Test bodies in other charsets are decoded by the stdlib parser"""
+        body = '{"name": "Trésor"}'.encode("latin-1")
+        data = FastJSONParser().parse(io.BytesIO(body), None, {"encoding": "latin-1"})
+        self.assertEqual(data, {"name": "Trésor"})
+
+    def test_api_request(self):
+        """Test API requests with JSON bodies are parsed with the fast parser"""
+        user = User.objects.create_user(
+            email="user@example.com", handle="normaluser", password="password123"
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(
+            reverse("treasure-list"), {"name": "Treasure"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["name"], "Treasure")
+
+
+@unittest.skipIf(renderers.msgpack is None, "msgpack is not installed")
+class MessagePackTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="normaluser", password="password123"
+        )
+        self.treasure = Treasure.objects.create(name="Treasure", creator=self.user)
+
+    def unpack(self, response):
+        return MessagePackParser().parse(io.BytesIO(response.content))
+
+    def test_values_match_json(self):
+        """Test values JSON has no type for are encoded as in the JSON output"""
+        expected = json.loads(JSONRenderer().render(DATA))
+        self.assertEqual(
+            MessagePackParser().parse(io.BytesIO(MessagePackRenderer().render(DATA))),
+            expected,
+        )
+
+    def test_negotiated(self):
+        """Test list responses are MessagePack when the client accepts it"""
+        self.client.force_authenticate(self.user)
+        url = reverse("treasure-list")
+        json_response = self.client.get(url, HTTP_ACCEPT="application/json")
+        response = self.client.get(url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(self.unpack(response), json.loads(json_response.content))
+
+    def test_request_body(self):
+        """Test MessagePack request bodies are parsed"""
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse("treasure-list"),
+            {"name": "Packed", "category": "Binary"},
+            format="msgpack",
+            HTTP_ACCEPT="application/msgpack",
+        )
+        self.assertEqual(response.status_code, 201)
+        data = self.unpack(response)
+        self.assertEqual(data["name"], "Packed")
+        self.assertTrue(data["date_added"].endswith("Z"))
+
+    def test_login_and_signup(self):
+        """Test the login and signup views negotiate MessagePack"""
+        response = self.client.post(
+            reverse("signup"),
+            {
+                "email": "new@example.com",
+                "handle": "newuser",
+                "password": "securepassword123",
+            },
+            format="msgpack",
+            HTTP_ACCEPT="application/msgpack",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        response = self.client.post(
+            reverse("login"),
+            {"email": "user@example.com", "password": "password123"},
+            format="msgpack",
+            HTTP_ACCEPT="application/msgpack",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", self.unpack(response))
+
+    def test_errors(self):
+        """Test errors are MessagePack too, and bad bodies are a parse error"""
+        response = self.client.get(
+            reverse("treasure-list"), HTTP_ACCEPT="application/msgpack"
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("detail", self.unpack(response))
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b"\xc1"))
@@ -15,15 +15,38 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from .batch import BatchView
+
 urlpatterns = [
-    path("admin/", admin.site.urls),
-    path("api-auth/", include("rest_framework.urls", namespace="rest_framework")),
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("", include("users.api.urls")),
     path("", include("treasures.api.urls")),
+    path("", include("comments.api.urls")),
+    path("", include("perf.urls")),
+    path("", include("events.urls")),
+    path("batch/", BatchView.as_view(), name="batch"),
 ]
+
+# settings_lean leaves out the admin and sessions
+if apps.is_installed("django.contrib.admin"):
+    from django.contrib import admin
+
+    from perf.admin import slow_queries
+
+    urlpatterns += [
+        path(
+            "admin/perf/slow-queries/",
+            admin.site.admin_view(slow_queries),
+            name="perf-slow-queries",
+        ),
+        path("admin/", admin.site.urls),
+    ]
+if apps.is_installed("django.contrib.sessions"):
+    urlpatterns.append(
+        path("api-auth/", include("rest_framework.urls", namespace="rest_framework"))
+    )
@@ -0,0 +1,204 @@
+"""
+Per user event streams, sent to clients as Server-Sent Events.
+
+Events are rows in the Event table, written by publish() in the transaction
+that made the change (see events/signals.py). Each ASGI worker process runs
+one Broker task on its event loop while anyone is subscribed. It reads the
+rows past the last id it has seen and hands each one to the queues of that
+user's subscribers, so the cost of a stream doesn't depend on how many
+clients are connected:
+
+- a commit in this process wakes the task straight away
+- commits in other processes (other workers, WSGI, management commands)
+  are picked up by polling the table every POLL_INTERVAL seconds, one
+  indexed query per worker however many streams are open
+
+An idle subscriber is a coroutine waiting on its queue, with a timer for the
+HEARTBEAT comment that keeps proxies from closing the connection.
+
+Event ids only grow, so a client that reconnects with Last-Event-ID is sent
+the events it missed from the table first. A subscriber that falls more
+than QUEUE_SIZE events behind is disconnected and catches up the same way.
+
+Configured with the EVENTS setting:
+
+    EVENTS = {
+        "POLL_INTERVAL": 1.0,  # seconds between reads of the event table
+        "HEARTBEAT": 15,  # seconds between keep-alive comments
+        "QUEUE_SIZE": 100,  # events buffered per subscriber
+        "REPLAY_LIMIT": 100,  # missed events sent on reconnect, at most
+        "RETENTION": 7 * 24 * 3600,  # seconds events are kept, prune_events
+    }
+"""
+
+import asyncio
+import datetime
+import logging
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from etgs_nts.conf import setting_reader
+from etgs_nts.renderers import FastJSONRenderer
+
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "POLL_INTERVAL": 1.0,
+    "HEARTBEAT": 15,
+    "QUEUE_SIZE": 100,
+    "REPLAY_LIMIT": 100,
+    "RETENTION": 7 * 24 * 3600,
+}
+
+# rows read from the event table per query
+BATCH_SIZE = 500
+
+
+events_setting = setting_reader("EVENTS", DEFAULTS)
+
+
+def frame(event_id, kind, data):
+    """One event in the text/event-stream format."""
+    body = FastJSONRenderer().render(data)
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, kind.encode(), body)
+
+
+def _fields(queryset):
+    return queryset.order_by("id").values_list("id", "user_id", "kind", "data")
+
+
+async def missed_events(user_id, after):
+    """Frames of the user's events after the id `after`, oldest first."""
+    rows = _fields(Event.objects.filter(user_id=user_id, id__gt=after))
+    limit = events_setting("REPLAY_LIMIT")
+    # the most recent ones if there are too many
+    # values_list querysets run their query synchronously in aiterator()
+    rows = await sync_to_async(list)(rows.reverse()[:limit])
+    return [(row[0], frame(row[0], row[2], row[3])) for row in reversed(rows)]
+
+
+class Subscriber:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=events_setting("QUEUE_SIZE"))
+        self.overflowed = False
+
+    def deliver(self, event_id, data):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait((event_id, data))
+        except asyncio.QueueFull:
+            # the stream ends, the client reconnects and replays from the table
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._loop = None
+        self._wake = None
+        self._task = None
+        self.last_id = 0
+
+    async def subscribe(self, user_id):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # first use, or a new loop (each async test has its own)
+            with self._lock:
+                self._loop = loop
+                self._wake = asyncio.Event()
+                self._task = None
+                self._subscribers.clear()
+        if self._task is None:
+            # only events from now on, earlier ones are replayed per client
+            result = await Event.objects.aaggregate(last_id=Max("id"))
+            if self._task is None:
+                self.last_id = result["last_id"] or 0
+                self._task = loop.create_task(self._run())
+        subscriber = Subscriber(user_id)
+        self._subscribers[user_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscribers = self._subscribers.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.user_id]
+
+    def subscriber_count(self):
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def wake(self):
+        """Read new events now, callable from any thread."""
+        with self._lock:
+            loop, wake = self._loop, self._wake
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            # the loop closed in the meantime
+            pass
+
+    async def _run(self):
+        try:
+            while self._subscribers:
+                try:
+                    await asyncio.wait_for(
+                        self._wake.wait(), events_setting("POLL_INTERVAL")
+                    )
+                except TimeoutError:
+                    pass
+                self._wake.clear()
+                try:
+                    await self.dispatch()
+                except Exception:
+                    # e.g. the database is locked, try again on the next round
+                    logger.exception("Reading events failed")
+        finally:
+            self._task = None
+
+    async def dispatch(self):
+        """Hand the events committed since the last call to their subscribers."""
+        while True:
+            rows = _fields(Event.objects.filter(id__gt=self.last_id))
+            rows = await sync_to_async(list)(rows[:BATCH_SIZE])
+            for event_id, user_id, kind, data in rows:
+                self.last_id = event_id
+                subscribers = self._subscribers.get(user_id)
+                if subscribers:
+                    event = frame(event_id, kind, data)
+                    for subscriber in list(subscribers):
+                        subscriber.deliver(event_id, event)
+            if len(rows) < BATCH_SIZE:
+                return
+
+
+broker = Broker()
+
+
+def publish(user_id, kind, data):
+    """Record an event for the user, streamed once the transaction commits."""
+    Event.objects.create(user_id=user_id, kind=kind, data=data)
+    transaction.on_commit(broker.wake)
+
+
+def prune_events(now=None):
+    """Delete events older than RETENTION, returns the count."""
+    now = timezone.now() if now is None else now
+    cutoff = now - datetime.timedelta(seconds=events_setting("RETENTION"))
+    deleted, _ = Event.objects.filter(created__lt=cutoff).delete()
+    return deleted
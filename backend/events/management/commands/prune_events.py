@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from events.broker import prune_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stream events older than EVENTS' RETENTION. Meant to be run "
+        "on a schedule, e.g. from cron."
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune_events()
+        self.stdout.write(f"Pruned {deleted} events.")
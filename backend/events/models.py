@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import models
+
+
+class Event(models.Model):
+    """
+    A notification for one user, written in the same transaction as the
+    change it is about. Its id is the stream position clients resume from
+    with Last-Event-ID, see events/broker.py.
+    """
+
+    COMMENT = "comment"
+    FRIEND_REQUEST = "friend_request"
+    KIND_CHOICES = [
+        (COMMENT, "Comment on one of your treasures"),
+        (FRIEND_REQUEST, "Friend request"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="events"
+    )
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    data = models.JSONField()
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "id"], name="event_user_id")]
+
+    def __str__(self):
+        return f"{self.kind} for {self.user_id}"
@@ -0,0 +1,41 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from comments.models import Comment
+from users.models import FriendshipRequest
+
+from .broker import publish
+from .models import Event
+
+
+@receiver(post_save, sender=Comment)
+def comment_event(sender, instance, created, **kwargs):
+    treasure = instance.treasure
+    if not created or instance.author_id == treasure.creator_id:
+        return
+    publish(
+        treasure.creator_id,
+        Event.COMMENT,
+        {
+            "id": instance.pk,
+            "treasure": treasure.pk,
+            "treasure_name": treasure.name,
+            "author": str(instance.author),
+            "content": instance.shortened,
+        },
+    )
+
+
+@receiver(post_save, sender=FriendshipRequest)
+def friend_request_event(sender, instance, created, **kwargs):
+    if not created:
+        return
+    publish(
+        instance.receiver_id,
+        Event.FRIEND_REQUEST,
+        {
+            "id": instance.pk,
+            "sender": instance.sender_id,
+            "sender_handle": instance.sender.handle,
+        },
+    )
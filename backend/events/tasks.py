@@ -0,0 +1,8 @@
+from tasks.registry import task
+
+from .broker import prune_events as prune
+
+
+@task(every=3600)
+def prune_events():
+    return prune()
@@ -0,0 +1,161 @@
+import asyncio
+import datetime
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from comments.models import Comment
+from events.broker import broker
+from events.models import Event
+from events.views import stream
+from treasures.models import Treasure
+from users.models import FriendshipRequest
+
+User = get_user_model()
+
+FAST = {"POLL_INTERVAL": 0.02, "HEARTBEAT": 60}
+
+
+@override_settings(EVENTS=FAST)
+class EventStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="owner@example.com", handle="owner", password="password123"
+        )
+        cls.other = User.objects.create_user(
+            email="other@example.com", handle="other", password="password123"
+        )
+        cls.treasure = Treasure.objects.create(creator=cls.owner, name="Treasure")
+
+    async def open_stream(self, user, after=None):
+        events = stream(user.pk, after)
+        self.assertEqual(await anext(events), b"retry: 3000\n\n")
+        return events
+
+    async def next_event(self, events, timeout=2):
+        return await asyncio.wait_for(anext(events), timeout)
+
+    async def close(self, events):
+        await events.aclose()
+        if broker._task is not None:
+            broker._task.cancel()
+
+    def make_comment(self, author, content="Nice"):
+        return Comment.objects.create(
+            content=content, treasure=self.treasure, author=author
+        )
+
+    async def comment(self, author, content="Nice"):
+        return await sync_to_async(self.make_comment)(author, content)
+
+    def test_comment_events(self):
+        """Test comments by others on a treasure are an event for its creator"""
+        self.make_comment(self.other, "Lovely")
+        self.make_comment(self.owner, "Thanks")
+        event = Event.objects.get()
+        self.assertEqual(event.user, self.owner)
+        self.assertEqual(event.kind, Event.COMMENT)
+        self.assertEqual(event.data["author"], "other")
+        self.assertEqual(event.data["content"], "Lovely")
+
+    def test_friend_request_events(self):
+        """Test friend requests are an event for their receiver"""
+        request = FriendshipRequest.objects.create(
+            sender=self.other, receiver=self.owner
+        )
+        request.respond(True)
+        event = Event.objects.get()
+        self.assertEqual(event.user, self.owner)
+        self.assertEqual(event.kind, Event.FRIEND_REQUEST)
+        self.assertEqual(event.data["sender_handle"], "other")
+
+    async def test_live_events(self):
+        """Test events are streamed to the subscribed user only"""
+        owner = await self.open_stream(self.owner)
+        other = await self.open_stream(self.other)
+        comment = await self.comment(self.other)
+        event = await self.next_event(owner)
+        self.assertTrue(event.startswith(b"id: "))
+        self.assertIn(b"event: comment\n", event)
+        self.assertIn(b'"id":%d' % comment.pk, event)
+        with self.assertRaises(TimeoutError):
+            await self.next_event(other, timeout=0.1)
+        await self.close(owner)
+        await self.close(other)
+
+    @override_settings(EVENTS={**FAST, "POLL_INTERVAL": 60})
+    async def test_wake(self):
+        """Test a wake up reads new events without waiting for the poll"""
+        events = await self.open_stream(self.owner)
+        # lets the broker start waiting
+        await asyncio.sleep(0)
+        await self.comment(self.other)
+        await sync_to_async(broker.wake)()
+        self.assertIn(b"event: comment", await self.next_event(events))
+        await self.close(events)
+
+    async def test_replay(self):
+        """Test a reconnecting client gets the events it missed first"""
+        await self.comment(self.other, "First")
+        await self.comment(self.other, "Second")
+        seen = await Event.objects.order_by("id").afirst()
+        events = await self.open_stream(self.owner, after=seen.pk)
+        self.assertIn(b"Second", await self.next_event(events))
+        await self.comment(self.other, "Third")
+        self.assertIn(b"Third", await self.next_event(events))
+        await self.close(events)
+
+    @override_settings(EVENTS={**FAST, "HEARTBEAT": 0.05})
+    async def test_heartbeat(self):
+        """Test idle streams send keep-alive comments"""
+        events = await self.open_stream(self.owner)
+        self.assertEqual(await self.next_event(events), b": keep-alive\n\n")
+        await self.close(events)
+
+    @override_settings(EVENTS={**FAST, "QUEUE_SIZE": 1, "POLL_INTERVAL": 60})
+    async def test_slow_subscriber(self):
+        """Test a subscriber that falls behind is disconnected"""
+        events = await self.open_stream(self.owner)
+        await asyncio.sleep(0)
+        for _ in range(3):
+            await self.comment(self.other)
+        await broker.dispatch()
+        with self.assertRaises(StopAsyncIteration):
+            await self.next_event(events)
+        self.assertEqual(broker.subscriber_count(), 0)
+        await self.close(events)
+
+    def test_http(self):
+        """Test the stream endpoint needs a token and sends an event stream"""
+        client = APIClient()
+        url = reverse("event-stream")
+        self.assertEqual(client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        token = RefreshToken.for_user(self.owner).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertNotIn("Content-Encoding", response)
+        response.close()
+
+    def test_prune_events(self):
+        """Test events past the retention are pruned"""
+        self.make_comment(self.other)
+        self.make_comment(self.other)
+        Event.objects.filter(pk=Event.objects.earliest("id").pk).update(
+            created=timezone.now() - datetime.timedelta(days=8)
+        )
+        out = StringIO()
+        call_command("prune_events", stdout=out)
+        self.assertIn("Pruned 1 events", out.getvalue())
+        self.assertEqual(Event.objects.count(), 1)
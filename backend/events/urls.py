@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import event_stream
+
+urlpatterns = [
+    path("api/events/", event_stream, name="event-stream"),
+]
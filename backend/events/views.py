@@ -0,0 +1,64 @@
+import asyncio
+
+from django.http import StreamingHttpResponse
+
+from etgs_nts.async_api import async_api_view
+
+from .broker import broker, events_setting, missed_events
+
+
+def last_event_id(request):
+    # EventSource sends the header on reconnect, ?last_event_id= works for
+    # clients that can't set headers
+    value = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def stream(user_id, after=None):
+    """The event stream of a user, after the event id `after` if given."""
+    # subscribe before reading missed events, so nothing falls in between
+    subscriber = await broker.subscribe(user_id)
+    try:
+        # reconnect after 3 seconds if the connection drops
+        yield b"retry: 3000\n\n"
+        last_sent = 0
+        if after is not None:
+            for event_id, data in await missed_events(user_id, after):
+                last_sent = event_id
+                yield data
+        heartbeat = events_setting("HEARTBEAT")
+        while True:
+            try:
+                item = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            if item is None:
+                # fell behind, the client reconnects and replays the rest
+                return
+            event_id, data = item
+            # events replayed above can be queued as well
+            if event_id > last_sent:
+                last_sent = event_id
+                yield data
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+@async_api_view
+async def event_stream(request):
+    """
+    Server-Sent Events for the user: comments on their treasures and friend
+    requests sent to them. Needs ASGI, see events/broker.py.
+    """
+    response = StreamingHttpResponse(
+        stream(request.user.pk, last_event_id(request)),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # nginx would buffer the stream otherwise
+    response["X-Accel-Buffering"] = "no"
+    return response
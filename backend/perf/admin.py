@@ -0,0 +1,19 @@
+from django.contrib import admin
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+
+from .slow_queries import slow_query_log, slow_query_setting
+
+
+def slow_queries(request):
+    """Admin page listing the slow-query log, POST clears it."""
+    if request.method == "POST":
+        slow_query_log.clear()
+        return redirect(request.path)
+    context = {
+        **admin.site.each_context(request),
+        "title": "Slow queries",
+        "entries": slow_query_log.entries(),
+        "threshold_ms": slow_query_setting("THRESHOLD_MS"),
+    }
+    return TemplateResponse(request, "admin/perf/slow_queries.html", context)
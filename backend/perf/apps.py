@@ -0,0 +1,18 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class PerfConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'perf'
+
+    def ready(self):
+        from . import instrumentation, nplusone, slow_queries
+
+        connection_created.connect(
+            slow_queries.install, dispatch_uid="perf.slow_queries"
+        )
+        connection_created.connect(
+            instrumentation.install, dispatch_uid="perf.instrumentation"
+        )
+        connection_created.connect(nplusone.install, dispatch_uid="perf.nplusone")
@@ -0,0 +1,98 @@
+"""
+Concurrent throughput of the sync DRF views against their native async
+counterparts. Sync views are driven from a thread pool, as a WSGI server
+would, and async views from concurrent tasks on one event loop, as an ASGI
+server would. Used by the `benchmark_async` management command.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from .bench import BenchContext, clear_dataset, percentile, seed_dataset
+
+
+def url_pairs(ctx):
+    """(sync url, async url) for every endpoint with an async version."""
+    treasure = ctx.treasure.id
+    return {
+        "treasure-list": (reverse("treasure-list"), reverse("async-treasure-list")),
+        "treasure-retrieve": (
+            reverse("treasure-detail", args=[treasure]),
+            reverse("async-treasure-detail", args=[treasure]),
+        ),
+        "comment-list": (
+            reverse("comment-list", kwargs={"treasure_pk": treasure}),
+            reverse("async-comment-list", kwargs={"treasure_pk": treasure}),
+        ),
+        "user-retrieve": (
+            reverse("user-detail", args=[ctx.other.id]),
+            reverse("async-user-detail", args=[ctx.other.id]),
+        ),
+    }
+
+
+def _headers(ctx):
+    return {"Authorization": f"Bearer {ctx.access}", "Accept": "application/json"}
+
+
+def run_sync(ctx, url, requests, concurrency):
+    def call(_):
+        start = time.perf_counter()
+        response = Client().get(url, headers=_headers(ctx))
+        assert response.status_code == 200, response.status_code
+        connection.close()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(call, range(requests)))
+    return latencies, time.perf_counter() - start
+
+
+def run_async(ctx, url, requests, concurrency):
+    async def main():
+        client = AsyncClient()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def call():
+            async with slots:
+                start = time.perf_counter()
+                response = await client.get(url, headers=_headers(ctx))
+                assert response.status_code == 200, response.status_code
+                return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(call() for _ in range(requests)))
+        return latencies, time.perf_counter() - start
+
+    return asyncio.run(main())
+
+
+def _stats(latencies, elapsed):
+    return {
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+    }
+
+
+def compare(size=100, requests=200, concurrency=16, stdout=None):
+    clear_dataset()
+    ctx = BenchContext(seed_dataset(size))
+    results = {}
+    for name, (sync_url, async_url) in url_pairs(ctx).items():
+        sync = _stats(*run_sync(ctx, sync_url, requests, concurrency))
+        async_ = _stats(*run_async(ctx, async_url, requests, concurrency))
+        results[name] = {"sync": sync, "async": async_}
+        if stdout:
+            stdout.write(
+                f"{name:<20} sync {sync['throughput_rps']:>8.1f} req/s "
+                f"p95={sync['p95_ms']:.1f}ms | async {async_['throughput_rps']:>8.1f} "
+                f"req/s p95={async_['p95_ms']:.1f}ms"
+            )
+    return results
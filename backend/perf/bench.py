@@ -0,0 +1,255 @@
+"""
+Endpoint benchmarks.
+
+Seeds a dataset, hits every API endpoint a number of times through the DRF
+test client and records latency percentiles, SQL query counts and peak
+memory. This is used by the `benchmark` management command, the tests only
+check the plumbing.
+"""
+
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from treasures.models import Treasure
+from comments.models import Comment
+from .stats import percentile
+
+User = get_user_model()
+
+BENCH_PASSWORD = "benchpassword123"
+
+
+def seed_dataset(size, users=10, comments_per_treasure=2):
+    """
+    Create `users` users owning `size` treasures between them, plus a few
+    comments per treasure. Users share a single password hash so seeding
+    doesn't spend its time hashing.
+    """
+    password = make_password(BENCH_PASSWORD)
+    User.objects.bulk_create(
+        [
+            User(email=f"bench{i}@example.com", handle=f"bench_{i}", password=password)
+            for i in range(users)
+        ]
+    )
+    owners = list(User.objects.filter(handle__startswith="bench_").order_by("id"))
+    Treasure.objects.bulk_create(
+        [
+            Treasure(
+                name=f"Treasure {i}",
+                category=f"Category {i % 7}",
+                description=f"Description for treasure {i}. " * 5,
+                creator=owners[i % len(owners)],
+            )
+            for i in range(size)
+        ]
+    )
+    treasures = list(Treasure.objects.order_by("id"))
+    Comment.objects.bulk_create(
+        [
+            Comment(
+                content=f"Comment {j} on {treasure.name}",
+                treasure=treasure,
+                author=owners[(treasure.id + j) % len(owners)],
+            )
+            for treasure in treasures
+            for j in range(comments_per_treasure)
+        ]
+    )
+    return owners
+
+
+def clear_dataset():
+    Comment.objects.all().delete()
+    Treasure.objects.all().delete()
+    User.objects.all().delete()
+
+
+class BenchContext:
+    """State shared by the endpoint request builders for one dataset."""
+
+    def __init__(self, owners):
+        self.user = owners[0]
+        self.other = owners[1]
+        self.treasure = Treasure.objects.filter(creator=self.user).first()
+        self.access = str(RefreshToken.for_user(self.user).access_token)
+        self.counter = 0
+
+    def unique(self):
+        self.counter += 1
+        return self.counter
+
+
+# Each builder returns (method, url, data, authenticated)
+def treasure_list(ctx):
+    return "get", reverse("treasure-list"), None, True
+
+
+def treasure_list_100(ctx):
+    return "get", reverse("treasure-list") + "?page_size=100", None, True
+
+
+def treasure_retrieve(ctx):
+    return "get", reverse("treasure-detail", args=[ctx.treasure.id]), None, True
+
+
+def treasure_create(ctx):
+    data = {"name": f"New treasure {ctx.unique()}", "category": "Bench"}
+    return "post", reverse("treasure-list"), data, True
+
+
+def comment_list(ctx):
+    url = reverse("comment-list", kwargs={"treasure_pk": ctx.treasure.id})
+    return "get", url, None, True
+
+
+def comment_create(ctx):
+    url = reverse("comment-list", kwargs={"treasure_pk": ctx.treasure.id})
+    return "post", url, {"content": f"Bench comment {ctx.unique()}"}, True
+
+
+def user_list(ctx):
+    return "get", reverse("user-list"), None, True
+
+
+def user_retrieve(ctx):
+    return "get", reverse("user-detail", args=[ctx.other.id]), None, True
+
+
+def signup(ctx):
+    n = ctx.unique()
+    data = {
+        "email": f"signup{n}@example.com",
+        "handle": f"signup_{n}",
+        "password": BENCH_PASSWORD,
+    }
+    return "post", reverse("signup"), data, False
+
+
+def login(ctx):
+    data = {"email": ctx.user.email, "password": BENCH_PASSWORD}
+    return "post", reverse("login"), data, False
+
+
+def token_refresh(ctx):
+    # refresh tokens are rotated and blacklisted, so each call needs a fresh one
+    data = {"refresh": str(RefreshToken.for_user(ctx.user))}
+    return "post", reverse("token_refresh"), data, False
+
+
+ENDPOINTS = {
+    "treasure-list": treasure_list,
+    "treasure-list-100": treasure_list_100,
+    "treasure-retrieve": treasure_retrieve,
+    "treasure-create": treasure_create,
+    "comment-list": comment_list,
+    "comment-create": comment_create,
+    "user-list": user_list,
+    "user-retrieve": user_retrieve,
+    "signup": signup,
+    "login": login,
+    "token-refresh": token_refresh,
+}
+
+
+def _call(client, ctx, builder):
+    method, url, data, authenticated = builder(ctx)
+    if authenticated:
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {ctx.access}")
+    else:
+        client.credentials()
+    response = getattr(client, method)(url, data, format="json")
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method.upper()} {url} returned {response.status_code}")
+    return response
+
+
+def measure_endpoint(client, ctx, builder, iterations=20, warmup=2):
+    for _ in range(warmup):
+        _call(client, ctx, builder)
+
+    timings = []
+    queries = []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            _call(client, ctx, builder)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+
+    # tracemalloc slows everything down, so memory gets its own request
+    tracemalloc.start()
+    try:
+        _call(client, ctx, builder)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "queries": max(queries),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_suite(sizes, endpoints=None, iterations=20, stdout=None):
+    """
+    Benchmark `endpoints` (names from ENDPOINTS, all by default) against a
+    freshly seeded dataset of every size in `sizes`. Expects to run against a
+    throwaway database.
+    """
+    names = endpoints or list(ENDPOINTS)
+    results = {}
+    for size in sizes:
+        clear_dataset()
+        ctx = BenchContext(seed_dataset(size))
+        client = APIClient()
+        client.defaults["HTTP_ACCEPT"] = "application/json"
+        results[str(size)] = {}
+        for name in names:
+            stats = measure_endpoint(client, ctx, ENDPOINTS[name], iterations)
+            results[str(size)][name] = stats
+            if stdout:
+                stdout.write(
+                    f"[{size:>6}] {name:<20} p50={stats['p50_ms']:.2f}ms "
+                    f"p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms "
+                    f"queries={stats['queries']} peak={stats['peak_kb']}KB"
+                )
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold=0.25, min_delta_ms=1.0):
+    """
+    Return a list of human readable regressions. Latency regresses when p95
+    grows by more than `threshold` (and by at least `min_delta_ms`, so tiny
+    endpoints don't flap); query counts regress on any increase.
+    """
+    regressions = []
+    for size, endpoints in results.items():
+        for name, stats in endpoints.items():
+            old = baseline.get(size, {}).get(name)
+            if old is None:
+                continue
+            limit = old["p95_ms"] * (1 + threshold)
+            if stats["p95_ms"] > limit and stats["p95_ms"] - old["p95_ms"] >= min_delta_ms:
+                regressions.append(
+                    f"{name} @ {size}: p95 {stats['p95_ms']:.2f}ms > "
+                    f"{old['p95_ms']:.2f}ms baseline"
+                )
+            if stats["queries"] > old["queries"]:
+                regressions.append(
+                    f"{name} @ {size}: {stats['queries']} queries > "
+                    f"{old['queries']} baseline"
+                )
+    return regressions
@@ -0,0 +1,119 @@
+"""
+Cold start measurements.
+
+Each measurement boots the project in a fresh interpreter, the way a WSGI or
+ASGI worker starts: import the entry point module (which runs django.setup)
+and load the URLconf, which otherwise happens on the first request.
+`python -X importtime` gives the per-module breakdown. Used by the
+`boot_time` management command.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from django.conf import settings
+
+ENTRY_POINTS = {
+    "wsgi": "etgs_nts.wsgi",
+    "asgi": "etgs_nts.asgi",
+}
+
+BOOT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(time.perf_counter() - start)
+"""
+
+
+def _run(module, settings_module, importtime=False):
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module}
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", BOOT_SCRIPT.format(module=module)]
+    result = subprocess.run(
+        command,
+        cwd=Path(settings.BASE_DIR),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"Booting {module} failed:\n{result.stderr}")
+    return result
+
+
+def boot_times(module, settings_module, runs=5):
+    """Wall clock seconds to boot `module` in `runs` fresh interpreters."""
+    return [float(_run(module, settings_module).stdout) for _ in range(runs)]
+
+
+def parse_importtime(output):
+    """
+    Parse `-X importtime` output into (module, self us, cumulative us) tuples,
+    in import order.
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def by_package(modules):
+    """Self time summed by top level package, slowest first."""
+    totals = {}
+    for name, self_us, _ in modules:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def measure(target, settings_module, runs=5, top=20):
+    """Boot time statistics and the slowest imports for one entry point."""
+    module = ENTRY_POINTS[target]
+    times = boot_times(module, settings_module, runs)
+    modules = parse_importtime(_run(module, settings_module, importtime=True).stderr)
+    slowest = sorted(modules, key=lambda module: module[1], reverse=True)[:top]
+    return {
+        "target": target,
+        "settings": settings_module,
+        "runs": runs,
+        "median_ms": round(statistics.median(times) * 1000, 1),
+        "min_ms": round(min(times) * 1000, 1),
+        "modules": len(modules),
+        "packages": [
+            {"package": package, "self_ms": round(us / 1000, 1)}
+            for package, us in by_package(modules)[:top]
+        ],
+        "slowest": [
+            {"module": name, "self_ms": round(self_us / 1000, 1)}
+            for name, self_us, _ in slowest
+        ],
+    }
+
+
+def compare_boot(results, baseline, threshold=0.25, min_delta_ms=20.0):
+    """Human readable boot time regressions against a stored baseline."""
+    regressions = []
+    for key, stats in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        limit = old["median_ms"] * (1 + threshold)
+        if (
+            stats["median_ms"] > limit
+            and stats["median_ms"] - old["median_ms"] >= min_delta_ms
+        ):
+            regressions.append(
+                f"{key}: {stats['median_ms']:.1f}ms > {old['median_ms']:.1f}ms baseline"
+            )
+    return regressions
@@ -0,0 +1,290 @@
+"""
+Per-request performance metrics.
+
+RequestMetricsMiddleware times every request and records how many SQL
+queries it ran and how long they took (through an execute wrapper installed
+on every database connection when it opens, which finds the request through
+a context variable, so queries async views run with sync_to_async count
+too), how long serializers spent in `to_representation` and how big the
+response body was. The numbers go out three ways:
+
+- a `Server-Timing` header, readable in the browser's network panel
+- one JSON log line per request on the "perf.requests" logger
+- per-route aggregates in `route_stats`, served to staff at /perf/routes/
+
+Serializer time is only recorded for serializers that use
+TimedSerializerMixin. It includes any queries the serializer triggers, so a
+serializer with an N+1 shows up in both `db` and `serialize`.
+
+Configured with the PERF_INSTRUMENTATION setting:
+
+    PERF_INSTRUMENTATION = {
+        "ENABLED": True,
+        "SERVER_TIMING": True,  # add the Server-Timing header
+        "LOG": True,  # log a line per request to "perf.requests"
+        "SAMPLES": 500,  # latest durations kept per route for percentiles
+    }
+
+Aggregates are per process, each worker keeps its own.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from etgs_nts.conf import setting_reader
+from etgs_nts.middleware import HybridMiddleware
+
+from .stats import percentile
+
+logger = logging.getLogger("perf.requests")
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SERVER_TIMING": True,
+    "LOG": True,
+    "SAMPLES": 500,
+}
+
+
+perf_setting = setting_reader("PERF_INSTRUMENTATION", DEFAULTS)
+
+
+_current = ContextVar("perf_request_metrics", default=None)
+
+
+def current_metrics():
+    """The RequestMetrics of the request being handled, or None."""
+    return _current.get()
+
+
+class RequestMetrics:
+    __slots__ = ("request", "queries", "db_time", "serialize_time", "_serializing")
+
+    def __init__(self, request=None):
+        self.request = request
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self._serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+def measure_query(execute, sql, params, many, context):
+    """Execute wrapper counting queries into the current request's metrics."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver adding the request metrics wrapper."""
+    if measure_query not in connection.execute_wrappers:
+        # first, because execute_wrapper() pops the last wrapper on exit
+        connection.execute_wrappers.insert(0, measure_query)
+
+
+class TimedSerializerMixin:
+    """
+    Adds the time spent in to_representation to the current request's
+    metrics. Nested serializers are only counted once, by the outermost.
+    """
+
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None or metrics._serializing:
+            return super().to_representation(instance)
+        metrics._serializing = True
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serialize_time += time.perf_counter() - start
+            metrics._serializing = False
+
+
+class RouteStats:
+    """Thread safe running totals per (method, view name)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, method, view, route, status_code, duration, metrics, size):
+        key = (method, view)
+        with self._lock:
+            entry = self._routes.get(key)
+            if entry is None:
+                entry = self._routes[key] = {
+                    "route": route,
+                    "count": 0,
+                    "errors": 0,
+                    "total": 0.0,
+                    "max": 0.0,
+                    "queries": 0,
+                    "db": 0.0,
+                    "serialize": 0.0,
+                    "bytes": 0,
+                    "durations": deque(maxlen=perf_setting("SAMPLES")),
+                }
+            entry["count"] += 1
+            entry["errors"] += status_code >= 500
+            entry["total"] += duration
+            entry["max"] = max(entry["max"], duration)
+            entry["queries"] += metrics.queries
+            entry["db"] += metrics.db_time
+            entry["serialize"] += metrics.serialize_time
+            entry["bytes"] += size or 0
+            entry["durations"].append(duration)
+
+    def snapshot(self, sort="total_ms"):
+        with self._lock:
+            items = [
+                (key, dict(entry, durations=list(entry["durations"])))
+                for key, entry in self._routes.items()
+            ]
+        rows = []
+        for (method, view), entry in items:
+            count = entry["count"]
+            durations = entry["durations"]
+            rows.append(
+                {
+                    "method": method,
+                    "view": view,
+                    "route": entry["route"],
+                    "count": count,
+                    "errors": entry["errors"],
+                    "total_ms": round(entry["total"] * 1000, 3),
+                    "mean_ms": round(entry["total"] / count * 1000, 3),
+                    "p50_ms": round(percentile(durations, 50) * 1000, 3),
+                    "p95_ms": round(percentile(durations, 95) * 1000, 3),
+                    "max_ms": round(entry["max"] * 1000, 3),
+                    "queries_mean": round(entry["queries"] / count, 2),
+                    "db_ms_mean": round(entry["db"] / count * 1000, 3),
+                    "serialize_ms_mean": round(entry["serialize"] / count * 1000, 3),
+                    "bytes_mean": round(entry["bytes"] / count),
+                }
+            )
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_stats = RouteStats()
+
+SORT_KEYS = (
+    "total_ms",
+    "mean_ms",
+    "p95_ms",
+    "max_ms",
+    "count",
+    "queries_mean",
+    "db_ms_mean",
+    "serialize_ms_mean",
+    "bytes_mean",
+)
+
+
+def server_timing(metrics, duration):
+    app = max(duration - metrics.db_time - metrics.serialize_time, 0.0)
+    return ", ".join(
+        [
+            f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"',
+            f"serialize;dur={metrics.serialize_time * 1000:.2f}",
+            f"app;dur={app * 1000:.2f}",
+            f"total;dur={duration * 1000:.2f}",
+        ]
+    )
+
+
+def _view_name(request):
+    match = request.resolver_match
+    if match is None:
+        return "<unresolved>", None
+    return match.view_name, match.route
+
+
+def view_label(request):
+    """The request's view as "METHOD view-name"."""
+    return f"{request.method} {_view_name(request)[0]}"
+
+
+def current_view():
+    """The view of the request being handled as "METHOD view-name", or None."""
+    metrics = _current.get()
+    if metrics is None or metrics.request is None:
+        return None
+    return view_label(metrics.request)
+
+
+class RequestMetricsMiddleware(HybridMiddleware):
+    @contextmanager
+    def _measuring(self, metrics):
+        # measure_query counts into it, on whichever thread the queries run
+        token = _current.set(metrics)
+        try:
+            yield
+        finally:
+            _current.reset(token)
+
+    def handle(self, request):
+        if not perf_setting("ENABLED"):
+            return self.get_response(request)
+
+        metrics = RequestMetrics(request)
+        start = time.perf_counter()
+        with self._measuring(metrics):
+            response = self.get_response(request)
+        return self._record(request, response, metrics, time.perf_counter() - start)
+
+    async def ahandle(self, request):
+        if not perf_setting("ENABLED"):
+            return await self.get_response(request)
+
+        metrics = RequestMetrics(request)
+        start = time.perf_counter()
+        with self._measuring(metrics):
+            response = await self.get_response(request)
+        return self._record(request, response, metrics, time.perf_counter() - start)
+
+    def _record(self, request, response, metrics, duration):
+        size = None if response.streaming else len(response.content)
+        view, route = _view_name(request)
+        route_stats.record(
+            request.method, view, route, response.status_code, duration, metrics, size
+        )
+        if perf_setting("SERVER_TIMING"):
+            response.headers.setdefault("Server-Timing", server_timing(metrics, duration))
+        if perf_setting("LOG") and logger.isEnabledFor(logging.INFO):
+            logger.info(
+                json.dumps(
+                    {
+                        "method": request.method,
+                        "path": request.path,
+                        "view": view,
+                        "status": response.status_code,
+                        "duration_ms": round(duration * 1000, 3),
+                        "queries": metrics.queries,
+                        "db_ms": round(metrics.db_time * 1000, 3),
+                        "serialize_ms": round(metrics.serialize_time * 1000, 3),
+                        "bytes": size,
+                    }
+                )
+            )
+        return response
@@ -0,0 +1,246 @@
+"""
+Concurrent load generator.
+
+Logs a pool of users in through the login endpoint and drives a mix of reads
+and writes against a live server from a thread pool. Unlike `perf.bench`
+this goes over real HTTP, so SQLite write locks, JWT auth and pagination
+all show up under contention. Used by the `loadtest` management command.
+"""
+
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from .bench import percentile
+
+# Upper bounds in milliseconds, the last bucket catches everything slower
+HISTOGRAM_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, float("inf")]
+
+
+class LoadClient:
+    """A tiny JSON over HTTP client for one logged in user."""
+
+    def __init__(self, base_url, timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.access = None
+        self.user_id = None
+        self.treasure_ids = []
+
+    def request(self, method, path, data=None):
+        """Return (status, parsed body or raw text)."""
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=body, method=method.upper()
+        )
+        request.add_header("Accept", "application/json")
+        if body is not None:
+            request.add_header("Content-Type", "application/json")
+        if self.access:
+            request.add_header("Authorization", f"Bearer {self.access}")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, _decode(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, _decode(e.read())
+
+    def login(self, email, password):
+        status, data = self.request(
+            "post", "/login/", {"email": email, "password": password}
+        )
+        if status != 200:
+            raise RuntimeError(f"Login failed for {email}: {status}")
+        self.access = data["access"]
+        self.user_id = data["id"]
+        status, data = self.request("get", "/treasures/?page_size=100")
+        if status == 200:
+            self.treasure_ids = [treasure["id"] for treasure in data["results"]]
+
+
+def _decode(raw):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw.decode(errors="replace")
+
+
+def signup_users(base_url, count, password):
+    """Create `count` fresh users through the signup endpoint."""
+    run = int(time.time())
+    credentials = []
+    for i in range(count):
+        email = f"load{run}_{i}@example.com"
+        status, _ = LoadClient(base_url).request(
+            "post",
+            "/signup/",
+            {"email": email, "handle": f"load{run}_{i}", "password": password},
+        )
+        if status != 201:
+            raise RuntimeError(f"Signup failed for {email}: {status}")
+        credentials.append((email, password))
+    return credentials
+
+
+def login_pool(base_url, credentials, timeout=10):
+    clients = []
+    for email, password in credentials:
+        client = LoadClient(base_url, timeout)
+        client.login(email, password)
+        clients.append(client)
+    return clients
+
+
+# Operations return (status, body), each picks its target from the client state
+def list_treasures(client):
+    return client.request("get", "/treasures/")
+
+
+def retrieve_treasure(client):
+    if not client.treasure_ids:
+        return list_treasures(client)
+    return client.request("get", f"/treasures/{random.choice(client.treasure_ids)}/")
+
+
+def retrieve_user(client):
+    return client.request("get", f"/users/{client.user_id}/")
+
+
+def list_comments(client):
+    if not client.treasure_ids:
+        return list_treasures(client)
+    treasure_id = random.choice(client.treasure_ids)
+    return client.request("get", f"/api/treasures/{treasure_id}/comments/")
+
+
+def create_treasure(client):
+    status, data = client.request(
+        "post", "/treasures/", {"name": "Load treasure", "category": "Load"}
+    )
+    if status == 201:
+        client.treasure_ids.append(data["id"])
+    return status, data
+
+
+def update_treasure(client):
+    if not client.treasure_ids:
+        return create_treasure(client)
+    treasure_id = random.choice(client.treasure_ids)
+    return client.request(
+        "patch", f"/treasures/{treasure_id}/", {"description": "Updated under load"}
+    )
+
+
+def create_comment(client):
+    if not client.treasure_ids:
+        return create_treasure(client)
+    treasure_id = random.choice(client.treasure_ids)
+    return client.request(
+        "post", f"/api/treasures/{treasure_id}/comments/", {"content": "Load comment"}
+    )
+
+
+READS = [list_treasures, retrieve_treasure, retrieve_user, list_comments]
+WRITES = [create_treasure, update_treasure, create_comment]
+
+
+def classify_error(status, body):
+    """Bucket a failed response, `database is locked` gets its own bucket."""
+    if status is None:
+        return "connection error"
+    if "database is locked" in str(body):
+        return "database is locked"
+    return f"HTTP {status}"
+
+
+def run_load(clients, duration=10.0, max_requests=None, write_ratio=0.2, threads=8):
+    """
+    Drive the operation mix from `threads` workers until `duration` seconds
+    have passed or `max_requests` were sent. Returns a list of
+    (operation, latency_ms, error or None) samples and the elapsed time.
+    """
+    samples = []
+    lock = threading.Lock()
+    sent = Counter()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        client = clients[index % len(clients)]
+        while time.perf_counter() < deadline:
+            with lock:
+                if max_requests is not None and sent["total"] >= max_requests:
+                    return
+                sent["total"] += 1
+            operation = random.choice(
+                WRITES if random.random() < write_ratio else READS
+            )
+            start = time.perf_counter()
+            try:
+                status, body = operation(client)
+            except (urllib.error.URLError, OSError):
+                status, body = None, ""
+            latency = (time.perf_counter() - start) * 1000
+            error = None
+            if status is None or status >= 400:
+                error = classify_error(status, body)
+            with lock:
+                samples.append((operation.__name__, latency, error))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+    return samples, time.perf_counter() - start
+
+
+def histogram(latencies):
+    counts = [0] * len(HISTOGRAM_BUCKETS)
+    for latency in latencies:
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if latency <= bound:
+                counts[i] += 1
+                break
+    return counts
+
+
+def summarize(samples, elapsed):
+    by_operation = defaultdict(list)
+    errors = Counter()
+    for operation, latency, error in samples:
+        by_operation[operation].append(latency)
+        if error:
+            errors[error] += 1
+    latencies = [latency for _, latency, _ in samples]
+    total = len(samples)
+    return {
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+        "errors": dict(errors),
+        "operations": {
+            operation: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50), 3),
+                "p95_ms": round(percentile(values, 95), 3),
+                "p99_ms": round(percentile(values, 99), 3),
+            }
+            for operation, values in sorted(by_operation.items())
+        },
+        "histogram": histogram(latencies),
+    }
+
+
+def format_histogram(counts, width=40):
+    lines = []
+    peak = max(counts) or 1
+    lower = 0
+    for bound, count in zip(HISTOGRAM_BUCKETS, counts):
+        label = f"{lower:>5}-{bound:<5}ms" if bound != float("inf") else f"{lower:>5}+      ms"
+        bar = "#" * round(count / peak * width)
+        lines.append(f"{label} {count:>7} {bar}")
+        lower = bound
+    return "\n".join(lines)
@@ -0,0 +1,96 @@
+import json
+import platform
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.utils import timezone
+
+from perf.bench import ENDPOINTS, run_suite, compare_to_baseline
+from perf.testdb import throwaway_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API endpoint against seeded datasets in a throwaway "
+        "test database. Writes JSON results and fails if they regress past "
+        "the threshold compared to a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="10,100,1000",
+            help="Comma separated number of treasures to seed per run.",
+        )
+        parser.add_argument(
+            "--endpoints",
+            default="",
+            help=f"Comma separated subset of: {', '.join(ENDPOINTS)}.",
+        )
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--output", default="bench_results.json")
+        parser.add_argument(
+            "--baseline", default="", help="Baseline JSON to compare against."
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Write the results to --baseline instead of comparing.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Allowed relative p95 growth before failing (0.25 = 25%%).",
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",") if size]
+        endpoints = [name for name in options["endpoints"].split(",") if name]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+        setup_test_environment()
+        try:
+            # measure the views, not the rate limits
+            with throwaway_database(), override_settings(THROTTLING={"ENABLED": False}):
+                results = run_suite(
+                    sizes, endpoints, options["iterations"], stdout=self.stdout
+                )
+        finally:
+            teardown_test_environment()
+
+        report = {
+            "meta": {
+                "created": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "iterations": options["iterations"],
+            },
+            "results": results,
+        }
+        Path(options["output"]).write_text(json.dumps(report, indent=2))
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if not options["baseline"]:
+            return
+        baseline_path = Path(options["baseline"])
+        if options["save_baseline"]:
+            baseline_path.write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Baseline saved to {baseline_path}")
+            return
+        if not baseline_path.exists():
+            raise CommandError(f"Baseline {baseline_path} does not exist.")
+
+        baseline = json.loads(baseline_path.read_text())["results"]
+        regressions = compare_to_baseline(results, baseline, options["threshold"])
+        if regressions:
+            raise CommandError(
+                "Performance regressions:\n" + "\n".join(f"- {r}" for r in regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
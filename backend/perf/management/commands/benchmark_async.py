@@ -0,0 +1,42 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from perf.async_bench import compare
+from perf.testdb import throwaway_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent throughput of the sync read endpoints with their "
+        "native async versions, in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=100)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--output", default="", help="Write JSON results here.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            # measure the views, not the rate limits
+            with throwaway_database(), override_settings(THROTTLING={"ENABLED": False}):
+                results = compare(
+                    options["size"],
+                    options["requests"],
+                    options["concurrency"],
+                    stdout=self.stdout,
+                )
+        finally:
+            teardown_test_environment()
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2))
@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from perf.render_bench import RENDERERS, compare
+from perf.testdb import throwaway_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare render and parse times of the API renderers on a page of "
+        "treasures, in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument(
+            "--renderers",
+            default="",
+            help=f"Comma separated subset of: {', '.join(RENDERERS)}.",
+        )
+        parser.add_argument("--output", default="", help="Write JSON results here.")
+
+    def handle(self, *args, **options):
+        renderers = [name for name in options["renderers"].split(",") if name]
+        unknown = set(renderers) - set(RENDERERS)
+        if unknown:
+            raise CommandError(f"Unknown renderers: {', '.join(sorted(unknown))}")
+
+        setup_test_environment()
+        try:
+            with throwaway_database():
+                results = compare(
+                    options["page_size"],
+                    options["iterations"],
+                    renderers,
+                    stdout=self.stdout,
+                )
+        finally:
+            teardown_test_environment()
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2))
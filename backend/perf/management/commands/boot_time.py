@@ -0,0 +1,109 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from perf.boot import ENTRY_POINTS, compare_boot, measure
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how long WSGI/ASGI workers take to boot, with the slowest "
+        "imports by package and module. Fails on regressions against a "
+        "baseline or past --max-ms."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--targets",
+            default="wsgi,asgi",
+            help=f"Comma separated subset of: {', '.join(ENTRY_POINTS)}.",
+        )
+        parser.add_argument(
+            "--boot-settings",
+            default="",
+            help="Comma separated settings modules to boot with, "
+            "defaults to the current one.",
+        )
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--top", type=int, default=15)
+        parser.add_argument("--output", default="", help="Write JSON results here.")
+        parser.add_argument(
+            "--baseline", default="", help="Baseline JSON to compare against."
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Write the results to --baseline instead of comparing.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Allowed relative boot time growth before failing (0.25 = 25%%).",
+        )
+        parser.add_argument(
+            "--max-ms",
+            type=float,
+            default=None,
+            help="Fail if any median boot time is above this.",
+        )
+
+    def handle(self, *args, **options):
+        targets = [name for name in options["targets"].split(",") if name]
+        unknown = set(targets) - set(ENTRY_POINTS)
+        if unknown:
+            raise CommandError(f"Unknown targets: {', '.join(sorted(unknown))}")
+        settings_modules = [
+            name for name in options["boot_settings"].split(",") if name
+        ] or [settings.SETTINGS_MODULE]
+
+        results = {}
+        for settings_module in settings_modules:
+            for target in targets:
+                try:
+                    stats = measure(
+                        target, settings_module, options["runs"], options["top"]
+                    )
+                except RuntimeError as e:
+                    raise CommandError(str(e))
+                results[f"{target}@{settings_module}"] = stats
+                self.report(stats)
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2))
+
+        problems = []
+        if options["max_ms"] is not None:
+            problems += [
+                f"{key}: {stats['median_ms']:.1f}ms > {options['max_ms']:.1f}ms"
+                for key, stats in results.items()
+                if stats["median_ms"] > options["max_ms"]
+            ]
+        if options["baseline"]:
+            baseline_path = Path(options["baseline"])
+            if options["save_baseline"]:
+                baseline_path.write_text(json.dumps(results, indent=2))
+                self.stdout.write(f"Baseline saved to {baseline_path}")
+            elif not baseline_path.exists():
+                raise CommandError(f"Baseline {baseline_path} does not exist.")
+            else:
+                baseline = json.loads(baseline_path.read_text())
+                problems += compare_boot(results, baseline, options["threshold"])
+        if problems:
+            raise CommandError(
+                "Boot time regressions:\n" + "\n".join(f"- {p}" for p in problems)
+            )
+
+    def report(self, stats):
+        self.stdout.write(
+            f"{stats['target']} with {stats['settings']}: median "
+            f"{stats['median_ms']:.1f}ms, min {stats['min_ms']:.1f}ms, "
+            f"{stats['modules']} modules"
+        )
+        for row in stats["packages"]:
+            self.stdout.write(f"  {row['self_ms']:>8.1f}ms  {row['package']}")
+        self.stdout.write("  slowest modules:")
+        for row in stats["slowest"]:
+            self.stdout.write(f"  {row['self_ms']:>8.1f}ms  {row['module']}")
@@ -0,0 +1,123 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.testcases import LiveServerThread
+from django.test.utils import override_settings
+
+from perf.bench import BENCH_PASSWORD, seed_dataset
+from perf.load import (
+    format_histogram,
+    login_pool,
+    run_load,
+    signup_users,
+    summarize,
+)
+from perf.testdb import throwaway_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive a concurrent mix of reads and writes against a live server and "
+        "report throughput, error rates and latency histograms. Starts its own "
+        "threaded server on a throwaway file based SQLite database unless "
+        "--url points at a running one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", default="", help="Base url of an already running server."
+        )
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--users", type=int, default=8)
+        parser.add_argument(
+            "--duration", type=float, default=10.0, help="Seconds to run for."
+        )
+        parser.add_argument(
+            "--requests", type=int, default=None, help="Stop after this many."
+        )
+        parser.add_argument(
+            "--write-ratio",
+            type=float,
+            default=0.2,
+            help="Fraction of operations that are writes.",
+        )
+        parser.add_argument(
+            "--size", type=int, default=500, help="Treasures to seed."
+        )
+        parser.add_argument("--output", default="", help="Write JSON results here.")
+
+    def handle(self, *args, **options):
+        if not 0 <= options["write_ratio"] <= 1:
+            raise CommandError("--write-ratio must be between 0 and 1.")
+
+        if options["url"]:
+            credentials = signup_users(options["url"], options["users"], BENCH_PASSWORD)
+            report = self.run(options["url"], credentials, options)
+        else:
+            report = self.run_local(options)
+
+        self.print_report(report)
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+
+    def run(self, base_url, credentials, options):
+        self.stdout.write(f"Logging in {len(credentials)} users against {base_url}")
+        clients = login_pool(base_url, credentials)
+        samples, elapsed = run_load(
+            clients,
+            duration=options["duration"],
+            max_requests=options["requests"],
+            write_ratio=options["write_ratio"],
+            threads=options["threads"],
+        )
+        return summarize(samples, elapsed)
+
+    def run_local(self, options):
+        # A file based test database, so server threads get their own
+        # connections and contend for the SQLite write lock like production.
+        # The read replica opens the same file read-only.
+        tmpdir = tempfile.mkdtemp()
+        try:
+            with throwaway_database(Path(tmpdir) / "loadtest.sqlite3"):
+                owners = seed_dataset(options["size"], users=options["users"])
+                credentials = [(owner.email, BENCH_PASSWORD) for owner in owners]
+                connection.close()
+                # every client shares one IP, so throttling would only measure
+                # the rate limits
+                with override_settings(
+                    ALLOWED_HOSTS=["localhost"], THROTTLING={"ENABLED": False}
+                ):
+                    server = LiveServerThread("localhost", lambda handler: handler)
+                    server.daemon = True
+                    server.start()
+                    server.is_ready.wait()
+                    if server.error:
+                        raise server.error
+                    try:
+                        return self.run(
+                            f"http://localhost:{server.port}", credentials, options
+                        )
+                    finally:
+                        server.terminate()
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"\n{report['requests']} requests in {report['elapsed_s']}s: "
+            f"{report['throughput_rps']} req/s, error rate {report['error_rate']:.2%}"
+        )
+        for error, count in sorted(report["errors"].items()):
+            self.stdout.write(self.style.WARNING(f"  {error}: {count}"))
+        self.stdout.write("")
+        for operation, stats in report["operations"].items():
+            self.stdout.write(
+                f"  {operation:<20} n={stats['count']:<6} p50={stats['p50_ms']:.1f}ms "
+                f"p95={stats['p95_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms"
+            )
+        self.stdout.write("\nLatency histogram:")
+        self.stdout.write(format_histogram(report["histogram"]))
@@ -0,0 +1,186 @@
+"""
+N+1 query detection.
+
+NPlusOneDetector counts SELECT statements by request, normalized shape and
+the project code that issued them. A shape that runs more than THRESHOLD
+times from the same place in one request is almost always a relation loaded
+lazily inside a loop, e.g. `obj.creator.handle` in a serializer method
+without `select_related("creator")` on the queryset.
+
+- In development, NPlusOneMiddleware logs a warning on "perf.nplusone"
+  for every request with a repeated shape.
+- In tests, NPlusOneTestMixin fails any test whose requests repeat a shape.
+  The API test base classes use it, set `check_n_plus_one = False` on a
+  test class to switch it off.
+
+The middleware marks the request being handled, whether detection is on or
+not, so queries are grouped by request; queries run outside a request are
+grouped together. Detectors see queries through an execute wrapper added to
+every connection as it opens, so queries an async view runs in a thread are
+counted too.
+
+Configured with the PERF_NPLUSONE setting:
+
+    PERF_NPLUSONE = {
+        "ENABLED": DEBUG,  # the middleware, tests always check
+        "THRESHOLD": 2,  # repeats of one shape allowed per request
+    }
+"""
+
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from etgs_nts.conf import setting_reader
+from etgs_nts.middleware import HybridMiddleware
+
+from .instrumentation import view_label
+from .sql import normalize_sql, project_frames
+
+logger = logging.getLogger("perf.nplusone")
+
+DEFAULTS = {
+    "ENABLED": False,
+    "THRESHOLD": 2,
+}
+
+
+# the request being handled and the detectors running, per thread and task
+_request = ContextVar("perf_nplusone_request", default=None)
+_detectors = ContextVar("perf_nplusone_detectors", default=())
+
+
+nplusone_setting = setting_reader("PERF_NPLUSONE", DEFAULTS)
+
+
+def detect_query(execute, sql, params, many, context):
+    """Execute wrapper handing SELECTs to the running detectors."""
+    detectors = _detectors.get()
+    if detectors and not many and sql.lstrip()[:6].upper() == "SELECT":
+        frames = project_frames(limit=1)
+        site = frames[0] if frames else "<unknown>"
+        for detector in detectors:
+            detector.count(_request.get(), sql, site)
+    return execute(sql, params, many, context)
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver adding the detection wrapper."""
+    if detect_query not in connection.execute_wrappers:
+        # first, because execute_wrapper() pops the last wrapper on exit
+        connection.execute_wrappers.insert(0, detect_query)
+
+
+@contextmanager
+def _handling(request):
+    token = _request.set(request)
+    try:
+        yield
+    finally:
+        _request.reset(token)
+
+
+class NPlusOneDetector:
+    """
+    Counts SELECTs while active, in this thread or task and the threads it
+    hands work to with sync_to_async. Use as a context manager or with
+    start() and stop().
+    """
+
+    def __init__(self, threshold=None):
+        self.threshold = (
+            nplusone_setting("THRESHOLD") if threshold is None else threshold
+        )
+        self.counts = Counter()
+        self.views = {}
+        self._token = None
+
+    def count(self, request, sql, site):
+        # the request object tells requests apart, None outside one
+        key = (request, normalize_sql(sql), site)
+        self.counts[key] += 1
+        if key not in self.views:
+            self.views[key] = None if request is None else view_label(request)
+
+    def start(self):
+        self._token = _detectors.set(_detectors.get() + (self,))
+        return self
+
+    def stop(self):
+        _detectors.reset(self._token)
+        self._token = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def violations(self):
+        """(view, shape, call site, count) for every shape over the threshold."""
+        found = []
+        for key, count in self.counts.items():
+            if count > self.threshold:
+                _, shape, site = key
+                found.append((self.views[key], shape, site, count))
+        return found
+
+    def report(self):
+        lines = [
+            f"{count} x {shape}\n    from {site} in {view or '<no request>'}"
+            for view, shape, site, count in self.violations()
+        ]
+        return (
+            f"Queries repeated more than {self.threshold} times, "
+            "probably an N+1:\n" + "\n".join(lines)
+        )
+
+
+class NPlusOneMiddleware(HybridMiddleware):
+    def handle(self, request):
+        # marked even when off, tests and other detectors group by request
+        with _handling(request):
+            if not nplusone_setting("ENABLED"):
+                return self.get_response(request)
+            with NPlusOneDetector() as detector:
+                response = self.get_response(request)
+        self._warn(request, detector)
+        return response
+
+    async def ahandle(self, request):
+        with _handling(request):
+            if not nplusone_setting("ENABLED"):
+                return await self.get_response(request)
+            with NPlusOneDetector() as detector:
+                response = await self.get_response(request)
+        self._warn(request, detector)
+        return response
+
+    def _warn(self, request, detector):
+        if detector.violations():
+            logger.warning("%s %s: %s", request.method, request.path, detector.report())
+
+
+class NPlusOneTestMixin:
+    """
+    Fails tests that repeat a query shape more than `n_plus_one_threshold`
+    (default PERF_NPLUSONE["THRESHOLD"]) times within one request. Detection
+    starts when this setUp runs, so call super().setUp() after creating
+    fixtures.
+    """
+
+    check_n_plus_one = True
+    n_plus_one_threshold = None
+
+    def setUp(self):
+        super().setUp()
+        if not self.check_n_plus_one:
+            return
+        detector = NPlusOneDetector(self.n_plus_one_threshold).start()
+        self.addCleanup(self._check_n_plus_one, detector)
+
+    def _check_n_plus_one(self, detector):
+        detector.stop()
+        if detector.violations():
+            self.fail(detector.report())
@@ -0,0 +1,171 @@
+"""
+Opt-in request profiling.
+
+ProfilingMiddleware runs a request under cProfile when a staff user sends
+the profiling header (`X-Profile: 1` by default) or when the request is
+picked by the sample rate. Each profile is written as a pstats file, which
+snakeviz opens directly (`snakeviz profiles/<file>.prof`), into a directory
+that keeps only the newest MAX_FILES profiles.
+
+Requests that are not profiled pay for one header lookup and, with a
+non-zero sample rate, one random number. Only one request per process is
+profiled at a time; others that would have been are just served.
+
+Under ASGI a request's work is split between the event loop and the thread
+its sync code (sync views, DRF included) runs in. Both are profiled and
+saved as one profile: the loop from the middleware, the thread from
+process_view(), which Django runs in that same thread. The loop part also
+records whatever other requests the loop runs meanwhile.
+
+Configured with the PERF_PROFILING setting:
+
+    PERF_PROFILING = {
+        "ENABLED": True,
+        "SAMPLE_RATE": 0.0,  # fraction of all requests to profile
+        "HEADER": "X-Profile",  # staff only
+        "DIRECTORY": BASE_DIR / "profiles",
+        "MAX_FILES": 50,
+    }
+"""
+
+import cProfile
+import logging
+import pstats
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import APIException
+
+from etgs_nts.conf import setting_reader
+from etgs_nts.middleware import HybridMiddleware
+from users.api.authentication import CachedJWTAuthentication
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 0.0,
+    "HEADER": "X-Profile",
+    "DIRECTORY": "profiles",
+    "MAX_FILES": 50,
+}
+
+
+profiling_setting = setting_reader("PERF_PROFILING", DEFAULTS)
+
+
+def _is_staff(request):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    # API clients send a bearer token, which DRF only reads inside the view
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return result is not None and result[0].is_staff
+
+
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9]+", "-", text).strip("-")[:60] or "root"
+
+
+def rotate(directory, max_files):
+    """Delete all but the newest `max_files` profiles in `directory`."""
+    profiles = sorted(directory.glob("*.prof"), key=lambda path: path.name)
+    for path in profiles[: max(len(profiles) - max_files, 0)]:
+        path.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self._busy = threading.Lock()
+
+    def _sampled(self):
+        rate = profiling_setting("SAMPLE_RATE")
+        return rate > 0 and random.random() < rate
+
+    def _wanted(self, request):
+        if request.headers.get(profiling_setting("HEADER")):
+            return _is_staff(request)
+        return self._sampled()
+
+    def handle(self, request):
+        if not profiling_setting("ENABLED") or not self._wanted(request):
+            return self.get_response(request)
+        if not self._busy.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - start
+            name = self._save(request, [profiler], duration)
+        finally:
+            self._busy.release()
+        response.headers["X-Profile-Id"] = name
+        return response
+
+    async def ahandle(self, request):
+        if not profiling_setting("ENABLED"):
+            return await self.get_response(request)
+        if request.headers.get(profiling_setting("HEADER")):
+            # the session or token lookup is synchronous
+            wanted = await sync_to_async(_is_staff)(request)
+        else:
+            wanted = self._sampled()
+        if not wanted or not self._busy.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            # started by process_view() in the request's sync thread
+            request._thread_profiler = thread_profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profiler.disable()
+                # the same thread as process_view(), it's per request
+                await sync_to_async(thread_profiler.disable)()
+            duration = time.perf_counter() - start
+            name = await sync_to_async(self._save)(
+                request, [profiler, thread_profiler], duration
+            )
+        finally:
+            self._busy.release()
+        response.headers["X-Profile-Id"] = name
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # sync, so under ASGI Django calls it in the thread the view runs in
+        thread_profiler = getattr(request, "_thread_profiler", None)
+        if thread_profiler is not None:
+            thread_profiler.enable()
+
+    def _save(self, request, profilers, duration):
+        directory = Path(profiling_setting("DIRECTORY"))
+        directory.mkdir(parents=True, exist_ok=True)
+        match = request.resolver_match
+        view = match.view_name if match else request.path
+        # time first, so names sort oldest to newest for rotate()
+        name = (
+            f"{time.time_ns()}-{request.method}-{_slug(view)}-"
+            f"{round(duration * 1000)}ms.prof"
+        )
+        stats = pstats.Stats()
+        # pstats refuses empty profiles, e.g. a thread that ran no view
+        stats.add(*[profiler for profiler in profilers if profiler.getstats()])
+        stats.dump_stats(directory / name)
+        rotate(directory, profiling_setting("MAX_FILES"))
+        logger.info("Profiled %s %s into %s", request.method, request.path, name)
+        return name
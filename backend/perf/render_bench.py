@@ -0,0 +1,104 @@
+"""
+Renderer and parser benchmarks.
+
+Renders a page of treasures, the way TreasureViewSet's list returns it,
+with every renderer in RENDERERS and parses the result back. Records the
+median time of each, the body size, whether the parsed data matches the
+JSON output and, for JSON renderers, whether the bytes match DRF's stdlib
+JSONRenderer. Used by the `benchmark_renderers` management command.
+"""
+
+import io
+import json
+import statistics
+import time
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from etgs_nts import renderers
+from etgs_nts.renderers import (
+    FastJSONParser,
+    FastJSONRenderer,
+    MessagePackParser,
+    MessagePackRenderer,
+)
+from treasures.api.serializers import TreasureSerializer
+from treasures.models import Treasure
+
+from .bench import clear_dataset, seed_dataset
+
+RENDERERS = {
+    "json": (JSONRenderer, JSONParser),
+    "orjson": (FastJSONRenderer, FastJSONParser),
+}
+if renderers.msgpack is not None:
+    RENDERERS["msgpack"] = (MessagePackRenderer, MessagePackParser)
+
+
+def treasure_page(page_size=100):
+    """A paginated treasure list response body, as the viewset builds it."""
+    treasures = Treasure.objects.select_related("creator").order_by("id")[:page_size]
+    return {
+        "count": Treasure.objects.count(),
+        "next": "http://testserver/treasures/?page=2",
+        "previous": None,
+        "results": TreasureSerializer(treasures, many=True).data,
+    }
+
+
+def _median_ms(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 4)
+
+
+def measure_renderer(renderer_class, parser_class, data, iterations=200):
+    renderer = renderer_class()
+    parser = parser_class()
+    body = renderer.render(data, renderer.media_type)
+    parsed = parser.parse(io.BytesIO(body), parser.media_type)
+    return body, parsed, {
+        "render_ms": _median_ms(
+            lambda: renderer.render(data, renderer.media_type), iterations
+        ),
+        "parse_ms": _median_ms(
+            lambda: parser.parse(io.BytesIO(body), parser.media_type), iterations
+        ),
+        "bytes": len(body),
+    }
+
+
+def compare(page_size=100, iterations=200, names=None, stdout=None):
+    """
+    Benchmark the renderers in `names` (keys of RENDERERS, all by default) on
+    a page of `page_size` treasures. Expects to run against a throwaway
+    database.
+    """
+    clear_dataset()
+    seed_dataset(page_size)
+    data = treasure_page(page_size)
+    reference = JSONRenderer().render(data)
+    expected = json.loads(reference)
+    results = {}
+    for name in names or RENDERERS:
+        renderer_class, parser_class = RENDERERS[name]
+        body, parsed, stats = measure_renderer(
+            renderer_class, parser_class, data, iterations
+        )
+        stats["same_data"] = parsed == expected
+        if renderer_class.media_type == JSONRenderer.media_type:
+            stats["identical"] = body == reference
+        results[name] = stats
+        if stdout:
+            stdout.write(
+                f"{name:<10} render={stats['render_ms']:.3f}ms "
+                f"parse={stats['parse_ms']:.3f}ms bytes={stats['bytes']} "
+                f"({stats['bytes'] / len(reference):.0%} of JSON) "
+                f"same_data={stats['same_data']}"
+                + (f" identical={stats['identical']}" if "identical" in stats else "")
+            )
+    return results
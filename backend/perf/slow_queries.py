@@ -0,0 +1,169 @@
+"""
+Slow-query log.
+
+`slow_query_log` is installed as an execute wrapper on every database
+connection when it opens (see PerfConfig.ready). Statements slower than the
+threshold are logged on "perf.slow_queries" with their normalized SQL,
+parameters, the request's view and the project code that issued them (the
+innermost frames outside Django and DRF), and kept in a bounded
+buffer with one entry per query shape. The first time a shape is seen its
+plan is captured with EXPLAIN QUERY PLAN (EXPLAIN on other backends).
+
+Staff can browse the buffer in the admin at /admin/perf/slow-queries/.
+Entries are per process, each worker keeps its own.
+
+Configured with the PERF_SLOW_QUERIES setting:
+
+    PERF_SLOW_QUERIES = {
+        "ENABLED": True,
+        "THRESHOLD_MS": 100,
+        "MAX_ENTRIES": 100,  # query shapes kept, least recently seen dropped
+        "EXPLAIN": True,
+    }
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.utils import timezone
+
+from etgs_nts.conf import setting_reader
+
+from .instrumentation import current_view
+from .sql import fingerprint, normalize_sql, project_frames
+
+logger = logging.getLogger("perf.slow_queries")
+
+DEFAULTS = {
+    "ENABLED": True,
+    "THRESHOLD_MS": 100,
+    "MAX_ENTRIES": 100,
+    "EXPLAIN": True,
+}
+
+# longest repr kept for each parameter
+MAX_PARAM_LENGTH = 200
+
+
+slow_query_setting = setting_reader("PERF_SLOW_QUERIES", DEFAULTS)
+
+
+def _params(params, many):
+    if params is None:
+        return []
+    if many:
+        # executemany: keep the first row, it shows the shape
+        params = next(iter(params), ())
+    if isinstance(params, dict):
+        params = params.values()
+    return [repr(param)[:MAX_PARAM_LENGTH] for param in params]
+
+
+def explain(connection, sql, params):
+    """The plan for `sql` as a list of lines, or None if it cannot be explained."""
+    if sql.lstrip()[:6].upper() != "SELECT":
+        return None
+    prefix = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [" ".join(str(col) for col in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+
+
+class SlowQueryLog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(self._local, "explaining", False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = (time.perf_counter() - start) * 1000
+        if duration >= slow_query_setting("THRESHOLD_MS") and slow_query_setting(
+            "ENABLED"
+        ):
+            self.record(context["connection"], sql, params, many, duration)
+        return result
+
+    def record(self, connection, sql, params, many, duration):
+        normalized = normalize_sql(sql)
+        key = fingerprint(normalized)
+        frames = project_frames()
+        view = current_view()
+        now = timezone.now()
+        logger.warning(
+            "Slow query (%.1f ms) in %s at %s: %s",
+            duration,
+            view or "<no request>",
+            frames[0] if frames else "<unknown>",
+            normalized,
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["count"] += 1
+                entry["total_ms"] += duration
+                entry["max_ms"] = max(entry["max_ms"], duration)
+                entry["last_ms"] = duration
+                entry["last_seen"] = now
+                entry["sql"] = sql
+                entry["params"] = _params(params, many)
+                entry["stack"] = frames
+                entry["view"] = view
+                self._entries.move_to_end(key)
+                return
+        plan = None
+        if slow_query_setting("EXPLAIN") and not many:
+            self._local.explaining = True
+            try:
+                plan = explain(connection, sql, params)
+            finally:
+                self._local.explaining = False
+        with self._lock:
+            self._entries[key] = {
+                "fingerprint": key,
+                "normalized": normalized,
+                "sql": sql,
+                "params": _params(params, many),
+                "alias": connection.alias,
+                "view": view,
+                "count": 1,
+                "total_ms": duration,
+                "max_ms": duration,
+                "last_ms": duration,
+                "first_seen": now,
+                "last_seen": now,
+                "stack": frames,
+                "plan": plan,
+            }
+            while len(self._entries) > slow_query_setting("MAX_ENTRIES"):
+                self._entries.popitem(last=False)
+
+    def entries(self):
+        """Entries, slowest total time first."""
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        for entry in entries:
+            entry["mean_ms"] = entry["total_ms"] / entry["count"]
+        return sorted(entries, key=lambda entry: entry["total_ms"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+
+def install(connection, **kwargs):
+    """connection_created receiver adding the slow query wrapper."""
+    if slow_query_log not in connection.execute_wrappers:
+        # first, because execute_wrapper() pops the last wrapper on exit
+        connection.execute_wrappers.insert(0, slow_query_log)
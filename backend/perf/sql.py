@@ -0,0 +1,71 @@
+"""
+Helpers for grouping SQL statements: normalizing them to a shape and
+finding the line of project code that issued them.
+"""
+
+import hashlib
+import re
+import sys
+from pathlib import Path
+
+from django.conf import settings
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """
+    The shape of a statement: literals and placeholders become ?, lists of
+    them collapse to (...) and whitespace is squeezed, so the same query with
+    different values normalizes to the same string.
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+
+_PROJECT = str(Path(settings.BASE_DIR).resolve())
+# the query tracking machinery itself
+_HERE = Path(__file__).resolve().parent
+_SKIP = {
+    str(_HERE / name)
+    for name in (
+        "sql.py",
+        "instrumentation.py",
+        "profiling.py",
+        "slow_queries.py",
+        "nplusone.py",
+    )
+}
+
+
+def project_frames(limit=5):
+    """
+    The innermost `limit` stack frames that are project code, innermost
+    first, as "path:line in function". Django, DRF, the standard library and
+    the query tracking modules are skipped, which leaves the view,
+    serializer or permission that ran the query.
+    """
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < limit:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(_PROJECT)
+            and filename not in _SKIP
+            and "site-packages" not in filename
+        ):
+            path = filename[len(_PROJECT) + 1 :]
+            frames.append(f"{path}:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    return frames
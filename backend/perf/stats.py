@@ -0,0 +1,10 @@
+import math
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile, values does not need to be sorted."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
@@ -0,0 +1,53 @@
+import tempfile
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+
+from etgs_nts.cache import throwaway_caches
+
+
+@contextmanager
+def throwaway_database(path=None):
+    """
+    Create a test database for the default alias for the duration of the
+    block, like the test runner does. It is in memory unless `path` is
+    given. Test mirrors of default (the read replica) are pointed at it:
+    read-only on the same file when there is one, else as a mirror that
+    the router reads through default. The caches move to a temporary
+    directory, so cached rows of the real database can't leak in.
+    """
+    default = connections[DEFAULT_DB_ALIAS]
+    test_settings = default.settings_dict.setdefault("TEST", {})
+    old_test_name = test_settings.get("NAME")
+    if path is not None:
+        test_settings["NAME"] = str(path)
+    old_name = default.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    # NAME is changed in place: connections opened by other threads, e.g.
+    # a live server's, are built from the same settings dicts.
+    mirrors = {
+        alias: connections[alias].settings_dict
+        for alias in connections
+        if connections[alias].settings_dict.get("TEST", {}).get("MIRROR")
+        == DEFAULT_DB_ALIAS
+    }
+    old_names = {alias: mirror["NAME"] for alias, mirror in mirrors.items()}
+    for alias, mirror in mirrors.items():
+        connections[alias].close()
+        if path is not None:
+            mirror["NAME"] = f"file:{path}?mode=ro"
+        else:
+            mirror["NAME"] = default.settings_dict["NAME"]
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(
+            CACHES=throwaway_caches(cache_dir)
+        ):
+            yield
+    finally:
+        for alias, mirror in mirrors.items():
+            connections[alias].close()
+            mirror["NAME"] = old_names[alias]
+        default.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings["NAME"] = old_test_name
@@ -0,0 +1,64 @@
+from django.test import TestCase
+
+from perf.bench import ENDPOINTS, percentile, run_suite, compare_to_baseline
+
+
+class PercentileTests(TestCase):
+    def test_nearest_rank(self):
+        """Test percentiles use the nearest rank of the sorted values"""
+        values = [5, 1, 4, 2, 3, 10, 9, 8, 7, 6]
+        self.assertEqual(percentile(values, 50), 5)
+        self.assertEqual(percentile(values, 95), 10)
+        self.assertEqual(percentile(values, 0), 1)
+
+    def test_empty(self):
+        """Test an empty sample has a percentile of 0"""
+        self.assertEqual(percentile([], 99), 0.0)
+
+
+class CompareToBaselineTests(TestCase):
+    def setUp(self):
+        self.baseline = {
+            "10": {"treasure-list": {"p95_ms": 10.0, "queries": 3}},
+        }
+
+    def test_no_regression(self):
+        """Test results within the threshold pass"""
+        results = {"10": {"treasure-list": {"p95_ms": 12.0, "queries": 3}}}
+        self.assertEqual(compare_to_baseline(results, self.baseline, 0.25), [])
+
+    def test_latency_regression(self):
+        """Test p95 growth past the threshold is reported"""
+        results = {"10": {"treasure-list": {"p95_ms": 13.0, "queries": 3}}}
+        regressions = compare_to_baseline(results, self.baseline, 0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("p95", regressions[0])
+
+    def test_small_absolute_change_ignored(self):
+        """Test tiny absolute changes don't count as regressions"""
+        baseline = {"10": {"treasure-list": {"p95_ms": 0.5, "queries": 3}}}
+        results = {"10": {"treasure-list": {"p95_ms": 0.9, "queries": 3}}}
+        self.assertEqual(compare_to_baseline(results, baseline, 0.25), [])
+
+    def test_query_regression(self):
+        """Test any increase in query count is reported"""
+        results = {"10": {"treasure-list": {"p95_ms": 10.0, "queries": 4}}}
+        regressions = compare_to_baseline(results, self.baseline, 0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("queries", regressions[0])
+
+    def test_new_endpoint_ignored(self):
+        """Test endpoints missing from the baseline are skipped"""
+        results = {"10": {"login": {"p95_ms": 100.0, "queries": 4}}}
+        self.assertEqual(compare_to_baseline(results, self.baseline, 0.25), [])
+
+
+class RunSuiteTests(TestCase):
+    def test_every_endpoint_runs(self):
+        """Test every endpoint can be benchmarked against a small dataset"""
+        results = run_suite([5], iterations=2)
+        self.assertEqual(set(results["5"]), set(ENDPOINTS))
+        for stats in results["5"].values():
+            self.assertGreater(stats["p50_ms"], 0)
+            self.assertLessEqual(stats["p50_ms"], stats["p99_ms"])
+            self.assertGreater(stats["queries"], 0)
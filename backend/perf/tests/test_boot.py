@@ -0,0 +1,47 @@
+from django.test import SimpleTestCase
+
+from perf.boot import by_package, compare_boot, measure, parse_importtime
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      3000 |       3500 |   django.utils
+import time:      1500 |       1500 |     django.conf
+import time:       900 |        900 | rest_framework
+"""
+
+
+class BootTests(SimpleTestCase):
+    def test_parse_importtime(self):
+        """Test -X importtime output is parsed into module timings"""
+        modules = parse_importtime(IMPORTTIME)
+        self.assertEqual(
+            modules,
+            [
+                ("_io", 120, 120),
+                ("django.utils", 3000, 3500),
+                ("django.conf", 1500, 1500),
+                ("rest_framework", 900, 900),
+            ],
+        )
+        self.assertEqual(
+            by_package(modules),
+            [("django", 4500), ("rest_framework", 900), ("_io", 120)],
+        )
+
+    def test_compare_boot(self):
+        """Test boot times only regress past the threshold and minimum delta"""
+        baseline = {"wsgi@x": {"median_ms": 300.0}, "asgi@x": {"median_ms": 300.0}}
+        results = {"wsgi@x": {"median_ms": 400.0}, "asgi@x": {"median_ms": 360.0}}
+        regressions = compare_boot(results, baseline, threshold=0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("wsgi@x"))
+
+    def test_lean_settings_boot(self):
+        """Test the lean settings boot, without the apps they leave out"""
+        stats = measure("wsgi", "etgs_nts.settings_lean", runs=1, top=500)
+        packages = {row["package"] for row in stats["packages"]}
+        self.assertIn("rest_framework", packages)
+        self.assertNotIn("allauth", packages)
+        self.assertNotIn("debug_toolbar", packages)
+        self.assertGreater(stats["median_ms"], 0)
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from etgs_nts.cache import cache_stats
+
+User = get_user_model()
+
+
+class CacheStatsViewTests(APITestCase):
+    def test_staff_only(self):
+        """Test the cache stats are served to staff only"""
+        client = APIClient()
+        user = User.objects.create_user(email="user@example.com", password="pw")
+        staff = User.objects.create_user(
+            email="staff@example.com", password="pw", is_staff=True
+        )
+        client.force_authenticate(user)
+        self.assertEqual(
+            client.get(reverse("perf-cache")).status_code, status.HTTP_403_FORBIDDEN
+        )
+        client.force_authenticate(staff)
+        cache.get("anything")
+        response = client.get(reverse("perf-cache"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["caches"], cache_stats())
+        self.assertEqual(
+            client.delete(reverse("perf-cache")).status_code,
+            status.HTTP_204_NO_CONTENT,
+        )
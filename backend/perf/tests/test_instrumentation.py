@@ -0,0 +1,149 @@
+import json
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from etgs_nts.compression import CompressionMiddleware
+from perf.instrumentation import RequestMetricsMiddleware, route_stats
+from perf.nplusone import NPlusOneMiddleware
+from perf.profiling import ProfilingMiddleware
+from treasures.models import Treasure
+
+User = get_user_model()
+
+PROJECT_MIDDLEWARE = (
+    RequestMetricsMiddleware,
+    CompressionMiddleware,
+    NPlusOneMiddleware,
+    ProfilingMiddleware,
+)
+
+
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="normaluser", password="password123"
+        )
+        self.staff = User.objects.create_user(
+            email="staff@example.com",
+            handle="staffuser",
+            password="password123",
+            is_staff=True,
+        )
+        for i in range(3):
+            Treasure.objects.create(name=f"Treasure {i}", creator=self.user)
+        route_stats.reset()
+        self.addCleanup(route_stats.reset)
+
+    def server_timing(self, response):
+        metrics = {}
+        for part in response.headers["Server-Timing"].split(", "):
+            name, *params = part.split(";")
+            metrics[name] = dict(param.split("=", 1) for param in params)
+        return metrics
+
+    def test_server_timing_header(self):
+        """Test responses carry db, serialize, app and total timings"""
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("treasure-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {"db", "serialize", "app", "total"})
+        self.assertEqual(timing["db"]["desc"], f'"{len(queries)} queries"')
+        self.assertGreater(float(timing["serialize"]["dur"]), 0)
+        self.assertGreaterEqual(
+            float(timing["total"]["dur"]), float(timing["db"]["dur"])
+        )
+
+    async def test_async_view(self):
+        """Test queries async views run through sync_to_async are counted"""
+        token = AccessToken.for_user(self.user)
+        headers = {"Authorization": f"Bearer {token}"}
+        response = await AsyncClient().get(
+            reverse("async-treasure-list"), headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(self.server_timing(response)["db"]["desc"], '"0 queries"')
+
+    @override_settings(PERF_INSTRUMENTATION={"SERVER_TIMING": False})
+    def test_server_timing_disabled(self):
+        """Test the header can be turned off"""
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("treasure-list"))
+        self.assertNotIn("Server-Timing", response.headers)
+
+    def test_log_line(self):
+        """Test a JSON line is logged for each request"""
+        self.client.force_authenticate(self.user)
+        with self.assertLogs("perf.requests", "INFO") as logs:
+            response = self.client.get(reverse("treasure-list"))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["view"], "treasure-list")
+        self.assertEqual(line["status"], 200)
+        self.assertEqual(line["bytes"], len(response.content))
+        self.assertGreater(line["queries"], 0)
+
+    def test_route_stats(self):
+        """Test staff can read per-route aggregates"""
+        self.client.force_authenticate(self.user)
+        for _ in range(3):
+            self.client.get(reverse("treasure-list"))
+        self.client.get(reverse("treasure-detail", args=[Treasure.objects.first().id]))
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(reverse("perf-routes"), {"sort": "count"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        routes = {(row["method"], row["view"]): row for row in response.data["routes"]}
+        self.assertEqual(routes[("GET", "treasure-list")]["count"], 3)
+        self.assertEqual(routes[("GET", "treasure-detail")]["count"], 1)
+        self.assertEqual(response.data["routes"][0]["view"], "treasure-list")
+        self.assertGreater(routes[("GET", "treasure-list")]["bytes_mean"], 0)
+
+    def test_route_stats_reset(self):
+        """Test DELETE clears the aggregates"""
+        self.client.force_authenticate(self.staff)
+        self.client.get(reverse("perf-routes"))
+        response = self.client.delete(reverse("perf-routes"))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        # only the DELETE itself, recorded after the reset
+        self.assertEqual(
+            [row["method"] for row in route_stats.snapshot()], ["DELETE"]
+        )
+
+    def test_route_stats_bad_sort(self):
+        """Test unknown sort fields are rejected"""
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(reverse("perf-routes"), {"sort": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_route_stats_staff_only(self):
+        """Test regular users cannot read the aggregates"""
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("perf-routes"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AsyncMiddlewareTests(SimpleTestCase):
+    def test_async_capable(self):
+        """Test the project's middleware stays async under ASGI"""
+
+        async def get_response(request):
+            return HttpResponse()
+
+        def sync_get_response(request):
+            return HttpResponse()
+
+        for middleware in PROJECT_MIDDLEWARE:
+            with self.subTest(middleware=middleware.__name__):
+                self.assertTrue(iscoroutinefunction(middleware(get_response)))
+                self.assertFalse(iscoroutinefunction(middleware(sync_get_response)))
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, LiveServerTestCase
+
+from treasures.models import Treasure
+from perf.load import (
+    HISTOGRAM_BUCKETS,
+    classify_error,
+    histogram,
+    login_pool,
+    run_load,
+    summarize,
+)
+
+User = get_user_model()
+
+
+class SummaryTests(TestCase):
+    def test_histogram_buckets(self):
+        """Test latencies land in the first bucket they fit under"""
+        counts = histogram([0.5, 1, 1.5, 3000])
+        self.assertEqual(len(counts), len(HISTOGRAM_BUCKETS))
+        self.assertEqual(counts[0], 2)
+        self.assertEqual(counts[1], 1)
+        self.assertEqual(counts[-1], 1)
+
+    def test_classify_error(self):
+        """Test locked databases are reported separately from other errors"""
+        self.assertEqual(
+            classify_error(500, "OperationalError: database is locked"),
+            "database is locked",
+        )
+        self.assertEqual(classify_error(404, {"detail": "Not found."}), "HTTP 404")
+        self.assertEqual(classify_error(None, ""), "connection error")
+
+    def test_summarize(self):
+        """Test throughput, error rate and per operation stats"""
+        samples = [
+            ("list_treasures", 10.0, None),
+            ("list_treasures", 20.0, None),
+            ("create_treasure", 30.0, "database is locked"),
+            ("create_treasure", 40.0, None),
+        ]
+        summary = summarize(samples, elapsed=2.0)
+        self.assertEqual(summary["requests"], 4)
+        self.assertEqual(summary["throughput_rps"], 2.0)
+        self.assertEqual(summary["error_rate"], 0.25)
+        self.assertEqual(summary["errors"], {"database is locked": 1})
+        self.assertEqual(summary["operations"]["list_treasures"]["count"], 2)
+        self.assertEqual(summary["operations"]["create_treasure"]["p99_ms"], 40.0)
+
+
+class LiveLoadTests(LiveServerTestCase):
+    def test_run_load(self):
+        """Test a short run against the live server completes without errors"""
+        user = User.objects.create_user(
+            email="load@example.com", handle="loaduser", password="password123"
+        )
+        Treasure.objects.create(name="Loaded", category="Load", creator=user)
+        clients = login_pool(self.live_server_url, [(user.email, "password123")])
+        samples, elapsed = run_load(
+            clients, duration=30, max_requests=20, write_ratio=0.5, threads=2
+        )
+        summary = summarize(samples, elapsed)
+        self.assertEqual(summary["requests"], 20)
+        self.assertEqual(summary["errors"], {})
@@ -0,0 +1,158 @@
+import logging
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from utils import QueuedFileHandler, log_function, log_method_calls
+
+
+class CountingArg:
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "counting"
+
+
+class LogDecoratorTests(SimpleTestCase):
+    def setUp(self):
+        self.log = logging.getLogger("perf.tests.logging")
+        self.log.setLevel(logging.DEBUG)
+        self.addCleanup(self.log.setLevel, logging.NOTSET)
+
+    def test_disabled_level_skips_formatting(self):
+        """Test arguments are never formatted when DEBUG is disabled"""
+        self.log.setLevel(logging.INFO)
+        arg = CountingArg()
+        func = log_function(lambda value: value, logger=self.log)
+        self.assertIs(func(arg), arg)
+        self.assertEqual(arg.formatted, 0)
+
+    def test_enabled_level_logs_params(self):
+        """Test entry and exit messages list the arguments"""
+        func = log_function(lambda a, b=None: a, logger=self.log)
+        with self.assertLogs(self.log, logging.DEBUG) as logs:
+            func(1, b="two")
+        self.assertEqual(
+            logs.output,
+            [
+                "DEBUG:perf.tests.logging:Executing <lambda> with params:\n- 1\n- b: two",
+                "DEBUG:perf.tests.logging:Exiting <lambda>",
+            ],
+        )
+
+    def test_long_arguments_truncated(self):
+        """Test arguments longer than max_arg_length are cut short"""
+        func = log_function(lambda a: a, logger=self.log, max_arg_length=10)
+        with self.assertLogs(self.log, logging.DEBUG) as logs:
+            func("x" * 50)
+        self.assertIn(f"- {'x' * 10}... (50 chars)", logs.output[0])
+
+    def test_sampled_out_calls_skip_debug_but_log_errors(self):
+        """Test sample_rate=0 logs no debug messages but still logs exceptions"""
+        arg = CountingArg()
+
+        def fail(value):
+            raise ValueError("boom")
+
+        func = log_function(fail, logger=self.log, sample_rate=0)
+        with self.assertLogs(self.log, logging.DEBUG) as logs:
+            with self.assertRaises(ValueError):
+                func(arg)
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].getMessage(), "Exception in fail: boom")
+        self.assertEqual(arg.formatted, 0)
+
+    def test_method_calls(self):
+        """Test each public method is wrapped and calls its own implementation"""
+
+        @log_method_calls(logger=self.log)
+        class Thing:
+            def first(self, value):
+                return ("first", value)
+
+            def second(self, value):
+                return ("second", value)
+
+        thing = Thing()
+        with self.assertLogs(self.log, logging.DEBUG) as logs:
+            self.assertEqual(thing.first(1), ("first", 1))
+            self.assertEqual(thing.second(2), ("second", 2))
+        self.assertEqual(
+            [record.getMessage() for record in logs.records],
+            [
+                "Executing Thing.first with params:\n- 1",
+                "Exiting Thing.first",
+                "Executing Thing.second with params:\n- 2",
+                "Exiting Thing.second",
+            ],
+        )
+
+
+class QueuedFileHandlerTests(SimpleTestCase):
+    def test_writes_through_listener(self):
+        """Test records reach the file once the handler is flushed"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "debug.log"
+            handler = QueuedFileHandler(path)
+            log = logging.getLogger("perf.tests.queued")
+            log.addHandler(handler)
+            log.setLevel(logging.DEBUG)
+            log.propagate = False
+            try:
+                for i in range(100):
+                    log.debug("message %d", i)
+                self.assertIsNotNone(handler.listener)
+                handler.flush()
+                lines = path.read_text().splitlines()
+                self.assertEqual(lines, [f"message {i}" for i in range(100)])
+            finally:
+                log.removeHandler(handler)
+                log.propagate = True
+                log.setLevel(logging.NOTSET)
+                handler.close()
+
+    def test_flush_while_logging(self):
+        """Test a record queued while another thread flushes is written"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "debug.log"
+            handler = QueuedFileHandler(path)
+            try:
+                handler.emit(logging.makeLogRecord({"msg": "first"}))
+                handler.flush()
+                # a thread that checked for the listener before the flush
+                handler.enqueue(logging.makeLogRecord({"msg": "second"}))
+                handler.flush()
+                self.assertEqual(path.read_text().splitlines(), ["first", "second"])
+            finally:
+                handler.close()
+
+    def test_close_writes_everything(self):
+        """Test closing writes records queued after the listener stopped"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "debug.log"
+            handler = QueuedFileHandler(path)
+            handler.emit(logging.makeLogRecord({"msg": "first"}))
+            stop = handler.listener.stop
+
+            def stop_while_logging():
+                stop()
+                # a thread that checked for the listener before it stopped
+                handler.enqueue(logging.makeLogRecord({"msg": "second"}))
+
+            handler.listener.stop = stop_while_logging
+            handler.close()
+            self.assertEqual(path.read_text().splitlines(), ["first", "second"])
+
+    def test_full_queue_drops_records(self):
+        """Test records beyond queue_size are dropped, not blocking the caller"""
+        with tempfile.TemporaryDirectory() as tmp:
+            handler = QueuedFileHandler(Path(tmp) / "debug.log", queue_size=2)
+            try:
+                for _ in range(5):
+                    handler.enqueue(logging.makeLogRecord({"msg": "x"}))
+                self.assertEqual(handler.dropped, 3)
+            finally:
+                handler.close()
@@ -0,0 +1,111 @@
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from perf.nplusone import NPlusOneDetector, NPlusOneTestMixin
+from treasures.api.serializers import TreasureSerializer
+from treasures.models import Treasure
+
+User = get_user_model()
+
+
+class NPlusOneDetectorTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="normaluser", password="password123"
+        )
+        for i in range(5):
+            Treasure.objects.create(name=f"Treasure {i}", creator=self.user)
+
+    def test_detects_lazy_loads(self):
+        """Test a lazy relation in a serializer loop is reported"""
+        with NPlusOneDetector(threshold=2) as detector:
+            TreasureSerializer(Treasure.objects.all(), many=True).data
+        [(view, shape, site, count)] = detector.violations()
+        self.assertEqual(count, 5)
+        self.assertIn('FROM "users_user"', shape)
+        self.assertIn("get_creator_handle", site)
+        self.assertIn("probably an N+1", detector.report())
+
+    def test_select_related(self):
+        """Test the same loop with select_related is clean"""
+        with NPlusOneDetector(threshold=2) as detector:
+            TreasureSerializer(
+                Treasure.objects.select_related("creator"), many=True
+            ).data
+        self.assertEqual(detector.violations(), [])
+
+    def test_requests_counted_separately(self):
+        """Test the same query in several requests is not an N+1"""
+        self.client.force_authenticate(self.user)
+        with NPlusOneDetector(threshold=2) as detector:
+            for _ in range(4):
+                self.client.get(reverse("treasure-list"))
+        self.assertEqual(detector.violations(), [])
+
+    @override_settings(PERF_INSTRUMENTATION={"ENABLED": False})
+    def test_requests_counted_without_instrumentation(self):
+        """Test requests are told apart with the request metrics off"""
+        self.client.force_authenticate(self.user)
+        with NPlusOneDetector(threshold=2) as detector:
+            for _ in range(4):
+                self.client.get(reverse("treasure-list"))
+        self.assertEqual(detector.violations(), [])
+
+    @override_settings(PERF_NPLUSONE={"ENABLED": True, "THRESHOLD": 0})
+    def test_middleware_warns(self):
+        """Test the middleware logs requests that repeat a query"""
+        self.client.force_authenticate(self.user)
+        with self.assertLogs("perf.nplusone", "WARNING") as logs:
+            self.client.get(reverse("treasure-list"))
+        self.assertIn("GET /treasures/", logs.output[0])
+
+    @override_settings(PERF_NPLUSONE={"ENABLED": True, "THRESHOLD": 0})
+    async def test_async_view(self):
+        """Test queries async views run through sync_to_async are seen"""
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        with self.assertLogs("perf.nplusone", "WARNING") as logs:
+            await AsyncClient().get(reverse("async-treasure-list"), headers=headers)
+        self.assertIn("GET async-treasure-list", logs.output[0])
+
+
+class NPlusOneTestMixinTests(APITestCase):
+    def run_case(self, serialize):
+        # a plain TestCase, so it runs inside this test's transaction
+        class Case(NPlusOneTestMixin, unittest.TestCase):
+            def setUp(self):
+                user = User.objects.create_user(
+                    email="user@example.com", password="password123"
+                )
+                for i in range(3):
+                    Treasure.objects.create(name=f"Treasure {i}", creator=user)
+                super().setUp()
+
+            def test_serialize(self):
+                serialize()
+
+        result = unittest.TestResult()
+        Case("test_serialize").run(result)
+        return result
+
+    def test_fails_on_n_plus_one(self):
+        """Test tests that repeat a query shape fail"""
+        result = self.run_case(
+            lambda: TreasureSerializer(Treasure.objects.all(), many=True).data
+        )
+        self.assertEqual(len(result.failures), 1)
+        self.assertIn("get_creator_handle", result.failures[0][1])
+
+    def test_passes_without_n_plus_one(self):
+        """Test tests without repeated queries pass"""
+        result = self.run_case(
+            lambda: TreasureSerializer(
+                Treasure.objects.select_related("creator"), many=True
+            ).data
+        )
+        self.assertTrue(result.wasSuccessful(), result.errors + result.failures)
@@ -0,0 +1,110 @@
+import pstats
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from perf.profiling import rotate
+
+User = get_user_model()
+
+
+class ProfilingMiddlewareTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="normaluser", password="password123"
+        )
+        self.staff = User.objects.create_user(
+            email="staff@example.com",
+            handle="staffuser",
+            password="password123",
+            is_staff=True,
+        )
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name)
+        settings = override_settings(
+            PERF_PROFILING={"DIRECTORY": self.directory, "MAX_FILES": 3}
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def get(self, user, **headers):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get(
+            reverse("treasure-list"),
+            headers={"Authorization": f"Bearer {token}", **headers},
+        )
+
+    def profiles(self):
+        return sorted(self.directory.glob("*.prof"))
+
+    def test_staff_header(self):
+        """Test staff requests with the header are profiled"""
+        response = self.get(self.staff, **{"X-Profile": "1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        name = response.headers["X-Profile-Id"]
+        self.assertIn("GET-treasure-list", name)
+        self.assertEqual([path.name for path in self.profiles()], [name])
+        # readable by pstats, and so by snakeviz
+        stats = pstats.Stats(str(self.directory / name))
+        self.assertGreater(stats.total_calls, 0)
+
+    async def test_sync_view_under_asgi(self):
+        """Test a sync view run in a thread under ASGI shows up in the profile"""
+        token = AccessToken.for_user(self.staff)
+        response = await AsyncClient().get(
+            reverse("treasure-list"),
+            headers={"Authorization": f"Bearer {token}", "X-Profile": "1"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = pstats.Stats(str(self.directory / response.headers["X-Profile-Id"]))
+        functions = {
+            (Path(filename).parts[-3:], name) for filename, _, name in stats.stats
+        }
+        self.assertIn((("treasures", "api", "views.py"), "get_queryset"), functions)
+
+    def test_header_ignored_for_regular_users(self):
+        """Test the header does nothing for non-staff users"""
+        response = self.get(self.user, **{"X-Profile": "1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("X-Profile-Id", response.headers)
+        self.assertEqual(self.profiles(), [])
+
+    def test_not_triggered(self):
+        """Test requests without the header are not profiled"""
+        response = self.get(self.staff)
+        self.assertNotIn("X-Profile-Id", response.headers)
+        self.assertEqual(self.profiles(), [])
+
+    def test_sample_rate(self):
+        """Test a sample rate of 1 profiles every request"""
+        with override_settings(
+            PERF_PROFILING={"DIRECTORY": self.directory, "SAMPLE_RATE": 1.0}
+        ):
+            response = self.get(self.user)
+        self.assertIn("X-Profile-Id", response.headers)
+        self.assertEqual(len(self.profiles()), 1)
+
+    def test_rotation(self):
+        """Test only the newest MAX_FILES profiles are kept"""
+        names = [
+            self.get(self.staff, **{"X-Profile": "1"}).headers["X-Profile-Id"]
+            for _ in range(5)
+        ]
+        self.assertEqual([path.name for path in self.profiles()], names[-3:])
+
+    def test_rotate(self):
+        """Test rotate deletes the oldest files by name"""
+        for i in range(4):
+            (self.directory / f"{i}-x.prof").touch()
+        rotate(self.directory, 2)
+        self.assertEqual(
+            [path.name for path in self.profiles()], ["2-x.prof", "3-x.prof"]
+        )
@@ -0,0 +1,14 @@
+from rest_framework.test import APITestCase
+
+from perf.render_bench import compare
+
+
+class RenderBenchTests(APITestCase):
+    def test_compare(self):
+        """Test every renderer is benchmarked and decodes to the JSON data"""
+        results = compare(page_size=5, iterations=2)
+        self.assertIn("orjson", results)
+        for stats in results.values():
+            self.assertTrue(stats["same_data"])
+            self.assertTrue(stats.get("identical", True))
+            self.assertGreater(stats["bytes"], 0)
@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APITestCase
+
+from perf.slow_queries import slow_query_log
+from perf.sql import normalize_sql
+from treasures.api.serializers import TreasureSerializer
+from treasures.models import Treasure
+
+User = get_user_model()
+
+
+class NormalizeSqlTests(SimpleTestCase):
+    def test_literals_and_placeholders(self):
+        """Test values are replaced so queries group by shape"""
+        self.assertEqual(
+            normalize_sql(
+                'SELECT "a"."id" FROM "a" WHERE "a"."name" = \'x\'  AND "a"."n" = 12'
+            ),
+            'SELECT "a"."id" FROM "a" WHERE "a"."name" = ? AND "a"."n" = ?',
+        )
+        self.assertEqual(
+            normalize_sql('SELECT * FROM "t1" WHERE "t1"."id" = %s LIMIT 21'),
+            'SELECT * FROM "t1" WHERE "t1"."id" = ? LIMIT ?',
+        )
+
+    def test_in_lists_collapse(self):
+        """Test IN lists of any length normalize the same"""
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (%s, %s, %s)"),
+            normalize_sql("SELECT * FROM t WHERE id IN (%s)"),
+        )
+
+
+@override_settings(PERF_SLOW_QUERIES={"THRESHOLD_MS": 0})
+class SlowQueryLogTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="normaluser", password="password123"
+        )
+        for i in range(3):
+            Treasure.objects.create(name=f"Treasure {i}", creator=self.user)
+        slow_query_log.clear()
+        self.addCleanup(slow_query_log.clear)
+
+    def entry_for(self, table):
+        entries = [
+            entry
+            for entry in slow_query_log.entries()
+            if entry["normalized"].startswith("SELECT")
+            and f'FROM "{table}"' in entry["normalized"]
+        ]
+        self.assertTrue(entries, f"no query on {table} recorded")
+        return entries[0]
+
+    def test_records_origin_and_plan(self):
+        """Test entries have the calling code, parameters and query plan"""
+        self.client.force_authenticate(self.user)
+        self.client.get(reverse("treasure-list"))
+        entry = self.entry_for("treasures_treasure")
+        self.assertEqual(entry["view"], "GET treasure-list")
+        self.assertIn(repr(self.user.id), entry["params"])
+        self.assertTrue(entry["plan"])
+        self.assertNotIn("EXPLAIN failed", entry["plan"][0])
+
+    def test_records_serializer_frame(self):
+        """Test lazy loads are traced back to the serializer that ran them"""
+        TreasureSerializer(Treasure.objects.all(), many=True).data
+        entry = self.entry_for("users_user")
+        self.assertTrue(
+            entry["stack"][0].startswith("treasures/api/serializers.py"),
+            entry["stack"],
+        )
+        self.assertIn("get_creator_handle", entry["stack"][0])
+
+    def test_deduplicates_by_shape(self):
+        """Test the same shape with different values is one entry"""
+        for treasure in Treasure.objects.all():
+            list(Treasure.objects.filter(pk=treasure.pk))
+        entry = self.entry_for("treasures_treasure")
+        self.assertEqual(entry["count"], 3)
+
+    @override_settings(PERF_SLOW_QUERIES={"THRESHOLD_MS": 0, "MAX_ENTRIES": 2})
+    def test_bounded(self):
+        """Test the least recently seen shapes are dropped"""
+        list(Treasure.objects.all())
+        list(User.objects.all())
+        list(Treasure.objects.filter(name="x"))
+        self.assertEqual(len(slow_query_log.entries()), 2)
+
+    @override_settings(PERF_SLOW_QUERIES={"THRESHOLD_MS": 10_000})
+    def test_threshold(self):
+        """Test fast queries are not recorded"""
+        list(Treasure.objects.all())
+        self.assertEqual(slow_query_log.entries(), [])
+
+    def test_admin_page(self):
+        """Test staff can view and clear the log in the admin"""
+        staff = User.objects.create_superuser(
+            email="admin@example.com", password="password123"
+        )
+        list(Treasure.objects.filter(name="findme"))
+        self.client.force_login(staff)
+        response = self.client.get(reverse("perf-slow-queries"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "treasures_treasure")
+
+        response = self.client.post(reverse("perf-slow-queries"))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(
+            any("findme" in entry["sql"] for entry in slow_query_log.entries())
+        )
+
+    def test_admin_page_staff_only(self):
+        """Test regular users are sent to the admin login"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("perf-slow-queries"))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import CacheStatsView, HashingStatsView, RouteStatsView
+
+urlpatterns = [
+    path("perf/routes/", RouteStatsView.as_view(), name="perf-routes"),
+    path("perf/cache/", CacheStatsView.as_view(), name="perf-cache"),
+    path("perf/hashing/", HashingStatsView.as_view(), name="perf-hashing"),
+]
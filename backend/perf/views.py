@@ -0,0 +1,67 @@
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from etgs_nts.cache import cache_stats, reset_cache_stats
+from users.hashing import hashing_pool
+
+from .instrumentation import SORT_KEYS, route_stats
+
+
+class RouteStatsView(APIView):
+    """
+    Per-route request metrics collected by RequestMetricsMiddleware in this
+    process. Sort with ?sort=<field>, DELETE to start over.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        sort = request.query_params.get("sort", "total_ms")
+        if sort not in SORT_KEYS:
+            raise ValidationError({"sort": f"Choose one of {', '.join(SORT_KEYS)}."})
+        return Response({"routes": route_stats.snapshot(sort)})
+
+    def delete(self, request):
+        route_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CacheStatsView(APIView):
+    """
+    Hit, miss and eviction counts of the two tier caches in this process,
+    by cache location. DELETE to start over.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({"caches": cache_stats()})
+
+    def delete(self, request):
+        reset_cache_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class HashingStatsView(APIView):
+    """
+    Password hashing times and queue waits of the hashing pool in this
+    process, see users/hashing.py. DELETE to start over.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(
+            {
+                "max_concurrency": hashing_pool.max_concurrency,
+                "queue_timeout": hashing_pool.queue_timeout,
+                "hashes": hashing_pool.stats.snapshot(),
+            }
+        )
+
+    def delete(self, request):
+        hashing_pool.stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,36 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job, Schedule
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "name",
+        "status",
+        "attempts",
+        "run_at",
+        "started",
+        "finished",
+        "worker",
+    )
+    list_filter = ("status", "name")
+    search_fields = ("name",)
+    ordering = ("-id",)
+    readonly_fields = ("created", "started", "finished", "worker", "result")
+    actions = ["retry"]
+
+    @admin.action(description="Run the selected jobs again")
+    def retry(self, request, queryset):
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, run_at=timezone.now(), attempts=0
+        )
+        self.message_user(request, f"Queued {updated} jobs.")
+
+
+@admin.register(Schedule)
+class ScheduleAdmin(admin.ModelAdmin):
+    list_display = ("name", "enabled", "next_run", "last_run")
+    list_editable = ("enabled",)
@@ -0,0 +1,39 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from tasks.registry import registry
+from tasks.worker import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued and periodic background tasks until stopped with SIGINT "
+        "or SIGTERM. Run one per machine, or more for more throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads", type=int, default=None, help="Jobs run at once."
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no jobs are due, e.g. to run from cron.",
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(threads=options["threads"])
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            # finish the running jobs, then exit
+            signal.signal(signum, lambda *args: worker.stop())
+        self.stdout.write(
+            f"Worker {worker.name} running {len(registry)} tasks on "
+            f"{worker.threads} threads."
+        )
+        worker.run(once=options["once"])
+        counts = worker.counts
+        self.stdout.write(
+            f"Done: {counts['done']}, retried: {counts['retried']}, "
+            f"failed: {counts['failed']}."
+        )
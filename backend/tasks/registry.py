@@ -0,0 +1,96 @@
+"""
+Background tasks, run by `manage.py run_tasks` instead of a request thread.
+
+A task is a function registered with @task in an app's tasks.py, found when
+the tasks app is ready:
+
+    @task(max_attempts=5)
+    def export_treasures(user_id):
+        ...
+
+    export_treasures.enqueue(user_id=request.user.pk)
+
+enqueue() inserts one Job row and returns, the arguments have to be JSON
+serializable. Inside a transaction the job becomes visible to workers when
+it commits. A failed job is retried after BACKOFF, 2 * BACKOFF, 4 * BACKOFF
+... seconds (at most MAX_BACKOFF) until it has been tried `max_attempts`
+times, then it is marked failed with the traceback in the admin.
+
+Tasks registered with `every=<seconds>` are also queued periodically by the
+workers. When a schedule is due is kept in the Schedule table, so only one
+worker queues each run.
+
+Configured with the TASKS setting:
+
+    TASKS = {
+        "THREADS": 4,  # jobs a worker runs at once
+        "POLL_INTERVAL": 1.0,  # seconds between looks for due jobs
+        "LOCK_TIMEOUT": 600,  # seconds before a running job counts as lost
+        "BACKOFF": 10,  # seconds before the first retry
+        "MAX_BACKOFF": 3600,
+        "RETENTION": 7 * 24 * 3600,  # seconds finished jobs are kept
+    }
+"""
+
+import functools
+
+from django.utils import timezone
+
+from etgs_nts.conf import setting_reader
+
+DEFAULTS = {
+    "THREADS": 4,
+    "POLL_INTERVAL": 1.0,
+    "LOCK_TIMEOUT": 600,
+    "BACKOFF": 10,
+    "MAX_BACKOFF": 3600,
+    "RETENTION": 7 * 24 * 3600,
+}
+
+
+tasks_setting = setting_reader("TASKS", DEFAULTS)
+
+
+registry = {}
+
+
+class Task:
+    def __init__(self, func, name, max_attempts, every):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.every = every
+        functools.update_wrapper(self, func)
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, run_at=None, **kwargs):
+        """Queue a call with `kwargs`, at `run_at` or as soon as possible."""
+        from .models import Job
+
+        return Job.objects.create(
+            name=self.name,
+            kwargs=kwargs,
+            max_attempts=self.max_attempts,
+            run_at=run_at or timezone.now(),
+        )
+
+    def __repr__(self):
+        return f"<Task {self.name}>"
+
+
+def task(func=None, *, name=None, max_attempts=3, every=None):
+    """
+    Register `func` as a task, named after its module and function unless
+    `name` is given. `every` queues it every that many seconds.
+    """
+
+    def register(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        registered = registry[task_name] = Task(func, task_name, max_attempts, every)
+        return registered
+
+    if func is not None:
+        return register(func)
+    return register
@@ -0,0 +1,16 @@
+import datetime
+
+from django.utils import timezone
+
+from .models import Job
+from .registry import task, tasks_setting
+
+
+@task(every=3600)
+def prune_jobs():
+    """Delete finished jobs older than TASKS' RETENTION."""
+    cutoff = timezone.now() - datetime.timedelta(seconds=tasks_setting("RETENTION"))
+    deleted, _ = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED], finished__lt=cutoff
+    ).delete()
+    return deleted
@@ -0,0 +1,193 @@
+import datetime
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tasks.models import Job, Schedule
+from tasks.registry import task
+from tasks.worker import Worker
+
+User = get_user_model()
+
+calls = []
+
+
+@task(name="tests.add")
+def add(a, b):
+    calls.append((a, b))
+    return a + b
+
+
+@task(name="tests.fail", max_attempts=2)
+def fail():
+    raise ValueError("broken")
+
+
+@task(name="tests.slow")
+def slow(seconds):
+    calls.append(("slow", seconds))
+    time.sleep(seconds)
+
+
+@task(name="tests.tick", every=60)
+def tick():
+    return "tick"
+
+
+@override_settings(TASKS={"BACKOFF": 10, "MAX_BACKOFF": 15})
+class WorkerTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(threads=1, name="test")
+
+    def test_enqueue(self):
+        """Test queueing a job is a single insert"""
+        with self.assertNumQueries(1):
+            job = add.enqueue(a=1, b=2)
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.kwargs, {"a": 1, "b": 2})
+
+    def test_run(self):
+        """Test due jobs are run and their results kept"""
+        job = add.enqueue(a=1, b=2)
+        in_an_hour = timezone.now() + datetime.timedelta(hours=1)
+        later = add.enqueue(a=2, b=2, run_at=in_an_hour)
+        self.worker.run(once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result, 3)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(calls, [(1, 2)])
+        later.refresh_from_db()
+        self.assertEqual(later.status, Job.QUEUED)
+
+    def test_retries(self):
+        """Test failed jobs are retried with backoff, then marked failed"""
+        job = fail.enqueue()
+        now = timezone.now()
+        with self.assertLogs("tasks.worker", "WARNING"):
+            self.worker.execute(self.worker.claim(1, now)[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn("ValueError: broken", job.last_error)
+        self.assertAlmostEqual((job.run_at - now).total_seconds(), 10, delta=5)
+        self.assertEqual(self.worker.claim(1, now), [])
+
+        with self.assertLogs("tasks.worker", "ERROR"):
+            self.worker.execute(self.worker.claim(1, job.run_at)[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(self.worker.counts, {"done": 0, "retried": 1, "failed": 1})
+
+    def test_unknown_task(self):
+        """Test jobs of tasks that no longer exist fail straight away"""
+        job = Job.objects.create(name="tests.gone", run_at=timezone.now())
+        with self.assertLogs("tasks.worker", "ERROR"):
+            self.worker.run(once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("tests.gone", job.last_error)
+
+    def test_schedule(self):
+        """Test periodic tasks are queued once per interval"""
+        now = timezone.now()
+        self.worker.schedule(now)
+        self.worker.schedule(now + datetime.timedelta(seconds=30))
+        self.assertEqual(Job.objects.filter(name="tests.tick").count(), 1)
+        self.worker.schedule(now + datetime.timedelta(seconds=61))
+        self.assertEqual(Job.objects.filter(name="tests.tick").count(), 2)
+
+        Schedule.objects.filter(name="tests.tick").update(enabled=False)
+        self.worker.schedule(now + datetime.timedelta(seconds=200))
+        self.assertEqual(Job.objects.filter(name="tests.tick").count(), 2)
+
+    def test_prune_tasks_registered(self):
+        """Test the prune jobs are scheduled"""
+        self.worker.schedule(timezone.now())
+        names = set(Job.objects.values_list("name", flat=True))
+        for name in (
+            "users.tasks.prune_tokens",
+            "users.tasks.prune_throttles",
+            "users.tasks.repair_counters",
+            "treasures.tasks.prune_tombstones",
+            "events.tasks.prune_events",
+            "tasks.tasks.prune_jobs",
+        ):
+            self.assertIn(name, names)
+
+    def test_requeue_lost(self):
+        """Test running jobs of a lost worker are queued again"""
+        job = add.enqueue(a=1, b=1)
+        now = timezone.now()
+        self.worker.claim(1, now)
+        later = now + datetime.timedelta(hours=1)
+        self.assertEqual(self.worker.requeue_lost(later), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+    def test_renew(self):
+        """Test renewed jobs aren't taken for lost"""
+        job = add.enqueue(a=1, b=1)
+        now = timezone.now()
+        self.worker.claim(1, now)
+        later = now + datetime.timedelta(seconds=500)
+        self.assertEqual(self.worker.renew([job.pk], later), 1)
+        soon_after = later + datetime.timedelta(seconds=200)
+        self.assertEqual(self.worker.requeue_lost(soon_after), 0)
+        # another worker's jobs aren't renewed
+        self.assertEqual(Worker(name="other").renew([job.pk], later), 0)
+
+    def test_command(self):
+        """Test run_tasks --once runs the due jobs and exits"""
+        add.enqueue(a=2, b=3)
+        out = StringIO()
+        call_command("run_tasks", "--once", "--threads", "1", stdout=out)
+        self.assertIn("Done:", out.getvalue())
+        self.assertIn((2, 3), calls)
+
+    def test_admin(self):
+        """Test jobs can be seen and retried in the admin"""
+        admin = User.objects.create_superuser(
+            email="admin@example.com", handle="admin", password="password123"
+        )
+        self.client.force_login(admin)
+        job = Job.objects.create(
+            name="tests.add",
+            kwargs={"a": 1, "b": 1},
+            status=Job.FAILED,
+            attempts=3,
+            run_at=timezone.now(),
+        )
+        url = reverse("admin:tasks_job_changelist")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.post(url, {"action": "retry", "_selected_action": [job.pk]})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 0))
+
+
+class ThreadedWorkerTests(TransactionTestCase):
+    def test_threads(self):
+        """Test a worker runs jobs on its thread pool"""
+        calls.clear()
+        for i in range(4):
+            add.enqueue(a=i, b=i)
+        Worker(threads=2).run(once=True)
+        done = Job.objects.filter(name="tests.add", status=Job.DONE)
+        self.assertEqual(done.count(), 4)
+        self.assertEqual(sorted(calls), [(i, i) for i in range(4)])
+
+    @override_settings(TASKS={"LOCK_TIMEOUT": 0.2, "POLL_INTERVAL": 0.05})
+    def test_long_job_renewed(self):
+        """Test a job running past LOCK_TIMEOUT isn't run a second time"""
+        calls.clear()
+        job = slow.enqueue(seconds=0.6)
+        Worker(threads=2).run(once=True)
+        self.assertEqual(calls, [("slow", 0.6)])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
@@ -0,0 +1,197 @@
+import datetime
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job, Schedule
+from .registry import registry, tasks_setting
+
+logger = logging.getLogger(__name__)
+
+
+def _seconds(seconds):
+    return datetime.timedelta(seconds=seconds)
+
+
+def _json_result(result):
+    try:
+        json.dumps(result)
+    except (TypeError, ValueError):
+        return repr(result)
+    return result
+
+
+class Worker:
+    """
+    Runs due jobs on up to `threads` threads, one worker per process. While
+    jobs run on the pool, every loop pushes their locked_until on, so only
+    the jobs of a worker that stopped are requeued. With a single thread jobs
+    run on the calling thread, which can't renew them meanwhile, so there
+    LOCK_TIMEOUT has to be longer than the longest job.
+    """
+
+    def __init__(self, threads=None, name=None):
+        self.threads = threads or tasks_setting("THREADS")
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.counts = {"done": 0, "retried": 0, "failed": 0}
+        self._stop = threading.Event()
+        self._counts_lock = threading.Lock()
+
+    def schedule(self, now):
+        """Queue the periodic tasks that are due, returns how many were."""
+        periodic = {name: t for name, t in registry.items() if t.every}
+        schedules = {
+            schedule.name: schedule
+            for schedule in Schedule.objects.filter(name__in=periodic)
+        }
+        queued = 0
+        for name, registered in periodic.items():
+            schedule = schedules.get(name)
+            if schedule is None:
+                schedule, _ = Schedule.objects.get_or_create(
+                    name=name, defaults={"next_run": now}
+                )
+            if not schedule.enabled or schedule.next_run > now:
+                continue
+            # only the worker that moves next_run on queues the job
+            claimed = Schedule.objects.filter(
+                pk=schedule.pk, next_run=schedule.next_run
+            ).update(next_run=now + _seconds(registered.every), last_run=now)
+            if claimed:
+                registered.enqueue()
+                queued += 1
+        return queued
+
+    def requeue_lost(self, now):
+        """Queue running jobs whose worker stopped renewing them again."""
+        # a worker renews its jobs every loop, see renew()
+        lost = Job.objects.filter(status=Job.RUNNING, locked_until__lt=now)
+        error = "The worker running the job was lost."
+        lost.filter(attempts__gte=F("max_attempts")).update(
+            status=Job.FAILED, finished=now, last_error=error
+        )
+        return lost.update(status=Job.QUEUED, run_at=now, last_error=error)
+
+    def claim(self, limit, now):
+        """Mark up to `limit` due jobs as running on this worker and return them."""
+        due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        ids = list(due.order_by("run_at", "id").values_list("id", flat=True)[:limit])
+        claimed = [
+            pk
+            for pk in ids
+            # another worker may have claimed it since
+            if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+                status=Job.RUNNING,
+                worker=self.name,
+                started=now,
+                locked_until=now + _seconds(tasks_setting("LOCK_TIMEOUT")),
+                attempts=F("attempts") + 1,
+            )
+        ]
+        return list(Job.objects.filter(pk__in=claimed).order_by("run_at", "id"))
+
+    def renew(self, job_ids, now):
+        """Push the locks of this worker's running jobs LOCK_TIMEOUT on."""
+        return Job.objects.filter(
+            pk__in=job_ids, status=Job.RUNNING, worker=self.name
+        ).update(locked_until=now + _seconds(tasks_setting("LOCK_TIMEOUT")))
+
+    def _finish(self, job, **fields):
+        Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=self.name).update(
+            **fields
+        )
+
+    def _count(self, outcome):
+        with self._counts_lock:
+            self.counts[outcome] += 1
+
+    def execute(self, job):
+        registered = registry.get(job.name)
+        try:
+            if registered is None:
+                raise LookupError(f"No task is registered as {job.name!r}.")
+            result = registered.func(**job.kwargs)
+        except Exception:
+            error = traceback.format_exc()
+            now = timezone.now()
+            if registered is not None and job.attempts < job.max_attempts:
+                delay = min(
+                    tasks_setting("BACKOFF") * 2 ** (job.attempts - 1),
+                    tasks_setting("MAX_BACKOFF"),
+                )
+                self._finish(
+                    job,
+                    status=Job.QUEUED,
+                    run_at=now + _seconds(delay),
+                    last_error=error,
+                )
+                self._count("retried")
+                logger.warning(
+                    "Job %s #%s failed, retrying in %ss", job.name, job.pk, delay
+                )
+            else:
+                self._finish(job, status=Job.FAILED, finished=now, last_error=error)
+                self._count("failed")
+                logger.error("Job %s #%s failed", job.name, job.pk)
+        else:
+            self._finish(
+                job,
+                status=Job.DONE,
+                finished=timezone.now(),
+                result=_json_result(result),
+            )
+            self._count("done")
+
+    def _execute_in_thread(self, job):
+        close_old_connections()
+        try:
+            self.execute(job)
+        finally:
+            close_old_connections()
+
+    def run(self, once=False):
+        """Run jobs until stop(), or with `once` until none are due."""
+        pool = ThreadPoolExecutor(self.threads) if self.threads > 1 else None
+        # future: id of the job it runs
+        running = {}
+        try:
+            while not self._stop.is_set():
+                now = timezone.now()
+                self.schedule(now)
+                running = {
+                    future: pk for future, pk in running.items() if not future.done()
+                }
+                if running:
+                    self.renew(running.values(), now)
+                self.requeue_lost(now)
+                free = self.threads - len(running)
+                jobs = self.claim(free, now) if free > 0 else []
+                for job in jobs:
+                    if pool is None:
+                        self.execute(job)
+                    else:
+                        future = pool.submit(self._execute_in_thread, job)
+                        running[future] = job.pk
+                if jobs:
+                    continue
+                if once and not running:
+                    break
+                poll = tasks_setting("POLL_INTERVAL")
+                if running:
+                    wait(list(running), timeout=poll, return_when=FIRST_COMPLETED)
+                else:
+                    self._stop.wait(poll)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+    def stop(self):
+        self._stop.set()
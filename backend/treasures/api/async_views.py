@@ -0,0 +1,28 @@
+from etgs_nts.async_api import async_api_view, paginate, render, serialize
+from rest_framework.exceptions import NotFound
+
+from ..models import Treasure
+from .serializers import TreasureSerializer
+from .views import TreasurePagination
+
+
+# Async counterparts of TreasureViewSet.list and retrieve, see etgs_nts/async_api.py
+def user_treasures(user):
+    return Treasure.objects.filter(creator=user).select_related("creator")
+
+
+@async_api_view
+async def treasure_list(request):
+    data = await paginate(
+        request, user_treasures(request.user), TreasurePagination, TreasureSerializer
+    )
+    return render(data)
+
+
+@async_api_view
+async def treasure_detail(request, pk):
+    try:
+        treasure = await user_treasures(request.user).aget(pk=pk)
+    except Treasure.DoesNotExist:
+        raise NotFound("No Treasure matches the given query.")
+    return render(await serialize(TreasureSerializer, treasure))
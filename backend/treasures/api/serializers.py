@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from etgs_nts.fragments import FragmentCacheMixin, FragmentListSerializer
+from perf.instrumentation import TimedSerializerMixin
 from ..models import Treasure
 
 User = get_user_model()
@@ -23,7 +25,16 @@ class BaseSerializerMixin:
             )
 
 
-class TreasureSerializer(serializers.ModelSerializer, BaseSerializerMixin):
+class TreasureSerializer(
+    FragmentCacheMixin,
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+    BaseSerializerMixin,
+):
+    # rendered dicts are cached per treasure, see etgs_nts/fragments.py
+    fragment_name = "treasure"
+    fragment_owner_field = "creator"
+
     # I guess these fields are not required so taht I can use the serializer for updating
     creator = serializers.PrimaryKeyRelatedField(required=False, read_only=True)
     # do I want this to be read only? Or maybe there would be a special view that could allow for this?
@@ -40,6 +51,7 @@ class TreasureSerializer(serializers.ModelSerializer, BaseSerializerMixin):
 
     class Meta:
         model = Treasure
+        list_serializer_class = FragmentListSerializer
         # include = ["creator_name", "short_details", "truncated_description"]
         fields = [
             "id",
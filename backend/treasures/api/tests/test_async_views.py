@@ -0,0 +1,140 @@
+import asyncio
+from unittest import mock
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from etgs_nts.fragments import FragmentListSerializer
+from treasures.models import Treasure
+from comments.models import Comment
+
+User = get_user_model()
+
+
+class AsyncReadViewTests(APITestCase):
+    """The async read views should answer exactly like the viewsets"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="normaluser", password="password123"
+        )
+        self.other = User.objects.create_user(
+            email="other@example.com", handle="otheruser", password="password123"
+        )
+        self.user.add_friend(self.other)
+        for i in range(15):
+            Treasure.objects.create(
+                name=f"Treasure {i}",
+                category="Category",
+                description=f"Description {i}",
+                creator=self.user,
+            )
+        self.other_treasure = Treasure.objects.create(
+            name="Other", category="Other", creator=self.other
+        )
+        self.treasure = Treasure.objects.filter(creator=self.user).first()
+        for i in range(3):
+            Comment.objects.create(
+                content=f"Comment {i}", treasure=self.treasure, author=self.other
+            )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def assertSameResponse(self, sync_url, async_url):
+        sync = self.client.get(sync_url)
+        async_ = self.client.get(async_url)
+        self.assertEqual(sync.status_code, async_.status_code)
+        sync_data, async_data = sync.json(), async_.json()
+        for data in (sync_data, async_data):
+            # the links point at each view's own url
+            for link in ("next", "previous"):
+                if data.get(link):
+                    data[link] = urlsplit(data[link]).query
+        self.assertEqual(sync_data, async_data)
+        return async_
+
+    def test_treasure_list(self):
+        """Test the async list matches the viewset's first page"""
+        response = self.assertSameResponse(
+            reverse("treasure-list"), reverse("async-treasure-list")
+        )
+        self.assertEqual(response.json()["count"], 15)
+        self.assertEqual(len(response.json()["results"]), 10)
+
+    def test_treasure_list_pages(self):
+        """Test page and page_size query params behave the same"""
+        for query in ("?page=2", "?page_size=100", "?page_size=4&page=3"):
+            self.assertSameResponse(
+                reverse("treasure-list") + query,
+                reverse("async-treasure-list") + query,
+            )
+
+    def test_invalid_page(self):
+        """Test out of range pages are a 404 like the viewset"""
+        response = self.assertSameResponse(
+            reverse("treasure-list") + "?page=9", reverse("async-treasure-list") + "?page=9"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_serialized_off_the_event_loop(self):
+        """Test the blocking fragment cache lookups don't run on the loop"""
+        loops = []
+        to_representation = FragmentListSerializer.to_representation
+
+        def record(serializer, data):
+            loops.append(asyncio._get_running_loop())
+            return to_representation(serializer, data)
+
+        with mock.patch.object(FragmentListSerializer, "to_representation", record):
+            response = self.client.get(reverse("async-treasure-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(loops, [None])
+
+    def test_treasure_detail(self):
+        """Test retrieving a treasure matches the viewset"""
+        self.assertSameResponse(
+            reverse("treasure-detail", args=[self.treasure.id]),
+            reverse("async-treasure-detail", args=[self.treasure.id]),
+        )
+
+    def test_treasure_detail_wrong_user(self):
+        """Test other users' treasures are not found"""
+        response = self.assertSameResponse(
+            reverse("treasure-detail", args=[self.other_treasure.id]),
+            reverse("async-treasure-detail", args=[self.other_treasure.id]),
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_comment_list(self):
+        """Test the async comment list matches the viewset"""
+        response = self.assertSameResponse(
+            reverse("comment-list", kwargs={"treasure_pk": self.treasure.id}),
+            reverse("async-comment-list", kwargs={"treasure_pk": self.treasure.id}),
+        )
+        self.assertEqual(response.json()["count"], 3)
+
+    def test_user_detail(self):
+        """Test retrieving a user, friends included, matches the viewset"""
+        response = self.assertSameResponse(
+            reverse("user-detail", args=[self.other.id]),
+            reverse("async-user-detail", args=[self.other.id]),
+        )
+        self.assertEqual(response.json()["friends"], [self.user.id])
+
+    def test_unauthenticated(self):
+        """Test requests without a token are rejected with a 401"""
+        self.client.credentials()
+        response = self.assertSameResponse(
+            reverse("treasure-list"), reverse("async-treasure-list")
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_write_not_allowed(self):
+        """Test the async views are read only"""
+        response = self.client.post(reverse("async-treasure-list"), {"name": "x"})
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -0,0 +1,109 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from treasures.models import Treasure, TreasureTombstone
+from treasures.sync import make_token
+
+User = get_user_model()
+
+
+@override_settings(TREASURE_SYNC={"OVERLAP": 0})
+class TreasureChangesTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="user", password="password123"
+        )
+        self.other = User.objects.create_user(
+            email="other@example.com", handle="other", password="password123"
+        )
+        self.treasures = [
+            Treasure.objects.create(creator=self.user, name=f"Treasure {i}")
+            for i in range(3)
+        ]
+        Treasure.objects.create(creator=self.other, name="Not mine")
+        # saved an hour ago
+        hour_ago = timezone.now() - datetime.timedelta(hours=1)
+        Treasure.objects.update(last_modified=hour_ago)
+        self.url = reverse("treasure-changes")
+        self.client.force_authenticate(self.user)
+
+    def test_full_sync(self):
+        """Test a sync without a token returns every treasure of the user"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["full"])
+        self.assertEqual(
+            [item["id"] for item in response.data["changed"]],
+            [treasure.id for treasure in self.treasures],
+        )
+        self.assertEqual(response.data["deleted"], [])
+        self.assertTrue(response.data["token"])
+
+    def test_changes_since(self):
+        """Test a sync with a token returns only what changed since"""
+        token = self.client.get(self.url).data["token"]
+        updated, deleted, _ = self.treasures
+        updated.name = "Updated"
+        updated.save()
+        deleted_id = deleted.id
+        deleted.delete()
+        created = Treasure.objects.create(creator=self.user, name="New")
+        Treasure.objects.create(creator=self.other, name="Also not mine")
+
+        response = self.client.get(self.url, {"since": token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["full"])
+        self.assertEqual(
+            sorted(item["id"] for item in response.data["changed"]),
+            [updated.id, created.id],
+        )
+        self.assertEqual(response.data["deleted"], [deleted_id])
+
+        response = self.client.get(self.url, {"since": response.data["token"]})
+        self.assertEqual(response.data["changed"], [])
+        self.assertEqual(response.data["deleted"], [])
+
+    def test_invalid_token(self):
+        """Test tokens that are forged or belong to another user are rejected"""
+        other_token = make_token(self.other, timezone.now())
+        for token in ("garbage", other_token):
+            response = self.client.get(self.url, {"since": token})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("since", response.data)
+
+    def test_expired_token(self):
+        """Test a token older than the tombstone retention gets a full sync"""
+        token = make_token(self.user, timezone.now() - datetime.timedelta(days=31))
+        response = self.client.get(self.url, {"since": token})
+        self.assertTrue(response.data["full"])
+        self.assertEqual(len(response.data["changed"]), 3)
+
+    def test_unauthenticated(self):
+        """Test syncing requires authentication"""
+        self.client.force_authenticate(None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prune_tombstones(self):
+        """Test tombstones past the retention are pruned"""
+        old, recent = [treasure.id for treasure in self.treasures[:2]]
+        for treasure in self.treasures[:2]:
+            treasure.delete()
+        TreasureTombstone.objects.filter(treasure_id=old).update(
+            deleted_at=timezone.now() - datetime.timedelta(days=31)
+        )
+        out = StringIO()
+        call_command("prune_tombstones", stdout=out)
+        self.assertIn("Pruned 1 tombstones", out.getvalue())
+        self.assertEqual(
+            list(TreasureTombstone.objects.values_list("treasure_id", flat=True)),
+            [recent],
+        )
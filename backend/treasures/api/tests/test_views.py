@@ -10,12 +10,13 @@ import json
 
 from treasures.models import Treasure
 from treasures.api.serializers import TreasureSerializer
+from perf.nplusone import NPlusOneTestMixin
 
 
 User = get_user_model()
 
 
-class BaseTestCase(APITestCase):
+class BaseTestCase(NPlusOneTestMixin, APITestCase):
     def setUp(self):
         self.client = APIClient()
 
@@ -54,6 +55,8 @@ class BaseTestCase(APITestCase):
         self.client.credentials()
         self.client.defaults["HTTP_ACCEPT"] = "application/json"
         self.client.defaults["format"] = "json"
+        # starts N+1 detection, after the fixtures above
+        super().setUp()
 
     def get_detail_url(self, treasure_id):
         """Helper method to get detail URL for a specific treasure"""
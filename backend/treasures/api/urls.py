@@ -1,10 +1,16 @@
 from django.urls import path, include
 from rest_framework import routers
-from . import views
+from . import views, async_views
 
 router = routers.DefaultRouter()
 router.register(r"treasures", views.TreasureViewSet, basename="treasure")
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("async/treasures/", async_views.treasure_list, name="async-treasure-list"),
+    path(
+        "async/treasures/<int:pk>/",
+        async_views.treasure_detail,
+        name="async-treasure-detail",
+    ),
 ]
@@ -1,11 +1,17 @@
 from django.shortcuts import render
 from django.http import HttpResponse
+from django.db.models import Count, Max
 from rest_framework import generics, viewsets
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
+from comments.models import Comment
+from etgs_nts.coalescing import coalesced
+from ..cache import treasure_cache
 from ..models import Treasure
+from ..sync import InvalidToken, changes_since
 from .serializers import TreasureSerializer
 
 # Create your views here.
@@ -25,13 +31,53 @@ class TreasureViewSet(viewsets.ModelViewSet):
     # ordering = ["creator", "id"]
 
     def get_queryset(self):
-        return Treasure.objects.filter(
-            creator=self.request.user
+        # select_related for TreasureSerializer.get_creator_handle
+        return Treasure.objects.filter(creator=self.request.user).select_related(
+            "creator"
         )  # .order_by("creator","id")
 
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
 
+    @action(detail=False)
+    def changes(self, request):
+        # delta sync, see treasures/sync.py. Not paginated, a client that
+        # is up to date gets a few rows.
+        try:
+            full, changed, deleted, token = changes_since(
+                request.user, self.get_queryset(), request.query_params.get("since")
+            )
+        except InvalidToken as exc:
+            raise ValidationError({"since": [str(exc)]})
+        return Response(
+            {
+                "full": full,
+                "changed": self.get_serializer(changed, many=True).data,
+                "deleted": deleted,
+                "token": token,
+            }
+        )
+
+    @action(detail=False)
+    @coalesced(fresh=60, stale=600, namespace=treasure_cache)
+    def stats(self, request):
+        # Aggregates over all of the user's treasures. Dropped when a
+        # treasure or a comment changes.
+        treasures = Treasure.objects.filter(creator=request.user).order_by()
+        totals = treasures.aggregate(
+            count=Count("id"), last_modified=Max("last_modified")
+        )
+        categories = (
+            treasures.values("category")
+            .annotate(count=Count("id"))
+            .order_by("-count", "category")
+        )
+        totals["categories"] = list(categories)
+        totals["comments"] = Comment.objects.filter(
+            treasure__creator=request.user
+        ).count()
+        return Response(totals)
+
 
 def copy_treasure(request, pk):
     treasure = Treasure.objects.get(pk=pk)
@@ -0,0 +1,6 @@
+from etgs_nts.cache import CacheNamespace
+
+# Derived treasure data: lists, counts, stats. Invalidated whenever a
+# treasure or a comment changes, see treasures/signals.py and
+# comments/signals.py.
+treasure_cache = CacheNamespace("treasures")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from treasures.sync import prune_tombstones, sync_setting
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete treasure tombstones older than TREASURE_SYNC's "
+        "TOMBSTONE_RETENTION. Meant to be run on a schedule, e.g. from cron."
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        days = sync_setting("TOMBSTONE_RETENTION") / 86400
+        self.stdout.write(f"Pruned {deleted} tombstones older than {days:g} days.")
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treasures', '0007_alter_treasure_options'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TreasureTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('treasure_id', models.IntegerField()),
+                ('creator_id', models.IntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='treasure',
+            index=models.Index(fields=['creator', 'last_modified'], name='treasure_creator_modified'),
+        ),
+        migrations.AddIndex(
+            model_name='treasuretombstone',
+            index=models.Index(fields=['creator_id', 'deleted_at'], name='tombstone_creator_deleted'),
+        ),
+        migrations.AddIndex(
+            model_name='treasuretombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted'),
+        ),
+    ]
@@ -19,6 +19,12 @@ class Treasure(models.Model):
 
     class Meta:
         ordering = ["creator", "id"]
+        indexes = [
+            # delta sync, see treasures/sync.py
+            models.Index(
+                fields=["creator", "last_modified"], name="treasure_creator_modified"
+            ),
+        ]
 
     def __str__(self):
         msg = f"{self.creator.handle} feels that {self.name} is a National Treasure."
@@ -41,3 +47,26 @@ class Treasure(models.Model):
         if len(self.description) > 50:
             truncated += "..."
         return truncated
+
+
+class TreasureTombstone(models.Model):
+    """
+    A deleted treasure, kept so clients syncing with /treasures/changes/
+    find out about the deletion. Pruned after TOMBSTONE_RETENTION.
+    """
+
+    treasure_id = models.IntegerField()
+    # not a foreign key, the creator may be deleted along with the treasure
+    creator_id = models.IntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["creator_id", "deleted_at"], name="tombstone_creator_deleted"
+            ),
+            models.Index(fields=["deleted_at"], name="tombstone_deleted"),
+        ]
+
+    def __str__(self):
+        return f"Treasure {self.treasure_id} deleted at {self.deleted_at}"
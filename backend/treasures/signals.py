@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import treasure_cache
+from .models import Treasure
+from .sync import record_deletion
+
+
+@receiver(post_save, sender=Treasure)
+@receiver(post_delete, sender=Treasure)
+def invalidate_treasure_cache(sender, instance, **kwargs):
+    # after commit, so other workers can't cache the old rows again
+    transaction.on_commit(treasure_cache.invalidate)
+
+
+@receiver(post_delete, sender=Treasure)
+def record_treasure_deletion(sender, instance, **kwargs):
+    # a tombstone for clients syncing with /treasures/changes/
+    record_deletion(instance)
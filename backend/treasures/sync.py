@@ -0,0 +1,98 @@
+"""
+Delta sync for clients that keep an offline copy of their treasures.
+
+GET /treasures/changes/ returns every treasure and a sync token. Passing
+the token back as `?since=<token>` returns only the treasures created or
+updated since, found through the (creator, last_modified) index, and the
+ids of the ones deleted since, from the tombstone table. Either way the
+response carries a new token for the next sync:
+
+    {
+        "full": false,  # true: replace the local copy with `changed`
+        "changed": [...],  # treasures, as in /treasures/
+        "deleted": [3, 7],  # treasure ids
+        "token": "...",
+    }
+
+Tokens are signed, so they can't be forged for another user, and record
+the server time of the sync. Tombstones are pruned after
+TOMBSTONE_RETENTION (`manage.py prune_tombstones`), a token older than that
+gets a full resync. Changes are looked for from OVERLAP seconds before the
+token's time, so rows saved by transactions that were still running at the
+last sync aren't missed. Clients may see a row twice, which is harmless.
+
+Configured with the TREASURE_SYNC setting:
+
+    TREASURE_SYNC = {
+        "TOMBSTONE_RETENTION": 30 * 24 * 3600,  # seconds
+        "OVERLAP": 5,  # seconds
+    }
+"""
+
+import datetime
+
+from django.core import signing
+from django.utils import timezone
+
+from etgs_nts.conf import setting_reader
+
+from .models import Treasure, TreasureTombstone
+
+DEFAULTS = {"TOMBSTONE_RETENTION": 30 * 24 * 3600, "OVERLAP": 5}
+
+SALT = "treasures.sync"
+
+
+sync_setting = setting_reader("TREASURE_SYNC", DEFAULTS)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def make_token(user, at):
+    return signing.dumps({"user": user.pk, "at": at.timestamp()}, salt=SALT)
+
+
+def read_token(user, token):
+    """The time recorded in `token`, raises InvalidToken if it isn't the user's."""
+    try:
+        data = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        raise InvalidToken("Invalid sync token.")
+    if data.get("user") != user.pk:
+        raise InvalidToken("Invalid sync token.")
+    return datetime.datetime.fromtimestamp(data["at"], tz=datetime.timezone.utc)
+
+
+def changes_since(user, treasures, token=None):
+    """
+    (full, changed treasures, deleted ids, new token) for `user`, whose
+    treasures are the queryset `treasures`, since `token`.
+    """
+    now = timezone.now()
+    since = read_token(user, token) if token else None
+    retention = datetime.timedelta(seconds=sync_setting("TOMBSTONE_RETENTION"))
+    if since is None or since < now - retention:
+        # tombstones from then may be gone already
+        return True, treasures, [], make_token(user, now)
+    start = since - datetime.timedelta(seconds=sync_setting("OVERLAP"))
+    changed = treasures.filter(last_modified__gte=start)
+    deleted = TreasureTombstone.objects.filter(
+        creator_id=user.pk, deleted_at__gte=start
+    ).values_list("treasure_id", flat=True)
+    return False, changed, list(deleted), make_token(user, now)
+
+
+def record_deletion(treasure):
+    TreasureTombstone.objects.create(
+        treasure_id=treasure.pk, creator_id=treasure.creator_id
+    )
+
+
+def prune_tombstones(now=None):
+    """Delete tombstones older than TOMBSTONE_RETENTION, returns the count."""
+    now = timezone.now() if now is None else now
+    cutoff = now - datetime.timedelta(seconds=sync_setting("TOMBSTONE_RETENTION"))
+    deleted, _ = TreasureTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
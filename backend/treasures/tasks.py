@@ -0,0 +1,8 @@
+from tasks.registry import task
+
+from .sync import prune_tombstones as prune
+
+
+@task(every=24 * 3600)
+def prune_tombstones():
+    return prune()
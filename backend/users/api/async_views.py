@@ -0,0 +1,140 @@
+"""
+Async versions of SignupView, LoginView and UserViewSet.retrieve.
+
+Under ASGI these keep the event loop free while a password is hashed: the
+serializer work runs on the hashing pool's executor, which is capped by
+PASSWORD_HASHING["MAX_CONCURRENCY"] and gives up with a 503 after
+PASSWORD_HASHING["QUEUE_TIMEOUT"] seconds. Request and response bodies match
+the sync views.
+
+They are throttled like the sync views, against the same buckets, so the
+"login" and "signup" limits hold whichever endpoint a client uses.
+"""
+
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, Throttled
+from rest_framework.request import Request
+
+from etgs_nts.async_api import async_api_view, render, serialize
+from users.hashing import hashing_pool
+from .serializers import SignUpSerializer, LoginSerializer, UserSerializer
+from .throttling import AnonBucketThrottle, ScopedBucketThrottle
+from .views import tokens_for_user
+
+User = get_user_model()
+
+
+class _ScopedView:
+    """What the throttles read from a DRF view."""
+
+    def __init__(self, scope):
+        self.throttle_scope = scope
+
+
+def _throttle_wait(request, scope):
+    """None if the request is allowed, else the seconds until it would be."""
+    drf_request = Request(request)
+    view = _ScopedView(scope)
+    waits = [
+        throttle.wait()
+        for throttle in (AnonBucketThrottle(), ScopedBucketThrottle())
+        if not throttle.allow_request(drf_request, view)
+    ]
+    if not waits:
+        return None
+    return max(wait for wait in waits if wait is not None)
+
+
+def throttle(scope):
+    """Apply the anon and `scope` throttles to an async view, as DRF would."""
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            wait = await sync_to_async(_throttle_wait)(request, scope)
+            if wait is not None:
+                exc = Throttled(wait)
+                headers = {"Retry-After": "%d" % exc.wait} if exc.wait else {}
+                return JsonResponse(
+                    {"detail": exc.detail}, status=exc.status_code, headers=headers
+                )
+            return await view(request, *args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+def _signup(data):
+    serializer = SignUpSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    user = serializer.save()
+    data = serializer.data
+    data.update(tokens_for_user(user))
+    return status.HTTP_201_CREATED, data
+
+
+def _login(data):
+    serializer = LoginSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    return status.HTTP_200_OK, serializer.validated_data
+
+
+async def _handle(request, func):
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse(
+            {"detail": "JSON parse error."}, status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        code, body = await hashing_pool.arun(func, data)
+    except APIException as e:
+        # covers validation errors, bad credentials and HashingBusy
+        body = e.detail if isinstance(e.detail, (dict, list)) else {"detail": e.detail}
+        return JsonResponse(body, status=e.status_code, safe=False)
+    return JsonResponse(body, status=code)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@throttle("signup")
+async def signup(request):
+    if request.method == "GET":
+        msg = (
+            "Send a POST request with email, handle (optional), and a "
+            "password. Email will function as the username. Access and refresh tokens "
+            "will be returned."
+        )
+        return JsonResponse({"message": msg})
+    return await _handle(request, _signup)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@throttle("login")
+async def login(request):
+    if request.method == "GET":
+        msg = (
+            "Send a POST request with email and password. Email will function as the username. "
+            "Access and refresh tokens will be returned."
+        )
+        return JsonResponse({"message": msg})
+    return await _handle(request, _login)
+
+
+@async_api_view
+async def user_detail(request, pk):
+    try:
+        user = await User.objects.prefetch_related("friends").aget(pk=pk)
+    except User.DoesNotExist:
+        raise NotFound("No User matches the given query.")
+    return render(await serialize(UserSerializer, user))
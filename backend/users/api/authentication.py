@@ -0,0 +1,39 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from users.user_cache import cache_user, get_cached_user, user_version
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that looks the user up in the user cache before going
+    to the database. Cached users are invalidated whenever they change, see
+    users/user_cache.py.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = get_cached_user(user_id) if user_id is not None else None
+        if user is None:
+            # Cache miss, the parent does the lookup and all the checks. The
+            # stamp is read first, so a change during the lookup bumps it
+            version = user_version(user_id) if user_id is not None else None
+            user = super().get_user(validated_token)
+            cache_user(user, version)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -1,19 +1,25 @@
 from rest_framework import serializers, status
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.validators import UniqueValidator
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import get_user_model, authenticate
 from django.conf import settings
 import sys
 
+from perf.instrumentation import TimedSerializerMixin
+from .tokens import FilteredRefreshToken
+
 
 User = get_user_model()
 DEBUG = settings.DEBUG
 TEST = "test" in sys.argv
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         exclude = [
@@ -82,3 +88,8 @@ class LoginSerializer(TokenObtainPairSerializer):
         #      {"detail": str(e)}, code=status.HTTP_401_UNAUTHORIZED
         # )
         return data
+
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    # checks the in-process blacklist filter before the blacklist table
+    token_class = FilteredRefreshToken
@@ -0,0 +1,119 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.api.authentication import CachedJWTAuthentication
+from users.user_cache import get_cached_user, user_version, bump_user_version
+
+User = get_user_model()
+
+
+def user_queries(captured):
+    return [
+        query for query in captured.captured_queries
+        if 'FROM "users_user" WHERE' in query["sql"]
+    ]
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="cacheduser", password="password123"
+        )
+        self.token = AccessToken.for_user(self.user)
+        self.auth = CachedJWTAuthentication()
+
+    def test_second_lookup_skips_database(self):
+        """Test the user row is only loaded once while cached"""
+        with CaptureQueriesContext(connection) as captured:
+            first = self.auth.get_user(self.token)
+            second = self.auth.get_user(self.token)
+        self.assertEqual(first, self.user)
+        self.assertEqual(second, self.user)
+        self.assertEqual(len(user_queries(captured)), 1)
+
+    def test_save_invalidates(self):
+        """Test saving a user drops the cached copy"""
+        self.auth.get_user(self.token)
+        self.user.handle = "renamed"
+        self.user.save()
+        self.assertIsNone(get_cached_user(self.user.pk))
+        self.assertEqual(self.auth.get_user(self.token).handle, "renamed")
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a cached user takes effect immediately"""
+        self.auth.get_user(self.token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed) as cm:
+            self.auth.get_user(self.token)
+        self.assertEqual(cm.exception.detail["code"], "user_inactive")
+
+    def test_change_during_lookup(self):
+        """Test a row loaded before a change isn't cached under the new stamp"""
+        load = JWTAuthentication.get_user
+
+        def load_then_change(auth, token):
+            user = load(auth, token)
+            # another worker deactivates the user meanwhile
+            bump_user_version(self.user.pk)
+            return user
+
+        with mock.patch.object(JWTAuthentication, "get_user", load_then_change):
+            self.auth.get_user(self.token)
+        self.assertIsNone(get_cached_user(self.user.pk))
+
+    def test_bumped_again_on_commit(self):
+        """Test saves bump the stamp again once they commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+            during = user_version(self.user.pk)
+        self.assertNotEqual(user_version(self.user.pk), during)
+
+    def test_permission_change_invalidates(self):
+        """Test group and permission changes bump the version stamp"""
+        version = user_version(self.user.pk)
+        group = Group.objects.create(name="editors")
+        self.user.groups.add(group)
+        self.assertNotEqual(user_version(self.user.pk), version)
+
+        version = user_version(self.user.pk)
+        group.permissions.add(Permission.objects.first())
+        self.assertNotEqual(user_version(self.user.pk), version)
+
+    def test_evicted_version_never_matches(self):
+        """Test a lost version stamp doesn't resurrect old entries"""
+        self.auth.get_user(self.token)
+        cache.delete(f"user-version:{self.user.pk}")
+        self.assertIsNone(get_cached_user(self.user.pk))
+
+    def test_bump_user_version(self):
+        """Test bumping by hand invalidates, for bulk updates"""
+        self.auth.get_user(self.token)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        bump_user_version(self.user.pk)
+        self.assertIsNone(get_cached_user(self.user.pk))
+
+    def test_api_request_uses_cache(self):
+        """Test repeated API calls only resolve the user once"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        url = reverse("user-detail", args=[self.user.pk])
+        self.assertEqual(client.get(url).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # only the viewset's own lookup is left
+        self.assertEqual(len(user_queries(captured)), 1)
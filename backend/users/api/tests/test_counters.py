@@ -0,0 +1,181 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from comments.models import Comment
+from treasures.models import Treasure
+from users.counters import get_counters, mark_comments_read, repair_counters
+from users.models import FriendshipRequest, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email="owner@example.com", handle="owner", password="password123"
+        )
+        cls.other = User.objects.create_user(
+            email="other@example.com", handle="other", password="password123"
+        )
+        cls.treasure = Treasure.objects.create(creator=cls.owner, name="Treasure")
+        cls.url = reverse("counters")
+
+    def setUp(self):
+        token = RefreshToken.for_user(self.owner).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        # the counters row exists from here on
+        get_counters(self.owner.pk)
+
+    def comment(self, author, content="Nice"):
+        return Comment.objects.create(
+            content=content, treasure=self.treasure, author=author
+        )
+
+    def counters(self):
+        return get_counters(self.owner.pk)
+
+    def test_single_lookup(self):
+        """Test the endpoint answers from one primary key lookup"""
+        self.comment(self.other)
+        # authenticates, caching the user
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(), {"pending_friend_requests": 0, "unread_comments": 1}
+        )
+
+    def test_needs_authentication(self):
+        """Test the counters need a signed in user"""
+        self.client.credentials()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_friend_requests(self):
+        """Test pending requests are counted until answered or deleted"""
+        first = FriendshipRequest.objects.create(sender=self.other, receiver=self.owner)
+        third = User.objects.create_user(
+            email="third@example.com", handle="third", password="password123"
+        )
+        second = FriendshipRequest.objects.create(sender=third, receiver=self.owner)
+        self.assertEqual(self.counters()["pending_friend_requests"], 2)
+        first.accept(self.owner)
+        self.assertEqual(self.counters()["pending_friend_requests"], 1)
+        # answering twice doesn't count twice
+        first.reject()
+        self.assertEqual(self.counters()["pending_friend_requests"], 1)
+        second.delete()
+        self.assertEqual(self.counters()["pending_friend_requests"], 0)
+
+    def test_concurrent_answers(self):
+        """Test two answers to the same pending request count once"""
+        request = FriendshipRequest.objects.create(
+            sender=self.other, receiver=self.owner
+        )
+        third = User.objects.create_user(
+            email="third@example.com", handle="third", password="password123"
+        )
+        FriendshipRequest.objects.create(sender=third, receiver=self.owner)
+        # both loaded while the request was pending
+        first = FriendshipRequest.objects.get(pk=request.pk)
+        second = FriendshipRequest.objects.get(pk=request.pk)
+        first.accept(self.owner)
+        second.reject()
+        self.assertEqual(self.counters()["pending_friend_requests"], 1)
+        request.refresh_from_db()
+        self.assertFalse(request.accepted)
+
+    def test_comments(self):
+        """Test comments by others are unread until marked read"""
+        self.comment(self.other)
+        self.comment(self.owner, "Thanks")
+        self.assertEqual(self.counters()["unread_comments"], 1)
+        response = self.client.post(reverse("counters-comments-read"))
+        self.assertEqual(response.json()["unread_comments"], 0)
+
+        unread = self.comment(self.other, "Again")
+        self.assertEqual(self.counters()["unread_comments"], 1)
+        unread.delete()
+        self.assertEqual(self.counters()["unread_comments"], 0)
+
+    def test_read_comments_deleted(self):
+        """Test deleting a read comment leaves the count alone"""
+        read = self.comment(self.other)
+        self.client.post(reverse("counters-comments-read"))
+        self.comment(self.other, "New")
+        read.delete()
+        self.assertEqual(self.counters()["unread_comments"], 1)
+
+    def test_treasure_deleted(self):
+        """Test a deleted treasure's comments come off in one update"""
+        for _ in range(3):
+            self.comment(self.other)
+        other_treasure = Treasure.objects.create(creator=self.owner, name="Other")
+        Comment.objects.create(content="Nice", treasure=other_treasure, author=self.other)
+        with CaptureQueriesContext(connection) as queries:
+            self.treasure.delete()
+        updates = [
+            query
+            for query in queries.captured_queries
+            if query["sql"].startswith('UPDATE "users_usercounters"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.counters()["unread_comments"], 1)
+
+    def test_comment_rolled_back_with_count(self):
+        """Test a comment isn't created when counting it fails"""
+        url = reverse("comment-list", kwargs={"treasure_pk": self.treasure.pk})
+        token = RefreshToken.for_user(self.other).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        with mock.patch(
+            "comments.signals.bump_counters", side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            self.client.post(url, {"content": "Nice"}, format="json")
+        self.assertFalse(Comment.objects.exists())
+
+    def test_friend_request_rolled_back_with_count(self):
+        """Test a friend request isn't created when counting it fails"""
+        with mock.patch(
+            "users.signals.bump_counters", side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            FriendshipRequest.create_request(self.other, self.owner)
+        self.assertFalse(FriendshipRequest.objects.exists())
+
+    def test_first_read_counts(self):
+        """Test users without a row are counted the first time"""
+        self.comment(self.other)
+        FriendshipRequest.objects.create(sender=self.other, receiver=self.owner)
+        UserCounters.objects.all().delete()
+        self.assertEqual(
+            self.counters(), {"pending_friend_requests": 1, "unread_comments": 1}
+        )
+
+    def test_read_without_row(self):
+        """Test marking comments read counts users without a row"""
+        self.comment(self.other)
+        FriendshipRequest.objects.create(sender=self.other, receiver=self.owner)
+        UserCounters.objects.all().delete()
+        mark_comments_read(self.owner.pk)
+        mark_comments_read(self.owner.pk)
+        self.assertEqual(
+            self.counters(), {"pending_friend_requests": 1, "unread_comments": 0}
+        )
+
+    def test_repair(self):
+        """Test counters that drifted are counted again"""
+        self.comment(self.other)
+        self.assertEqual(repair_counters(), 0)
+        UserCounters.objects.update(pending_friend_requests=5, unread_comments=0)
+        self.assertEqual(repair_counters(), 1)
+        self.assertEqual(
+            self.counters(), {"pending_friend_requests": 0, "unread_comments": 1}
+        )
@@ -0,0 +1,152 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users.hashing import HashingPool, HashingBusy, hashing_pool
+
+User = get_user_model()
+
+
+class HashingPoolTests(TestCase):
+    def test_run_records_stats(self):
+        """Test each run is counted with its duration"""
+        pool = HashingPool(max_concurrency=2, queue_timeout=1)
+        self.assertEqual(pool.run(lambda x: x * 2, 21), 42)
+        stats = pool.stats.snapshot()
+        self.assertEqual(stats["count"], 1)
+        self.assertEqual(stats["rejected"], 0)
+
+    def test_rejects_when_saturated(self):
+        """Test callers give up once the queue timeout passes"""
+        pool = HashingPool(max_concurrency=1, queue_timeout=0.05)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=pool.run, args=(slow,))
+        worker.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(HashingBusy):
+                pool.run(lambda: None)
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(pool.stats.snapshot()["rejected"], 1)
+
+    def test_hashing_goes_through_pool(self):
+        """Test the tuned hasher uses the shared pool"""
+        before = hashing_pool.stats.snapshot()["count"]
+        encoded = make_password("password123")
+        self.assertTrue(encoded.startswith("pbkdf2_sha256$"))
+        self.assertEqual(hashing_pool.stats.snapshot()["count"], before + 1)
+
+
+class HashingStatsViewTests(TestCase):
+    def test_staff_only(self):
+        """Test the hashing stats are served to staff only"""
+        client = APIClient()
+        user = User.objects.create_user(email="user@example.com", password="pw")
+        staff = User.objects.create_user(
+            email="staff@example.com", password="pw", is_staff=True
+        )
+        url = reverse("perf-hashing")
+        client.force_authenticate(user)
+        self.assertEqual(client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        client.force_authenticate(staff)
+        response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["hashes"], hashing_pool.stats.snapshot())
+        self.assertGreater(response.data["hashes"]["count"], 0)
+        self.assertEqual(client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(hashing_pool.stats.snapshot()["count"], 0)
+
+
+class RehashOnLoginTests(TestCase):
+    def test_login_upgrades_old_hash(self):
+        """Test changing the tuned iterations rehashes passwords on login"""
+        user = User.objects.create_user(
+            email="old@example.com", handle="oldhash", password="password123"
+        )
+        self.assertFalse(user.password.startswith("pbkdf2_sha256$100000$"))
+
+        with self.settings(PASSWORD_HASHING={"ITERATIONS": 100_000}):
+            response = APIClient().post(
+                reverse("login"),
+                {"email": "old@example.com", "password": "password123"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$100000$"))
+        self.assertTrue(user.check_password("password123"))
+
+
+class AsyncAuthViewTests(TransactionTestCase):
+    # The async views save users from the hashing pool's threads, so the data
+    # has to be committed for them to see it.
+
+    def test_async_signup(self):
+        """Test signing up through the async view returns tokens"""
+        response = self.client.post(
+            reverse("async-signup"),
+            {"email": "async@example.com", "handle": "asyncuser", "password": "pw123456"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = response.json()
+        self.assertEqual(data["email"], "async@example.com")
+        self.assertIn("access", data)
+        self.assertIn("refresh", data)
+        self.assertTrue(User.objects.filter(email="async@example.com").exists())
+
+    def test_async_signup_invalid(self):
+        """Test validation errors match the sync view"""
+        response = self.client.post(
+            reverse("async-signup"),
+            {"email": "not-an-email", "password": "pw123456"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("email", response.json())
+
+    def test_async_login(self):
+        """Test logging in through the async view"""
+        User.objects.create_user(
+            email="login@example.com", handle="loginuser", password="password123"
+        )
+        response = self.client.post(
+            reverse("async-login"),
+            {"email": "login@example.com", "password": "password123"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["handle"], "loginuser")
+        self.assertIn("access", data)
+
+    def test_async_login_bad_credentials(self):
+        """Test wrong passwords are a 401 like the sync view"""
+        User.objects.create_user(
+            email="login@example.com", handle="loginuser", password="password123"
+        )
+        response = self.client.post(
+            reverse("async-login"),
+            {"email": "login@example.com", "password": "wrong"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_async_get_message(self):
+        """Test GET returns the usage message"""
+        response = self.client.get(reverse("async-login"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("message", response.json())
@@ -0,0 +1,209 @@
+import io
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from users.api.throttling import BucketStore, bucket_store
+
+User = get_user_model()
+
+RATES = {
+    "anon": "100/min",
+    "user": "100/min",
+    "reads": "3/min",
+    "writes": "2/min",
+    "login": "2/min",
+    "signup": "1/min",
+}
+
+
+class BucketStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        path = Path(self.tmpdir.name) / "throttle.sqlite3"
+        override = override_settings(THROTTLING={"PATH": path})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.store = BucketStore()
+
+    def test_bucket(self):
+        """Test a bucket allows a burst of its capacity and then refills"""
+        for _ in range(3):
+            self.assertEqual(self.store.consume("k", 3, 1.0, now=100.0), (True, 0.0))
+        allowed, wait = self.store.consume("k", 3, 1.0, now=100.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1.0)
+        self.assertEqual(self.store.consume("k", 3, 1.0, now=101.5)[0], True)
+        allowed, wait = self.store.consume("k", 3, 1.0, now=101.5)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 0.5)
+
+    def test_shared_between_connections(self):
+        """Test buckets are shared by every thread using the file"""
+        self.store.consume("k", 2, 0.001, now=100.0)
+        results = []
+
+        def other_worker():
+            results.append(BucketStore().consume("k", 2, 0.001, now=100.0))
+            results.append(BucketStore().consume("k", 2, 0.001, now=100.0))
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        thread.join()
+        self.assertEqual([allowed for allowed, _ in results], [True, False])
+
+    def test_prune(self):
+        """Test buckets idle for a day are pruned"""
+        self.store.consume("old", 2, 1.0, now=100.0)
+        self.store.consume("new", 2, 1.0, now=100000.0)
+        self.assertEqual(self.store.prune(now=100001.0), 1)
+        self.assertEqual(self.store.consume("new", 2, 1.0, now=100000.0)[0], True)
+        self.assertEqual(self.store.consume("new", 2, 1.0, now=100000.0)[0], False)
+
+
+@override_settings(
+    THROTTLING={"ENABLED": True, "PATH": ":memory:"},
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": RATES},
+)
+class ThrottlingTests(APITestCase):
+    def setUp(self):
+        bucket_store.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="testuser", password="password123"
+        )
+        self.other = User.objects.create_user(
+            email="other@example.com", handle="otheruser", password="password123"
+        )
+
+    def test_reads_per_user(self):
+        """Test reads are limited per user, with a Retry-After header"""
+        self.client.force_authenticate(self.user)
+        url = reverse("treasure-list")
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_writes_separate_from_reads(self):
+        """Test writes have their own, smaller bucket"""
+        self.client.force_authenticate(self.user)
+        url = reverse("treasure-list")
+        for i in range(2):
+            response = self.client.post(url, {"name": f"Treasure {i}"}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(url, {"name": "Treasure"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_login_per_ip(self):
+        """Test logins are limited per IP whatever the account"""
+        url = reverse("login")
+        for email in ["user@example.com", "other@example.com"]:
+            response = self.client.post(
+                url, {"email": email, "password": "password123"}, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(
+            url, {"email": "user@example.com", "password": "password123"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.client.post(
+            url,
+            {"email": "user@example.com", "password": "password123"},
+            format="json",
+            REMOTE_ADDR="10.0.0.2",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_signup(self):
+        """Test sign ups have their own limit"""
+        url = reverse("signup")
+        statuses = [
+            self.client.post(
+                url,
+                {"email": f"new{i}@example.com", "password": "securepassword123"},
+                format="json",
+            ).status_code
+            for i in range(2)
+        ]
+        self.assertEqual(
+            statuses, [status.HTTP_201_CREATED, status.HTTP_429_TOO_MANY_REQUESTS]
+        )
+
+    @override_settings(THROTTLING={"ENABLED": False})
+    def test_disabled(self):
+        """Test nothing is throttled when throttling is off"""
+        self.client.force_authenticate(self.user)
+        for _ in range(5):
+            response = self.client.get(reverse("treasure-list"))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_prune_command(self):
+        """Test the prune command reports the pruned buckets"""
+        out = io.StringIO()
+        call_command("prune_throttles", stdout=out)
+        self.assertIn("Pruned 0 idle throttle buckets.", out.getvalue())
+
+
+@override_settings(
+    THROTTLING={"ENABLED": True, "PATH": ":memory:"},
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": RATES},
+)
+class AsyncThrottlingTests(TransactionTestCase):
+    # the async views hash on the pool's threads, which need committed rows
+    def setUp(self):
+        bucket_store.clear()
+        User.objects.create_user(
+            email="user@example.com", handle="testuser", password="password123"
+        )
+
+    def test_async_login(self):
+        """Test the async login is limited too, sharing the login bucket"""
+        url = reverse("async-login")
+        data = {"email": "user@example.com", "password": "wrong"}
+        statuses = [
+            self.client.post(url, data, content_type="application/json").status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(
+            statuses,
+            [
+                status.HTTP_401_UNAUTHORIZED,
+                status.HTTP_401_UNAUTHORIZED,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            ],
+        )
+        response = self.client.post(url, data, content_type="application/json")
+        self.assertIn("Retry-After", response)
+        response = self.client.post(
+            reverse("login"), data, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_async_signup(self):
+        """Test the async sign up is limited like the sync one"""
+        url = reverse("async-signup")
+        statuses = [
+            self.client.post(
+                url,
+                {"email": f"new{i}@example.com", "password": "securepassword123"},
+                content_type="application/json",
+            ).status_code
+            for i in range(2)
+        ]
+        self.assertEqual(
+            statuses, [status.HTTP_201_CREATED, status.HTTP_429_TOO_MANY_REQUESTS]
+        )
@@ -0,0 +1,145 @@
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from users.api.tokens import FilteredRefreshToken
+from users.blacklist import (
+    BloomFilter,
+    BlacklistFilter,
+    blacklist_filter,
+    bump_stamp,
+    prune_expired_tokens,
+    read_stamp,
+)
+
+User = get_user_model()
+
+STAMP_DIR = tempfile.mkdtemp()
+
+
+def blacklist_queries(captured):
+    return [
+        query for query in captured.captured_queries
+        if "token_blacklist_blacklistedtoken" in query["sql"]
+    ]
+
+
+class BloomFilterTests(TestCase):
+    def test_members_are_found(self):
+        """Test everything added is reported as a possible member"""
+        bloom = BloomFilter(1000)
+        jtis = [f"jti-{i}" for i in range(1000)]
+        for jti in jtis:
+            bloom.add(jti)
+        self.assertTrue(all(jti in bloom for jti in jtis))
+
+    def test_false_positive_rate(self):
+        """Test non members are rejected at roughly the configured rate"""
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(
+    TOKEN_BLACKLIST_FILTER={"STAMP_FILE": Path(STAMP_DIR) / "test.stamp"}
+)
+class FilteredRefreshTokenTests(TestCase):
+    def setUp(self):
+        blacklist_filter.invalidate()
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="tokenuser", password="password123"
+        )
+
+    def test_unlisted_token_skips_database(self):
+        """Test a token that isn't blacklisted never queries the blacklist"""
+        refresh = FilteredRefreshToken.for_user(self.user)
+        blacklist_filter.might_contain("warm up")
+        with CaptureQueriesContext(connection) as captured:
+            FilteredRefreshToken(str(refresh))
+        self.assertEqual(blacklist_queries(captured), [])
+
+    def test_blacklisted_token_rejected(self):
+        """Test blacklisted tokens are still rejected"""
+        refresh = FilteredRefreshToken.for_user(self.user)
+        blacklist_filter.might_contain("warm up")
+        refresh.blacklist()
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(str(refresh))
+
+    def test_other_workers_catch_up(self):
+        """Test a filter built before the blacklisting picks it up"""
+        other_worker = BlacklistFilter()
+        refresh = FilteredRefreshToken.for_user(self.user)
+        jti = refresh["jti"]
+        self.assertFalse(other_worker.might_contain(jti))
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh.blacklist()
+        self.assertTrue(other_worker.might_contain(jti))
+
+    def test_refresh_endpoint_rejects_reuse(self):
+        """Test a rotated refresh token can't be used twice"""
+        client = APIClient()
+        refresh = str(FilteredRefreshToken.for_user(self.user))
+        url = reverse("token_refresh")
+        response = client.post(url, {"refresh": refresh}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = client.post(url, {"refresh": refresh}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(
+    TOKEN_BLACKLIST_FILTER={"STAMP_FILE": Path(STAMP_DIR) / "prune.stamp"}
+)
+class PruneTokensTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@example.com", handle="pruneuser", password="password123"
+        )
+        now = timezone.now()
+        for i in range(5):
+            token = OutstandingToken.objects.create(
+                user=self.user,
+                jti=f"expired-{i}",
+                token="x",
+                expires_at=now - timedelta(days=1),
+            )
+            BlacklistedToken.objects.create(token=token)
+        OutstandingToken.objects.create(
+            user=self.user, jti="live", token="x", expires_at=now + timedelta(days=1)
+        )
+
+    def test_prunes_expired_in_chunks(self):
+        """Test expired tokens and their blacklist rows are deleted"""
+        self.assertEqual(prune_expired_tokens(chunk_size=2), 5)
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list("jti", flat=True)), ["live"]
+        )
+        self.assertEqual(BlacklistedToken.objects.count(), 0)
+
+    def test_stamp_reset(self):
+        """Test pruning empties the stamp file again"""
+        bump_stamp()
+        bump_stamp()
+        other_worker = BlacklistFilter()
+        other_worker.might_contain("warm up")
+        prune_expired_tokens()
+        self.assertEqual(read_stamp()[0], 0)
+        # the reset is still a change for other workers
+        with self.assertNumQueries(1):
+            other_worker.might_contain("warm up")
@@ -7,11 +7,13 @@ from rest_framework_simplejwt.tokens import RefreshToken
 import json
 from unittest import skip
 
+from perf.nplusone import NPlusOneTestMixin
+
 
 User = get_user_model()
 
 
-class BaseTestCase(APITestCase):
+class BaseTestCase(NPlusOneTestMixin, APITestCase):
     def setUp(self):
         self.client = APIClient()
 
@@ -41,6 +43,8 @@ class BaseTestCase(APITestCase):
         self.detail_url = reverse(
             "user-detail", args=[self.another_user.id]
         )  # Adjust based on your URL name
+        # starts N+1 detection, after the fixtures above
+        super().setUp()
 
     def get_tokens_for_user(self, user):
         refresh = RefreshToken.for_user(user)
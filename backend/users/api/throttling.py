@@ -0,0 +1,181 @@
+"""
+Token bucket throttles shared by every worker process.
+
+Each throttle scope has a DRF style rate in DEFAULT_THROTTLE_RATES, e.g.
+"10/min": a bucket holds up to 10 tokens, refills at 10 per minute and each
+request takes one. Unlike DRF's sliding window throttles, which keep a list
+of timestamps per client in Django's cache, a bucket is two numbers, and
+bursts up to the full rate are allowed after a quiet period.
+
+Buckets live in a small SQLite file (THROTTLING["PATH"]) so limits hold
+across gunicorn workers without a cache server. A check is one UPSERT on a
+per thread connection with synchronous writes off, a few microseconds.
+Losing the file only resets the limits.
+
+- AnonBucketThrottle: the "anon" rate per IP, for unauthenticated requests
+- UserBucketThrottle: the "user" rate per authenticated user
+- ScopedBucketThrottle: the view's `throttle_scope` ("login", "signup"), or
+  else "reads" for safe methods and "writes" for the rest, per user or IP
+
+Configured with the THROTTLING setting:
+
+    THROTTLING = {
+        "ENABLED": True,
+        "PATH": BASE_DIR / "throttle.sqlite3",  # ":memory:" for per process
+    }
+
+The test runner (etgs_nts/test_runner.py) turns throttling off and uses an
+in memory store, throttle tests switch it back on and clear the store.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from etgs_nts.conf import setting_reader
+
+DEFAULTS = {
+    "ENABLED": True,
+    "PATH": ":memory:",
+}
+
+
+throttle_setting = setting_reader("THROTTLING", DEFAULTS)
+
+
+CONSUME_SQL = """
+INSERT INTO buckets (key, tokens, updated) VALUES (:key, :capacity - 1, :now)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:capacity, tokens + (:now - updated) * :refill) - 1,
+    updated = :now
+WHERE min(:capacity, tokens + (:now - updated) * :refill) >= 1
+RETURNING tokens
+"""
+
+
+class BucketStore:
+    """Token buckets in a SQLite file, one connection per thread and process."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _connection(self):
+        path = str(throttle_setting("PATH"))
+        local = self._local
+        if getattr(local, "key", None) != (os.getpid(), path):
+            # autocommit, every statement is its own transaction
+            connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+            if path != ":memory:":
+                connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) "
+                "WITHOUT ROWID"
+            )
+            local.connection = connection
+            local.key = (os.getpid(), path)
+        return local.connection
+
+    def consume(self, key, capacity, refill, now=None):
+        """
+        Take a token from the bucket `key`, which holds up to `capacity`
+        tokens and gains `refill` per second. Returns (allowed, seconds until
+        the next token).
+        """
+        now = time.time() if now is None else now
+        params = {"key": key, "capacity": capacity, "refill": refill, "now": now}
+        connection = self._connection()
+        if connection.execute(CONSUME_SQL, params).fetchone() is not None:
+            return True, 0.0
+        row = connection.execute(
+            "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+        ).fetchone()
+        tokens = min(capacity, row[0] + (now - row[1]) * refill) if row else 0.0
+        return False, (1 - tokens) / refill
+
+    def prune(self, now=None):
+        """Delete buckets idle long enough to be full again, returns the count."""
+        now = time.time() if now is None else now
+        # tokens can't go past capacity, so a bucket idle for a day is full
+        # for any rate of at least one per day
+        cursor = self._connection().execute(
+            "DELETE FROM buckets WHERE updated < ?", (now - 86400,)
+        )
+        return cursor.rowcount
+
+    def clear(self):
+        self._connection().execute("DELETE FROM buckets")
+
+
+bucket_store = BucketStore()
+
+
+class BucketThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle with its history replaced by a shared token bucket."""
+
+    def __init__(self):
+        # the scope can depend on the view and method, so the rate is looked
+        # up per request
+        pass
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def allow_request(self, request, view):
+        if not throttle_setting("ENABLED"):
+            return True
+        self.scope = self.get_scope(request, view)
+        self.rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        num_requests, duration = self.parse_rate(self.rate)
+        allowed, self.retry_after = bucket_store.consume(
+            self.key, num_requests, num_requests / duration
+        )
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+    def _ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def get_cache_key(self, request, view):
+        return f"{self.scope}:{self._ident(request)}"
+
+
+class AnonBucketThrottle(BucketThrottle):
+    scope = "anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return super().get_cache_key(request, view)
+
+
+class UserBucketThrottle(BucketThrottle):
+    scope = "user"
+
+    def get_cache_key(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return None
+        return super().get_cache_key(request, view)
+
+
+class ScopedBucketThrottle(BucketThrottle):
+    def get_scope(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if scope:
+            return scope
+        return "reads" if request.method in SAFE_METHODS else "writes"
@@ -0,0 +1,16 @@
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.blacklist import blacklist_filter
+
+
+class FilteredRefreshToken(RefreshToken):
+    """
+    RefreshToken that asks the in-process blacklist filter first and only
+    queries the blacklist table when the token might be on it.
+    """
+
+    def check_blacklist(self):
+        if not blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            return
+        super().check_blacklist()
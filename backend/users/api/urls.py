@@ -1,5 +1,12 @@
 from django.urls import path, include
-from .views import UserViewSet, SignupView, LoginView
+from .views import (
+    UserViewSet,
+    SignupView,
+    LoginView,
+    CountersView,
+    CommentsReadView,
+)
+from . import async_views
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
@@ -9,5 +16,14 @@ urlpatterns = [
     path("", include(router.urls)),
     path("signup/", SignupView.as_view(), name="signup"),
     path("login/", LoginView.as_view(), name="login"),
+    path("me/counters/", CountersView.as_view(), name="counters"),
+    path(
+        "me/counters/comments/read/",
+        CommentsReadView.as_view(),
+        name="counters-comments-read",
+    ),
+    path("async/signup/", async_views.signup, name="async-signup"),
+    path("async/login/", async_views.login, name="async-login"),
+    path("async/users/<int:pk>/", async_views.user_detail, name="async-user-detail"),
     # or is it better to pass the form data in the url?
 ]
@@ -13,6 +13,7 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from treasures.models import Treasure
 from treasures.forms import TreasureCreationForm
+from users.counters import get_counters, mark_comments_read
 from .serializers import UserSerializer, SignUpSerializer, LoginSerializer
 from .permissions import IsOwnerOrAdmin, IsFriend
 from rest_framework.generics import CreateAPIView
@@ -21,6 +22,11 @@ from django.contrib.auth import get_user_model, authenticate
 User = get_user_model()
 
 
+def tokens_for_user(user):
+    refresh = RefreshToken.for_user(user)
+    return {"access": str(refresh.access_token), "refresh": str(refresh)}
+
+
 # need to add things that check request.method and then redirect and what not.
 # also flow control to check that users are valid or authenticated.
 
@@ -34,7 +40,8 @@ class UserViewSet(viewsets.ModelViewSet):
 
 
 class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all().order_by("date_joined")
+    # UserSerializer lists each user's friends
+    queryset = User.objects.prefetch_related("friends").order_by("date_joined")
     serializer_class = UserSerializer
     
     def get_permissions(self):
@@ -56,6 +63,7 @@ class SignupView(CreateAPIView):
     queryset = User.objects.all()
     serializer_class = SignUpSerializer
     permission_classes = [AllowAny]
+    throttle_scope = "signup"
 
     def perform_create(self, serializer):
         user = serializer.save()
@@ -66,10 +74,8 @@ class SignupView(CreateAPIView):
         serializer.is_valid(raise_exception=True)
         user = self.perform_create(serializer)
 
-        refresh = RefreshToken.for_user(user)
         data = serializer.data
-        data["access"] = str(refresh.access_token)
-        data["refresh"] = str(refresh)
+        data.update(tokens_for_user(user))
         return Response(data, status=status.HTTP_201_CREATED)
 
     def get(self, request):
@@ -84,6 +90,7 @@ class SignupView(CreateAPIView):
 class LoginView(APIView):
     permission_classes = [AllowAny]
     serializer_class = LoginSerializer
+    throttle_scope = "login"
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -96,3 +103,16 @@ class LoginView(APIView):
             "Access and refresh tokens will be returned."
         )
         return Response({"message": msg})
+
+
+class CountersView(APIView):
+    """Badge counts for the signed in user, see users/counters.py."""
+
+    def get(self, request):
+        return Response(get_counters(request.user.pk))
+
+
+class CommentsReadView(APIView):
+    def post(self, request):
+        mark_comments_read(request.user.pk)
+        return Response(get_counters(request.user.pk))
@@ -0,0 +1,208 @@
+"""
+In-process Bloom filter over blacklisted refresh token JTIs.
+
+Refresh tokens are rotated and blacklisted on every refresh, so the
+blacklist table only ever grows and every refresh has to look a token up in
+it. Almost every token checked isn't blacklisted, and a Bloom filter can say
+"definitely not" without touching the database. Only possible matches fall
+through to the real query.
+
+Keeping workers in step: whenever a token is blacklisted a byte is appended
+to a small stamp file. Checking the stamp is a single stat() call, and when
+it has changed the filter catches up by loading just the rows added since it
+was built. The filter is rebuilt from scratch every REBUILD_INTERVAL seconds
+so pruned and expired tokens fall out of it. prune_expired_tokens() empties
+the stamp file again, so it doesn't grow without bound.
+
+Configured with the TOKEN_BLACKLIST_FILTER setting:
+
+    TOKEN_BLACKLIST_FILTER = {
+        "ENABLED": True,
+        "STAMP_FILE": BASE_DIR / "token_blacklist.stamp",
+        "REBUILD_INTERVAL": 300,  # seconds
+        "FALSE_POSITIVE_RATE": 0.01,
+    }
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from etgs_nts.conf import setting_reader
+
+DEFAULTS = {
+    "ENABLED": True,
+    "STAMP_FILE": None,
+    "REBUILD_INTERVAL": 300,
+    "FALSE_POSITIVE_RATE": 0.01,
+}
+
+
+_filter_setting = setting_reader("TOKEN_BLACKLIST_FILTER", DEFAULTS)
+
+
+def filter_setting(name):
+    value = _filter_setting(name)
+    if name == "STAMP_FILE" and value is None:
+        value = settings.BASE_DIR / "token_blacklist.stamp"
+    return value
+
+
+def read_stamp():
+    try:
+        stat = os.stat(filter_setting("STAMP_FILE"))
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def bump_stamp():
+    # Appending keeps the size growing, so two bumps can't look the same
+    with open(filter_setting("STAMP_FILE"), "ab") as f:
+        f.write(b".")
+
+
+def reset_stamp():
+    # A new mtime, so workers still see a change even at the same size
+    with open(filter_setting("STAMP_FILE"), "wb"):
+        pass
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1000)
+        bits = -self.capacity * math.log(error_rate) / (math.log(2) ** 2)
+        self.size = int(math.ceil(bits / 8) * 8)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray(self.size // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class BlacklistFilter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._built_at = 0.0
+        self._max_id = 0
+        self._stamp = None
+
+    def might_contain(self, jti):
+        """False means the token is definitely not blacklisted."""
+        if not filter_setting("ENABLED"):
+            return True
+        return jti in self._current()
+
+    def add(self, jti):
+        # Extra members only cost a database check, so this is always safe
+        bloom = self._bloom
+        if bloom is not None:
+            bloom.add(jti)
+
+    def invalidate(self):
+        with self._lock:
+            self._bloom = None
+
+    def _current(self):
+        stamp = read_stamp()
+        interval = filter_setting("REBUILD_INTERVAL")
+        bloom = self._bloom
+        fresh = time.monotonic() - self._built_at < interval
+        if bloom is not None and stamp == self._stamp and fresh:
+            return bloom
+        with self._lock:
+            if self._bloom is None or time.monotonic() - self._built_at >= interval:
+                self._rebuild(stamp)
+            elif stamp != self._stamp:
+                self._catch_up(stamp)
+            return self._bloom
+
+    def _rebuild(self, stamp):
+        rows = list(
+            BlacklistedToken.objects.filter(
+                token__expires_at__gt=timezone.now()
+            ).values_list("pk", "token__jti")
+        )
+        # Leave room to grow between rebuilds
+        bloom = BloomFilter(len(rows) * 2, filter_setting("FALSE_POSITIVE_RATE"))
+        for _, jti in rows:
+            bloom.add(jti)
+        self._bloom = bloom
+        self._max_id = max((pk for pk, _ in rows), default=self._latest_id())
+        self._stamp = stamp
+        self._built_at = time.monotonic()
+
+    def _catch_up(self, stamp):
+        rows = BlacklistedToken.objects.filter(pk__gt=self._max_id).values_list(
+            "pk", "token__jti"
+        )
+        for pk, jti in rows:
+            self._bloom.add(jti)
+            self._max_id = max(self._max_id, pk)
+        self._stamp = stamp
+        if self._bloom.count > self._bloom.capacity:
+            # Too full to keep the false positive rate, start over
+            self._rebuild(stamp)
+
+    def _latest_id(self):
+        latest = BlacklistedToken.objects.order_by("-pk").values_list("pk", flat=True)
+        return latest.first() or 0
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def prune_expired_tokens(chunk_size=1000, pause=0.0):
+    """
+    Delete expired outstanding tokens, and their blacklist entries, in chunks
+    so the write lock is never held for long. Returns the number of tokens
+    deleted.
+    """
+    now = timezone.now()
+    deleted = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+        if pause:
+            time.sleep(pause)
+    if deleted:
+        # drop the pruned tokens from this worker's filter straight away
+        blacklist_filter.invalidate()
+    # bump_stamp() grows the file by a byte per blacklisted token, start over
+    reset_stamp()
+    return deleted
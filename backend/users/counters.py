@@ -0,0 +1,169 @@
+"""
+Per user badge counts: friend requests waiting for an answer and comments by
+others on the user's treasures since they last read them.
+
+Counting those on every page load means two COUNT queries per request. They
+are kept in a UserCounters row instead, changed with F() expressions in the
+transaction that creates, answers or deletes the request or comment (the
+views and FriendshipRequest.create_request() open one around the save):
+
+- a new friend request adds one for its receiver, answering it with
+  FriendshipRequest.respond() or deleting it while pending takes one off
+- a comment by someone else adds one for the treasure's creator, deleting a
+  comment they haven't read yet takes one off, and deleting a treasure takes
+  off all of its unread comments at once
+- mark_comments_read() sets the comment count back to zero
+
+A user's row is created by counting the first time their counters are read,
+so existing users need no data migration. Changes that skip signals
+(queryset .update(), raw SQL) leave the counts off until repair_counters()
+runs, which the users.tasks.repair_counters task does daily.
+"""
+
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from comments.models import Comment
+
+from .models import FriendshipRequest, UserCounters
+
+FIELDS = ("pending_friend_requests", "unread_comments")
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _pending_requests():
+    return FriendshipRequest.objects.filter(date_responded__isnull=True)
+
+
+def _unread_comments(user_id, read_at):
+    comments = Comment.objects.filter(treasure__creator_id=user_id).exclude(
+        author_id=user_id
+    )
+    if read_at is not None:
+        comments = comments.filter(date_added__gt=read_at)
+    return comments
+
+
+def recount(user_id):
+    """Count the user's badges from scratch and store them, returns the row."""
+    with transaction.atomic():
+        # locked, so a bump_counters() can't land between counting and saving
+        counters, _ = UserCounters.objects.select_for_update().get_or_create(
+            user_id=user_id
+        )
+        counters.pending_friend_requests = _pending_requests().filter(
+            receiver_id=user_id
+        ).count()
+        counters.unread_comments = _unread_comments(
+            user_id, counters.comments_read_at
+        ).count()
+        counters.save(update_fields=FIELDS)
+    return counters
+
+
+def bump_counters(user_id, **deltas):
+    """
+    Add `deltas` to the user's counters, e.g. unread_comments=1. Counts never
+    go below zero. Call it in the transaction that made the change.
+    """
+    changes = {
+        field: Greatest(F(field) + delta, Value(0)) for field, delta in deltas.items()
+    }
+    # users without a row yet are counted when they are first read
+    UserCounters.objects.filter(pk=user_id).update(**changes)
+
+
+def get_counters(user_id):
+    """The user's counters as a dict, from a single primary key lookup."""
+    counters = UserCounters.objects.filter(pk=user_id).values(*FIELDS).first()
+    if counters is None:
+        counters = {field: getattr(recount(user_id), field) for field in FIELDS}
+    return counters
+
+
+def mark_comments_read(user_id, now=None):
+    """Mark the comments on the user's treasures until `now` as read."""
+    now = now or timezone.now()
+    changes = {"unread_comments": 0, "comments_read_at": now}
+    with transaction.atomic():
+        if UserCounters.objects.filter(pk=user_id).update(**changes):
+            return
+        _, created = UserCounters.objects.get_or_create(
+            user_id=user_id, defaults={"comments_read_at": now}
+        )
+        if created:
+            recount(user_id)
+        else:
+            # a concurrent call created the row meanwhile
+            UserCounters.objects.filter(pk=user_id).update(**changes)
+
+
+def comment_deleted(comment):
+    """Take a deleted comment off its treasure creator's unread count."""
+    unread = Q(comments_read_at__isnull=True) | Q(
+        comments_read_at__lt=comment.date_added
+    )
+    UserCounters.objects.filter(unread, user__treasure=comment.treasure_id).exclude(
+        pk=comment.author_id
+    ).update(unread_comments=Greatest(F("unread_comments") - 1, Value(0)))
+
+
+def treasure_deleted(treasure):
+    """
+    Take the unread comments on a treasure about to be deleted off its
+    creator's count, in one UPDATE instead of one per cascaded comment.
+    """
+    unread = (
+        Comment.objects.filter(treasure=treasure)
+        .exclude(author_id=treasure.creator_id)
+        .alias(read_at=Coalesce(OuterRef("comments_read_at"), Value(EPOCH)))
+        .filter(date_added__gt=F("read_at"))
+        .values("treasure")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    UserCounters.objects.filter(pk=treasure.creator_id).update(
+        unread_comments=Greatest(
+            F("unread_comments") - Coalesce(Subquery(unread), 0), Value(0)
+        )
+    )
+
+
+def repair_counters():
+    """Recount the rows whose counts drifted, returns how many were fixed."""
+    requests = (
+        _pending_requests()
+        .filter(receiver_id=OuterRef("pk"))
+        .values("receiver_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    comments = (
+        Comment.objects.filter(treasure__creator_id=OuterRef("pk"))
+        .exclude(author_id=OuterRef("pk"))
+        .filter(date_added__gt=OuterRef("read_at"))
+        .values("treasure__creator_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    drifted = (
+        UserCounters.objects.annotate(
+            read_at=Coalesce("comments_read_at", Value(EPOCH)),
+            expected_requests=Coalesce(Subquery(requests), 0),
+            expected_comments=Coalesce(Subquery(comments), 0),
+        )
+        .exclude(
+            pending_friend_requests=F("expected_requests"),
+            unread_comments=F("expected_comments"),
+        )
+        .values_list("pk", flat=True)
+    )
+    drifted = list(drifted)
+    for user_id in drifted:
+        recount(user_id)
+    return len(drifted)
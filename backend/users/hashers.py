@@ -0,0 +1,22 @@
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from .hashing import hashing_pool, hashing_setting
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with an iteration count from PASSWORD_HASHING["ITERATIONS"] that
+    runs every hash through the bounded hashing pool.
+
+    It keeps the pbkdf2_sha256 algorithm name and replaces Django's hasher in
+    PASSWORD_HASHERS, so existing hashes still verify. Once ITERATIONS is
+    changed Django rehashes each password the next time its owner logs in.
+    """
+
+    @property
+    def iterations(self):
+        return hashing_setting("ITERATIONS") or PBKDF2PasswordHasher.iterations
+
+    def encode(self, password, salt, iterations=None):
+        # verify and harden_runtime both go through encode
+        return hashing_pool.run(super().encode, password, salt, iterations)
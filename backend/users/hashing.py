@@ -0,0 +1,158 @@
+"""
+Bounded password hashing.
+
+Password hashes are deliberately slow, so a burst of signups or logins can
+tie up every worker thread. All hashing goes through `hashing_pool`, which
+caps how many hashes run at once and rejects callers that have waited longer
+than the queue timeout with a 503 instead of letting requests pile up.
+Hash times, queue waits and rejections are counted per process, staff can
+read them at /perf/hashing/.
+
+Configured with the PASSWORD_HASHING setting:
+
+    PASSWORD_HASHING = {
+        "MAX_CONCURRENCY": 4,  # hashes allowed to run at the same time
+        "QUEUE_TIMEOUT": 5.0,  # seconds to wait for a slot before giving up
+        "ITERATIONS": None,  # PBKDF2 iterations for the tuned hasher
+    }
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from etgs_nts.conf import setting_reader
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "MAX_CONCURRENCY": 4,
+    "QUEUE_TIMEOUT": 5.0,
+    "ITERATIONS": None,
+}
+
+
+hashing_setting = setting_reader("PASSWORD_HASHING", DEFAULTS)
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many logins or sign ups in progress, please try again."
+    default_code = "hashing_busy"
+
+
+class HashStats:
+    """Running totals of hash and queue wait times, in milliseconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.rejected = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+
+    def record(self, hash_ms, wait_ms):
+        with self._lock:
+            self.count += 1
+            self.total_ms += hash_ms
+            self.max_ms = max(self.max_ms, hash_ms)
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def record_rejection(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "rejected": self.rejected,
+                "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+                "max_ms": round(self.max_ms, 3),
+                "mean_wait_ms": (
+                    round(self.total_wait_ms / self.count, 3) if self.count else 0.0
+                ),
+                "max_wait_ms": round(self.max_wait_ms, 3),
+            }
+
+
+class HashingPool:
+    """
+    Caps concurrent password hashing.
+
+    `run` hashes on the calling thread once a slot is free. `arun` is for
+    async views, it runs the whole callable (serializer validation, saving
+    the user, and so on) on the pool's own executor so the event loop is
+    never blocked by a hash.
+    """
+
+    def __init__(self, max_concurrency=None, queue_timeout=None):
+        self.max_concurrency = max_concurrency or hashing_setting("MAX_CONCURRENCY")
+        self.queue_timeout = (
+            queue_timeout
+            if queue_timeout is not None
+            else hashing_setting("QUEUE_TIMEOUT")
+        )
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.stats = HashStats()
+
+    def run(self, func, *args, **kwargs):
+        queued = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.stats.record_rejection()
+            logger.warning(
+                "Password hashing rejected after waiting %.1fs", self.queue_timeout
+            )
+            raise HashingBusy()
+        try:
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            finished = time.perf_counter()
+        finally:
+            self._slots.release()
+        self.stats.record((finished - started) * 1000, (started - queued) * 1000)
+        return result
+
+    @property
+    def executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix="hashing"
+                )
+            return self._executor
+
+    async def arun(self, func, *args, **kwargs):
+        queued = time.perf_counter()
+
+        def call():
+            # Waiting for an executor thread counts towards the queue timeout
+            if time.perf_counter() - queued > self.queue_timeout:
+                self.stats.record_rejection()
+                raise HashingBusy()
+            close_old_connections()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                close_old_connections()
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, call)
+
+
+hashing_pool = HashingPool()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.api.throttling import bucket_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete throttle buckets that have been idle for a day, they are full "
+        "again. Meant to be run on a schedule, e.g. from cron."
+    )
+
+    def handle(self, *args, **options):
+        deleted = bucket_store.prune()
+        self.stdout.write(f"Pruned {deleted} idle throttle buckets.")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from users.blacklist import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired refresh tokens and their blacklist entries in chunks. "
+        "Meant to be run on a schedule, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between chunks to let other writers in.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_expired_tokens(options["chunk_size"], options["pause"])
+        self.stdout.write(f"Pruned {deleted} expired tokens.")
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('pending_friend_requests', models.PositiveIntegerField(default=0)),
+                ('unread_comments', models.PositiveIntegerField(default=0)),
+                ('comments_read_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'user counters',
+            },
+        ),
+    ]
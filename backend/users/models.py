@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -83,9 +83,18 @@ class FriendshipRequest(models.Model):
         return f"{self.sender.handle} to {self.receiver.handle}"
 
     def respond(self, accepted: bool):
-        self.accepted = accepted
-        self.date_responded = timezone.now()
-        self.save()
+        from .counters import bump_counters
+
+        answer = {"accepted": accepted, "date_responded": timezone.now()}
+        requests = FriendshipRequest.objects.filter(pk=self.pk)
+        with transaction.atomic():
+            # only the call that answers a pending request takes it off the count
+            if requests.filter(date_responded__isnull=True).update(**answer):
+                bump_counters(self.receiver_id, pending_friend_requests=-1)
+            else:
+                requests.update(**answer)
+        self.accepted = answer["accepted"]
+        self.date_responded = answer["date_responded"]
 
     def accept(self, user):
         if user != self.receiver:
@@ -100,8 +109,32 @@ class FriendshipRequest(models.Model):
     @classmethod
     def create_request(cls, sender, receiver):
         request = cls(sender=sender, receiver=receiver)
-        request.save()
+        # post_save bumps the receiver's pending count, in the same transaction
+        with transaction.atomic():
+            request.save()
         # I don't think I need to return the request object currently.
         msg_type = messages.SUCCESS
         msg = f"Friend request sent to {receiver.handle}."
         return msg_type, msg
+
+
+class UserCounters(models.Model):
+    """
+    Badge counts kept up to date as friend requests and comments come and go,
+    so showing them is a primary key lookup instead of two COUNT queries.
+    See users/counters.py.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="counters"
+    )
+    pending_friend_requests = models.PositiveIntegerField(default=0)
+    unread_comments = models.PositiveIntegerField(default=0)
+    # comments on the user's treasures up to here have been read
+    comments_read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "user counters"
+
+    def __str__(self):
+        return f"Counters for {self.user}"
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .blacklist import blacklist_filter, bump_stamp
+from .counters import bump_counters
+from .models import FriendshipRequest
+from .user_cache import bump_user_version_on_commit
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # is_active, handle, password and the rest all arrive through save()
+    bump_user_version_on_commit(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_cached_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        bump_user_version_on_commit(instance.pk)
+    elif action == "post_clear":
+        # the user ids are gone by now, let the cache timeout handle it
+        return
+    else:
+        for user_id in pk_set or ():
+            bump_user_version_on_commit(user_id)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_members(sender, instance, action, reverse, **kwargs):
+    if not action.startswith("post_") or reverse:
+        return
+    for user_id in instance.user_set.values_list("pk", flat=True):
+        bump_user_version_on_commit(user_id)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def publish_blacklisted_token(sender, instance, created, **kwargs):
+    if not created:
+        return
+    blacklist_filter.add(instance.token.jti)
+    # Other workers catch up once the row is visible to them
+    transaction.on_commit(bump_stamp)
+
+
+@receiver(post_save, sender=FriendshipRequest)
+def count_friend_request(sender, instance, created, **kwargs):
+    # answering goes through FriendshipRequest.respond(), which counts it
+    if created and instance.date_responded is None:
+        bump_counters(instance.receiver_id, pending_friend_requests=1)
+
+
+@receiver(post_delete, sender=FriendshipRequest)
+def uncount_friend_request(sender, instance, **kwargs):
+    if instance.date_responded is None:
+        bump_counters(instance.receiver_id, pending_friend_requests=-1)
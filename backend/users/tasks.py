@@ -0,0 +1,20 @@
+from tasks.registry import task
+
+from .api.throttling import bucket_store
+from .blacklist import prune_expired_tokens
+from .counters import repair_counters as repair
+
+
+@task(every=3600)
+def prune_tokens():
+    return prune_expired_tokens()
+
+
+@task(every=3600)
+def prune_throttles():
+    return bucket_store.prune()
+
+
+@task(every=24 * 3600)
+def repair_counters():
+    return repair()
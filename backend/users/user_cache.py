@@ -0,0 +1,102 @@
+"""
+Short lived cache of User rows for token authentication.
+
+Every user has a version stamp in the cache which is replaced whenever the
+user is saved or deleted, or their groups or permissions change (see
+users/signals.py). Cached users are stored under their current stamp, so a
+bump invalidates every worker's copy without having to find and delete it.
+
+Configured with the JWT_USER_CACHE setting:
+
+    JWT_USER_CACHE = {
+        "CACHE": "default",  # cache alias
+        "TIMEOUT": 60,  # seconds a cached user is trusted for
+    }
+
+Queryset .update() calls skip signals, so use bump_user_version after
+bulk changes to is_active and the like (after they commit, or
+bump_user_version_on_commit inside a transaction).
+"""
+
+import functools
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+from etgs_nts.conf import setting_reader
+
+DEFAULTS = {"CACHE": "default", "TIMEOUT": 60}
+
+
+_setting = setting_reader("JWT_USER_CACHE", DEFAULTS)
+
+
+def _cache():
+    return caches[_setting("CACHE")]
+
+
+def _version_key(user_id):
+    return f"user-version:{user_id}"
+
+
+def _user_key(user_id, version):
+    return f"auth-user:{user_id}:{version}"
+
+
+def _new_version():
+    # Unique across processes, a stale entry can never match a new stamp
+    return time.time_ns()
+
+
+def user_version(user_id):
+    """
+    Return the user's current version stamp. If it was evicted a fresh one
+    is created, so entries cached under the old stamp can't be returned.
+    """
+    cache = _cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), _new_version(), timeout=None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def user_versions(user_ids):
+    """user_version for many users, with one cache lookup, as {id: stamp}."""
+    cache = _cache()
+    keys = {_version_key(user_id): user_id for user_id in user_ids}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        cache.add(key, _new_version(), timeout=None)
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump_user_version(user_id):
+    _cache().set(_version_key(user_id), _new_version(), timeout=None)
+
+
+def bump_user_version_on_commit(user_id):
+    """
+    Bump now and again once the transaction commits. Until then other workers
+    still read the old row, and could cache it under the first new stamp.
+    """
+    bump_user_version(user_id)
+    transaction.on_commit(functools.partial(bump_user_version, user_id))
+
+
+def get_cached_user(user_id):
+    version = _cache().get(_version_key(user_id))
+    if version is None:
+        return None
+    return _cache().get(_user_key(user_id, version))
+
+
+def cache_user(user, version):
+    """
+    Cache `user` under `version`, the stamp read with user_version() before
+    the row was loaded. A change that lands in between has bumped the stamp
+    by then, so the old row is never stored under the new one.
+    """
+    _cache().set(_user_key(user.pk, version), user, timeout=_setting("TIMEOUT"))
@@ -1,77 +1,192 @@
 import logging
+import logging.handlers
 import functools
 import inspect
+import os
+import queue
+import random
+import threading
 
-def log_method_calls(cls=None, logger=None):
+# Arguments longer than this are cut short in the debug messages
+DEFAULT_MAX_ARG_LENGTH = 200
+
+
+class _CallParams:
+    """
+    The "with params:" part of a debug message. Only turned into a string when
+    a handler actually formats the record, so filtered records cost nothing.
+    """
+
+    __slots__ = ("args", "kwargs", "max_length")
+
+    def __init__(self, args, kwargs, max_length):
+        self.args = args
+        self.kwargs = kwargs
+        self.max_length = max_length
+
+    def _truncate(self, value):
+        text = str(value)
+        if self.max_length is not None and len(text) > self.max_length:
+            return f"{text[:self.max_length]}... ({len(text)} chars)"
+        return text
+
+    def __str__(self):
+        lines = [f"\n- {self._truncate(arg)}" for arg in self.args]
+        lines += [
+            f"\n- {key}: {self._truncate(value)}" for key, value in self.kwargs.items()
+        ]
+        return "".join(lines)
+
+
+def _wrap(func, name, log, sample_rate, max_arg_length, skip_first=False):
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        # Check the level first: disabled or sampled out calls build no message
+        traced = log.isEnabledFor(logging.DEBUG) and (
+            sample_rate >= 1 or random.random() < sample_rate
+        )
+        if traced:
+            params = args[1:] if skip_first else args
+            log.debug(
+                "Executing %s with params:%s",
+                name,
+                _CallParams(params, kwargs, max_arg_length),
+            )
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            log.error("Exception in %s: %s", name, e, exc_info=True)
+            raise
+        if traced:
+            log.debug("Exiting %s", name)
+        return result
+
+    return wrapped
+
+
+def log_method_calls(
+    cls=None, logger=None, sample_rate=1.0, max_arg_length=DEFAULT_MAX_ARG_LENGTH
+):
     """
     Class decorator that adds logging to all methods of a class.
     Can be used as @log_method_calls or @log_method_calls(logger=custom_logger)
+
+    `sample_rate` is the fraction of calls that get debug messages and
+    `max_arg_length` caps how much of each argument is logged (None for no cap).
+    Exceptions are always logged.
     """
     def decorator(cls):
         # If no logger is provided, create one based on the class module
         log = logger or logging.getLogger(cls.__module__)
-        
+
         # Get all methods defined in the class
         for name, method in inspect.getmembers(cls, inspect.isfunction):
             # Skip private methods (starting with _)
             if name.startswith('_'):
                 continue
-                
-            @functools.wraps(method)
-            def wrapped(self, *args, **kwargs):
-                method_name = f"{cls.__name__}.{method.__name__}"
-                debug_msg = f"Executing {method_name} with params:"
-                for arg in args:
-                    debug_msg += f"\n- {arg}"
-                for key, value in kwargs.items():
-                    debug_msg += f"\n- {key}: {value}"
-                log.debug(debug_msg)
-                try:
-                    result = method(self, *args, **kwargs)
-                    log.debug(f"Exiting {method_name}")
-                    return result
-                except Exception as e:
-                    log.error(f"Exception in {method_name}: {str(e)}", exc_info=True)
-                    raise
-                    
-            setattr(cls, name, wrapped.__get__(None, cls))
+
+            method_name = f"{cls.__name__}.{method.__name__}"
+            setattr(
+                cls,
+                name,
+                _wrap(
+                    method,
+                    method_name,
+                    log,
+                    sample_rate,
+                    max_arg_length,
+                    skip_first=True,
+                ),
+            )
         return cls
-        
+
     # Handle both @log_method_calls and @log_method_calls()
     if cls is None:
         return decorator
     return decorator(cls)
 
 
-def log_function(func=None, logger=None):
+def log_function(
+    func=None, logger=None, sample_rate=1.0, max_arg_length=DEFAULT_MAX_ARG_LENGTH
+):
     """
     Function decorator that adds logging to a function.
     Can be used as @log_function or @log_function(logger=custom_logger)
+
+    Takes the same `sample_rate` and `max_arg_length` options as
+    log_method_calls.
     """
     def decorator(func):
         # If no logger is provided, create one based on the function's module
         log = logger or logging.getLogger(func.__module__)
-        
-        @functools.wraps(func)
-        def wrapped(*args, **kwargs):
-            func_name = func.__name__
-            debug_msg = f"Executing {func_name} with params:"
-            for arg in args:
-                debug_msg += f"\n- {arg}"
-            for key, value in kwargs.items():
-                debug_msg += f"\n- {key}: {value}"
-            log.debug(debug_msg)    
-            try:
-                result = func(*args, **kwargs)
-                log.debug(f"Exiting {func_name}")
-                return result
-            except Exception as e:
-                log.error(f"Exception in {func_name}: {str(e)}", exc_info=True)
-                raise
-                
-        return wrapped
-        
+        return _wrap(func, func.__name__, log, sample_rate, max_arg_length)
+
     # Handle both @log_function and @log_function()
     if func is None:
         return decorator
     return decorator(func)
+
+
+class QueuedFileHandler(logging.handlers.QueueHandler):
+    """
+    Drop-in replacement for logging.FileHandler that hands records to a
+    QueueListener thread, so the file writes never block the logging thread.
+
+    The listener is started on first use in each process (so it survives a
+    fork). flush() waits for it to write what is queued, close() stops it
+    when logging shuts down. When more than `queue_size` records are
+    waiting, new ones are dropped and counted in `dropped`.
+    """
+
+    def __init__(
+        self, filename, mode="a", encoding=None, delay=True, queue_size=10000
+    ):
+        # Created first so logging.shutdown() closes it after this handler
+        self.target = logging.FileHandler(filename, mode, encoding, delay)
+        super().__init__(queue.Queue(queue_size))
+        self.dropped = 0
+        self.listener = None
+        self._pid = None
+        self._listener_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._listener_lock:
+            if self._pid != os.getpid():
+                self.listener = logging.handlers.QueueListener(self.queue, self.target)
+                self.listener.start()
+                self._pid = os.getpid()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        self._ensure_listener()
+        super().emit(record)
+
+    def flush(self):
+        """Wait for queued records to be written."""
+        # the listener keeps running, other threads may still be logging
+        if self.listener is not None and self._pid == os.getpid():
+            self.queue.join()
+        self.target.flush()
+
+    def close(self):
+        with self._listener_lock:
+            if self.listener is not None and self._pid == os.getpid():
+                self.listener.stop()
+                self._pid = None
+            # records other threads queued behind the listener's stop
+            while True:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.target.handle(record)
+                self.queue.task_done()
+        self.target.close()
+        super().close()